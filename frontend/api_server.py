@@ -3,12 +3,13 @@
 Flask API server for the Research Assistant frontend
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import sys
 import os
 import uuid
+import time
 import asyncio
 import threading
 from threading import Thread
@@ -16,7 +17,11 @@ from threading import Thread
 # Add the src directory to the path so we can import the research assistant
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from research_assistant import graph, graph_no_interrupt, set_status_callback
+from research_assistant import get_graph, fake_providers, set_status_callback, status_console, current_session, get_llm_cache, search_cache, limiters, call_policy, retrieval_race, breakers, thread_config, tracer
+from metrics import metrics
+from jobs import QueueFull, SqliteJobQueue, job_queue_from_env
+from research_worker import analysts_data, run_job
+from status_bus import StatusBus, status_bus_from_env
 
 app = Flask(__name__)
 
@@ -58,41 +63,82 @@ else:
 sessions = {}
 session_rooms = {}  # Maps session_id to list of socket IDs
 
-# Thread-local storage for session context
-thread_local = threading.local()
-
+# Session context of the current request. Graph nodes find their session from the run's
+# thread_id instead (see research_assistant.session_id), which follows LangGraph onto its
+# executor threads and Send branches where a thread-local would not.
 def set_session_context(session_id):
-    """Set the session ID in thread-local storage for the current request thread"""
-    thread_local.session_id = session_id
-    print(f"🧵 Thread {threading.current_thread().ident}: Set session context to {session_id}")
+    """Set the session ID in the context of the current request"""
+    current_session.set(session_id)
 
 def get_session_context():
-    """Get the session ID from thread-local storage for the current request thread"""
-    session_id = getattr(thread_local, 'session_id', None)
-    print(f"🧵 Thread {threading.current_thread().ident}: Got session context: {session_id}")
-    return session_id
+    """Get the session ID from the context of the current request"""
+    return current_session.get() or None
 
 def clear_session_context():
-    """Clear the session ID from thread-local storage"""
-    if hasattr(thread_local, 'session_id'):
-        delattr(thread_local, 'session_id')
-        print(f"🧵 Thread {threading.current_thread().ident}: Cleared session context")
+    """Clear the session ID from the context of the current request"""
+    current_session.set('')
+
+# Status updates sent per session, so clients can spot gaps (see load_test.py)
+status_sequences = {}
+status_counts = {'emitted': 0, 'unrouted': 0}
+status_lock = threading.Lock()
+
+def next_status_seq(session_id):
+    """1, 2, 3, ... for each status update of a session"""
+    with status_lock:
+        status_counts['emitted'] += 1
+        status_sequences[session_id] = status_sequences.get(session_id, 0) + 1
+        return status_sequences[session_id]
+
+def emit_status_batch(room, updates):
+    """Deliver queued status updates to a session room as one status_batch event"""
+    socketio.emit('status_batch', {'session_id': updates[-1]['session_id'], 'updates': updates}, room=room)
+
+# Status updates are emitted from one background task, never from the thread running a graph node
+status_bus = status_bus_from_env(emit_status_batch, spawn=socketio.start_background_task, sleep=socketio.sleep)
+
+def emit_room_events(room, events):
+    """Deliver queued session events to a room in the order they were published"""
+    for event in events:
+        socketio.emit(event['event'], event['data'], room=room)
+
+# Session events from research jobs go out the same way; they are never dropped or coalesced
+room_events = StatusBus(emit_room_events, max_queue=sys.maxsize, coalesce=(),
+                        spawn=socketio.start_background_task, sleep=socketio.sleep)
+
+def emit_to_session(session_id, event, data):
+    """Queue a Socket.IO event for the clients in a session room"""
+    room_events.publish(f"session_{session_id}", {'event': event, 'data': data})
+
+@app.before_request
+def start_emitters():
+    """Start both emitters from a request, i.e. on the thread serving Socket.IO"""
+    # Research jobs publish from worker threads, where a background task spawned on first
+    # use would never be scheduled; nor would one spawned at import under the reloader
+    status_bus.start()
+    room_events.start()
+    if remote_workers:
+        start_relay()
 
 # WebSocket status update function
 def send_status_update(message: str, status: dict):
-    """Send status update via WebSocket to clients in the specific session room"""
+    """Queue a status update for the clients in the specific session room"""
     try:
-        # Get session_id from thread-local storage instead of global variable
-        current_session_id = get_session_context()
+        # Updates from graph nodes are tagged with their run's session; others use the request's
+        current_session_id = status.get('session_id') or get_session_context()
         if current_session_id:
             status['session_id'] = current_session_id
-            
-            print(f"📡 Broadcasting status update to session {current_session_id}: {message}")
+            # Sequence number and send time let clients measure drops and delivery lag
+            status['seq'] = next_status_seq(current_session_id)
+            # Updates relayed from research workers keep the time the worker sent them
+            status.setdefault('ts', time.time())
             
             # Emit to specific session room instead of broadcasting to all
-            socketio.emit('status_update', status, room=f"session_{current_session_id}")
+            status_bus.publish(f"session_{current_session_id}", status)
         else:
-            print(f"⚠️ No session context found for status update: {message}")
+            with status_lock:
+                status_counts['unrouted'] += 1
+            status_console.publish('console', {'message': f"⚠️ No session context found for status update: {message}"})
             
     except Exception as e:
         print(f"Error sending status update: {e}")
@@ -110,6 +156,31 @@ class ResearchSession:
         self.graph_state = None
         self.final_report = None
 
+def get_session(session_id):
+    """Look up a session, restoring it from its checkpoint if the server restarted since it began"""
+    if session_id in sessions:
+        return sessions[session_id]
+
+    snapshot = get_graph().get_state(thread_config(session_id))
+    if not snapshot.values:
+        return None
+
+    values = snapshot.values
+    session = ResearchSession(session_id, values.get('topic', ''), values.get('max_analysts', 3))
+    session.analysts = values.get('analysts', [])
+    session.graph_state = values
+    if values.get('final_report'):
+        session.final_report = values['final_report']
+        session.state = 'completed'
+    elif snapshot.next == ('human_feedback',):
+        session.state = 'awaiting_approval'
+    else:
+        # The run stopped part way through; approving resumes it from the last checkpoint
+        session.state = 'interrupted'
+    sessions[session_id] = session
+    print(f"♻️ Restored session {session_id} from checkpoint ({session.state})")
+    return session
+
 # WebSocket event handlers
 @socketio.on('connect')
 def handle_connect():
@@ -167,6 +238,108 @@ def handle_leave_session(data):
         emit('session_left', {'session_id': session_id, 'status': 'success'})
         print(f"📱 Client {request.sid} left session {session_id}")
 
+def emit_after_status(session_id, event, data):
+    """Queue an event for a session room behind the status updates already queued for it"""
+    if event != 'report_delta':
+        status_bus.flush()
+    emit_to_session(session_id, event, data)
+
+# Session state to fall back to when a job fails
+FAILED_STATES = {
+    'start': 'failed',
+    'modify': 'awaiting_approval',
+    # Completed steps are checkpointed, so approving again resumes from where the run failed
+    'approve': 'interrupted',
+    'research': 'failed',
+}
+
+# Jobs submitted to research workers whose outcome has not been applied to their session yet
+pending_jobs = set()
+
+def job_finished(job):
+    """Apply a finished job (as a dict) to its session, then announce the outcome to the session room"""
+    pending_jobs.discard(job['id'])
+    session = get_session(job['session_id'])
+    if not session:
+        return
+    if job['state'] == 'completed':
+        result = job['result']
+        session.state = result['state']
+        if 'analysts' in result:
+            session.analysts = result['analysts']
+        if 'final_report' in result:
+            session.final_report = result['final_report']
+        data = result['data']
+        if result['event'] == 'research_completed':
+            data = {**data, 'status_events': status_sequences.get(session.id, 0)}
+        emit_after_status(session.id, result['event'], data)
+    else:
+        session.state = FAILED_STATES[job['kind']]
+        emit_after_status(session.id, 'error', {'message': job['error'], 'session_id': session.id, 'job_id': job['id']})
+
+def run_research_job(job):
+    """Run a queued start, modify, approve or research job on one of this process's worker threads"""
+    try:
+        result = run_job(job, emit_after_status)
+    except Exception as e:
+        job_finished({**job.as_dict(), 'state': 'failed', 'error': str(e)})
+        raise
+    job_finished({**job.as_dict(), 'state': 'completed', 'result': result})
+    return result
+
+# Graph runs happen on this worker pool, never in the thread handling a request;
+# with RESEARCH_QUEUE_PATH set they happen in research_worker.py processes instead
+job_queue = job_queue_from_env(run_research_job)
+remote_workers = isinstance(job_queue, SqliteJobQueue)
+
+def relay_worker_events(interval=0.05):
+    """Fan out the status updates, events and job results written by research workers to session rooms"""
+    after = job_queue.last_event_id()
+    while True:
+        try:
+            events = job_queue.events(after)
+        except Exception as e:
+            print(f"Error reading research worker events: {e}")
+            events = []
+        for event_id, session_id, event, data in events:
+            after = event_id
+            try:
+                if event == 'status':
+                    send_status_update(data.get('message', ''), data)
+                elif event == 'job':
+                    job_finished(data)
+                else:
+                    emit_after_status(session_id, event, data)
+            except Exception as e:
+                print(f"Error relaying {event} event of session {session_id}: {e}")
+        if not events:
+            time.sleep(interval)
+
+relay = {'thread': None}
+
+def start_relay():
+    with status_lock:
+        if relay['thread'] is None:
+            relay['thread'] = Thread(target=relay_worker_events, name='worker-events', daemon=True)
+            relay['thread'].start()
+
+def enqueue(session, kind, payload=None):
+    """Submit a job for the session and answer 202 Accepted, or 503 when the queue is full"""
+    job = job_queue.submit(kind, session.id, payload)
+    if remote_workers:
+        pending_jobs.add(job.id)
+    return jsonify({
+        'session_id': session.id,
+        'job_id': job.id,
+        'status': job.state,
+        'status_url': f"/api/research/{job.id}"
+    }), 202
+
+def queue_full(error):
+    response = jsonify({'error': f"Research queue is full, please try again shortly ({error})"})
+    response.headers['Retry-After'] = '30'
+    return response, 503
+
 @app.route('/api/research/start', methods=['POST'])
 def start_research():
     """Start a new research session"""
@@ -174,67 +347,38 @@ def start_research():
         data = request.get_json()
         topic = data.get('topic', '').strip()
         max_analysts = data.get('max_analysts', 3)
+        # Research straight through to the report, without stopping for approval of the analysts
+        auto_approve = bool(data.get('auto_approve'))
         
         if not topic:
             return jsonify({'error': 'Topic is required'}), 400
         
-        # Create new session
-        session_id = str(uuid.uuid4())
+        # Clients may pick the session id, so they can join its room before the first status update
+        session_id = data.get('session_id') or str(uuid.uuid4())
+        if session_id in sessions or get_session(session_id):
+            return jsonify({'error': 'Session already exists'}), 409
         session = ResearchSession(session_id, topic, max_analysts)
+        if auto_approve:
+            session.state = 'researching'
         
-        # Set thread-local session context instead of global variable
-        set_session_context(session_id)
+        sessions[session_id] = session
+        try:
+            response = enqueue(session, 'research' if auto_approve else 'start',
+                               {'topic': topic, 'max_analysts': max_analysts})
+        except QueueFull as e:
+            del sessions[session_id]
+            return queue_full(e)
         
         # Emit session started event to specific session room
-        socketio.emit('session_started', {
+        emit_to_session(session_id, 'session_started', {
             'session_id': session_id,
             'topic': topic,
             'max_analysts': max_analysts
-        }, room=f"session_{session_id}")
-        
-        # Create initial state and run graph until human feedback
-        initial_state = {
-            'topic': topic,
-            'max_analysts': max_analysts,
-            'human_analyst_feedback': ''
-        }
-        
-        # Run the graph until human feedback is needed
-        result = graph.invoke(initial_state, {"recursion_limit": 10})
-        
-        # Store session data
-        session.analysts = result.get('analysts', [])
-        session.graph_state = result
-        session.state = 'awaiting_approval'
-        sessions[session_id] = session
-        
-        # Clear thread-local session context after graph execution
-        clear_session_context()
-        
-        # Convert analysts to dict format for JSON response
-        analysts_data = []
-        for analyst in session.analysts:
-            analysts_data.append({
-                'name': analyst.name,
-                'role': analyst.role,
-                'affiliation': analyst.affiliation,
-                'description': analyst.description
-            })
-        
-        return jsonify({
-            'session_id': session_id,
-            'topic': topic,
-            'analysts': analysts_data,
-            'status': 'awaiting_approval'
         })
+        return response
         
     except Exception as e:
         print(f"Error starting research: {e}")
-        # Clear thread-local session context on error
-        clear_session_context()
-        if 'session_id' in locals():
-            socketio.emit('error', {'message': str(e), 'session_id': session_id}, 
-                         room=f"session_{session_id}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/research/approve', methods=['POST'])
@@ -244,60 +388,29 @@ def approve_research():
         data = request.get_json()
         session_id = data.get('session_id')
         
-        if not session_id or session_id not in sessions:
+        session = get_session(session_id) if session_id else None
+        if not session:
             return jsonify({'error': 'Invalid session ID'}), 400
         
-        session = sessions[session_id]
-        
-        if session.state != 'awaiting_approval':
+        if session.state not in ('awaiting_approval', 'interrupted'):
             return jsonify({'error': 'Session not in approval state'}), 400
         
-        # Set thread-local session context instead of global variable
-        set_session_context(session_id)
+        previous_state, session.state = session.state, 'researching'
+        try:
+            response = enqueue(session, 'approve')
+        except QueueFull as e:
+            session.state = previous_state
+            return queue_full(e)
         
         # Emit research started event to specific session room
-        socketio.emit('research_approved', {
+        emit_to_session(session_id, 'research_approved', {
             'session_id': session_id,
             'message': 'Research approved, starting full analysis...'
-        }, room=f"session_{session_id}")
-        
-        # Use the no-interrupt graph with approved analysts
-        research_state = {
-            'topic': session.topic,
-            'max_analysts': len(session.analysts),
-            'analysts': session.analysts,
-            'human_analyst_feedback': 'approve'
-        }
-        
-        # Run the complete research process
-        final_result = graph_no_interrupt.invoke(research_state, {"recursion_limit": 100})
-        
-        session.final_report = final_result.get('final_report', 'No report generated')
-        session.state = 'completed'
-        
-        # Clear thread-local session context after completion
-        clear_session_context()
-        
-        # Emit completion event to specific session room
-        socketio.emit('research_completed', {
-            'session_id': session_id,
-            'final_report': session.final_report,
-            'message': 'Research completed successfully!'
-        }, room=f"session_{session_id}")
-        
-        return jsonify({
-            'session_id': session_id,
-            'final_report': session.final_report,
-            'status': 'completed'
         })
+        return response
         
     except Exception as e:
         print(f"Error approving research: {e}")
-        # Clear thread-local session context on error
-        clear_session_context()
-        if 'session_id' in locals():
-            socketio.emit('error', {'message': str(e), 'session_id': session_id}, 
-                         room=f"session_{session_id}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/research/modify', methods=['POST'])
@@ -308,77 +421,58 @@ def modify_analysts():
         session_id = data.get('session_id')
         feedback = data.get('feedback', '').strip()
         
-        if not session_id or session_id not in sessions:
+        session = get_session(session_id) if session_id else None
+        if not session:
             return jsonify({'error': 'Invalid session ID'}), 400
             
         if not feedback:
             return jsonify({'error': 'Feedback is required'}), 400
         
-        session = sessions[session_id]
-        
         if session.state != 'awaiting_approval':
             return jsonify({'error': 'Session not in approval state'}), 400
         
-        # Set thread-local session context instead of global variable
-        set_session_context(session_id)
+        session.state = 'modifying_analysts'
+        try:
+            response = enqueue(session, 'modify', {'feedback': feedback})
+        except QueueFull as e:
+            session.state = 'awaiting_approval'
+            return queue_full(e)
         
         # Emit modification started event to specific session room
-        socketio.emit('analysts_modification_started', {
+        emit_to_session(session_id, 'analysts_modification_started', {
             'session_id': session_id,
             'feedback': feedback,
             'message': 'Modifying analyst team based on feedback...'
-        }, room=f"session_{session_id}")
-        
-        # Update state with feedback and regenerate analysts
-        current_state = session.graph_state
-        current_state['human_analyst_feedback'] = feedback
-        
-        # Run graph to regenerate analysts
-
-        print(current_state)
-
-        result = graph.invoke(current_state, {"recursion_limit": 10})
-
-        print(result)
-
-        # Update session
-        session.analysts = result.get('analysts', [])
-        session.graph_state = result
-        
-        # Clear thread-local session context after modification
-        clear_session_context()
-        
-        # Convert analysts to dict format for JSON response
-        analysts_data = []
-        for analyst in session.analysts:
-            analysts_data.append({
-                'name': analyst.name,
-                'role': analyst.role,
-                'affiliation': analyst.affiliation,
-                'description': analyst.description
-            })
-        
-        # Emit modification completed event to specific session room
-        socketio.emit('analysts_modified', {
-            'session_id': session_id,
-            'analysts': analysts_data,
-            'message': 'Analyst team updated successfully!'
-        }, room=f"session_{session_id}")
-        
-        return jsonify({
-            'session_id': session_id,
-            'analysts': analysts_data,
-            'status': 'awaiting_approval'
         })
+        return response
         
     except Exception as e:
         print(f"Error modifying analysts: {e}")
-        # Clear thread-local session context on error
-        clear_session_context()
-        if 'session_id' in locals():
-            socketio.emit('error', {'message': str(e), 'session_id': session_id}, 
-                         room=f"session_{session_id}")
         return jsonify({'error': str(e)}), 500
+
+@app.route('/api/research/<research_id>', methods=['GET'])
+def research_status(research_id):
+    """State, analysts and report of a session, looked up by session id or by the id of one of its jobs"""
+    job = job_queue.get(research_id)
+    session_id = job.session_id if job else research_id
+    session = get_session(session_id)
+    if not session:
+        return jsonify({'error': 'Research session not found'}), 404
+    
+    job = job or job_queue.latest(session_id)
+    job_data = job.as_dict() if job else None
+    if job_data and job.id in pending_jobs and job_data['state'] in ('completed', 'failed'):
+        # A research worker has finished the job, but the relay has yet to apply it to the session
+        job_data.update(state='running', result=None, error=None)
+    return jsonify({
+        'session_id': session_id,
+        'topic': session.topic,
+        'state': session.state,
+        'analysts': analysts_data(session.analysts),
+        'final_report': session.final_report,
+        'status_events': status_sequences.get(session_id, 0),
+        'job': job_data
+    })
     
 
 
@@ -412,6 +506,70 @@ def health_check():
         'port': os.environ.get('PORT', 5000)
     })
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the shared LLM and retrieval caches"""
+    return jsonify({'llm_cache': get_llm_cache().stats(), 'search_cache': search_cache.stats()})
+
+@app.route('/api/limits/stats', methods=['GET'])
+def limits_stats():
+    """In-flight counts and queue waits for each provider limiter"""
+    return jsonify({provider: limiter.stats() for provider, limiter in limiters.items()})
+
+@app.route('/api/calls/stats', methods=['GET'])
+def calls_stats():
+    """Per-node LLM call latency, timeout and hedge counters"""
+    return jsonify(call_policy.stats())
+
+@app.route('/api/retrieval/stats', methods=['GET'])
+def retrieval_stats():
+    """Per-source retrieval latency histograms, race outcomes and circuit breaker state"""
+    stats = retrieval_race.stats.stats()
+    for source, breaker in breakers.items():
+        stats.setdefault(source, {})["breaker"] = breaker.stats()
+    return jsonify(stats)
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Per-node duration, token, retrieval and cache metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics/sessions/<session_id>', methods=['GET'])
+def session_metrics(session_id):
+    """Time, tokens, retrieval bytes and cache use of one session, per node and analyst"""
+    return jsonify({'session_id': session_id, 'nodes': metrics.session_usage(session_id)})
+
+def memory_stats():
+    """Current (where /proc is available) and peak resident set size of this process, in MB"""
+    stats = {}
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        stats['peak_rss_mb'] = round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            stats['rss_mb'] = round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    return stats
+
+@app.route('/api/server/stats', methods=['GET'])
+def server_stats():
+    """Memory, threads, sessions, status update and research job counts of this server process"""
+    with status_lock:
+        status_events = dict(status_counts)
+    return jsonify({
+        **memory_stats(),
+        'threads': threading.active_count(),
+        'sessions': len(sessions),
+        'status_events': status_events,
+        'status_bus': status_bus.stats(),
+        'jobs': job_queue.stats(),
+    })
+
 @app.route('/api/websocket-test', methods=['GET'])
 def websocket_test():
     """WebSocket connectivity test endpoint"""
@@ -477,6 +635,13 @@ if __name__ == '__main__':
         print(f"Starting production API server on port {port}")
         print("Production mode - WebSocket support enabled")
     
+    if remote_workers:
+        print(f"⚙️ Research jobs are queued in {job_queue.path} (up to {job_queue.max_queued} waiting); "
+              "run them with python ../src/research_worker.py")
+    else:
+        print(f"⚙️ Research jobs run on {job_queue.max_workers} workers, with up to {job_queue.max_queued} waiting")
+    if fake_providers():
+        print("🧪 FAKE_PROVIDERS is set: Gemini, Tavily and Wikipedia are replaced by offline fakes (see src/fakes.py)")
     print("=" * 40)
     
     # Use socketio.run instead of app.run for WebSocket support
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Load generator for api_server.py: simulated users over asyncio Socket.IO clients
+
+Each user connects, joins its session room with join_session *before*
+starting (it picks its own session id), then drives /api/research/start,
+optionally /api/research/modify, and /api/research/approve like the web app.
+Each of those answers 202 Accepted with a job id, which the user polls through
+GET /api/research/<job id> until the job has finished. Users are run at
+increasing concurrency levels; for each level it reports:
+
+- request latency per endpoint (p50/p95/p99), and the time until its job
+  finished (start_job, modify_job, approve_job),
+- status update delivery lag (server send time to client receipt),
+- dropped status updates (fewer received than the server sent the session;
+  updates coalesced into a later one count as received), misrouted ones
+  (carrying another session's id), and ones the server could not route to
+  any session,
+- server RSS, thread count and research jobs waiting for a worker, sampled
+  from /api/server/stats.
+
+Run the server against the offline fake providers so no API keys or quotas
+are spent (lag is only meaningful when both run on the same clock):
+
+    FAKE_PROVIDERS=1 FAKE_TIME_SCALE=0.05 python api_server.py
+    python load_test.py --users 1 5 10 20 --modify-fraction 0.2
+
+To load test separate research worker processes, give the server and each
+worker the same job queue and checkpoint database:
+
+    export FAKE_PROVIDERS=1 RESEARCH_QUEUE_PATH=/tmp/jobs.db CHECKPOINT_PATH=/tmp/checkpoints.db
+    python api_server.py &
+    python ../src/research_worker.py & python ../src/research_worker.py &
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+
+import aiohttp
+import socketio
+
+BASE_URL = os.environ.get('LOAD_TEST_URL', 'http://localhost:5000')
+
+TOPICS = (
+    "Artificial Intelligence trends 2024",
+    "Climate change impact on agriculture",
+    "Quantum computing applications",
+    "Machine learning in drug discovery",
+    "Battery technology for electric vehicles",
+)
+
+ENDPOINTS = ('connect', 'join', 'start', 'start_job', 'modify', 'modify_job', 'approve', 'approve_job')
+
+
+def percentiles(samples):
+    """p50/p95/p99 of samples, in seconds"""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    return {f"p{q}": round(samples[min(len(samples) - 1, max(math.ceil(len(samples) * q / 100) - 1, 0))], 4)
+            for q in (50, 95, 99)}
+
+
+class SimulatedUser:
+    """One user's research session, recording latencies and the status updates it receives"""
+
+    def __init__(self, index, base_url, http, max_analysts=2, modify=False, timeout=600, settle=1.0, poll=0.25):
+        self.index = index
+        self.base_url = base_url
+        self.http = http
+        self.max_analysts = max_analysts
+        self.modify = modify
+        self.timeout = timeout
+        self.settle = settle
+        self.poll = poll
+        self.session_id = str(uuid.uuid4())
+        self.latencies = {}
+        self.seqs = set()
+        self.lags = []
+        self.received = 0
+        self.misrouted = 0
+        self.sent = None
+        self.error = None
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on('status_update', self.on_status_update)
+        self.sio.on('status_batch', self.on_status_batch)
+
+    async def on_status_update(self, data):
+        received_at = time.time()
+        self.received += 1
+        if data.get('session_id') != self.session_id:
+            self.misrouted += 1
+            return
+        if 'seq' in data:
+            self.seqs.add(data['seq'])
+            self.seqs.update(data.get('coalesced_seqs', ()))
+        if 'ts' in data:
+            self.lags.append(received_at - data['ts'])
+
+    async def on_status_batch(self, data):
+        for update in data.get('updates', []):
+            await self.on_status_update(update)
+
+    @property
+    def dropped(self):
+        """Status updates the server sent this session that never arrived"""
+        sent = self.sent if self.sent is not None else max(self.seqs, default=0)
+        return max(sent - len(self.seqs), 0)
+
+    async def timed(self, name, awaitable):
+        started = time.perf_counter()
+        result = await awaitable
+        self.latencies[name] = time.perf_counter() - started
+        return result
+
+    async def post(self, endpoint, payload):
+        """Submit a research job and wait for it; returns the session as of the job's end"""
+        async def request():
+            async with self.http.post(f"{self.base_url}/api/research/{endpoint}", json=payload,
+                                      timeout=aiohttp.ClientTimeout(total=30)) as response:
+                body = await response.json()
+                if response.status != 202:
+                    raise RuntimeError(f"{endpoint} returned {response.status}: {body.get('error')}")
+                return body
+        submitted = time.perf_counter()
+        accepted = await self.timed(endpoint, request())
+        research = await self.wait_for_job(accepted['job_id'])
+        self.latencies[f"{endpoint}_job"] = time.perf_counter() - submitted
+        return research
+
+    async def wait_for_job(self, job_id):
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            async with self.http.get(f"{self.base_url}/api/research/{job_id}",
+                                     timeout=aiohttp.ClientTimeout(total=30)) as response:
+                research = await response.json()
+            job = research.get('job') or {}
+            if job.get('state') == 'completed':
+                return research
+            if job.get('state') == 'failed':
+                raise RuntimeError(f"{job['kind']} job failed: {job['error']}")
+            await asyncio.sleep(self.poll)
+        raise TimeoutError(f"job {job_id} did not finish within {self.timeout}s")
+
+    async def run(self):
+        try:
+            await self.timed('connect', self.sio.connect(self.base_url, transports=['websocket']))
+            await self.timed('join', self.sio.call('join_session', {'session_id': self.session_id}, timeout=30))
+            await self.post('start', {
+                'session_id': self.session_id,
+                'topic': TOPICS[self.index % len(TOPICS)],
+                'max_analysts': self.max_analysts,
+            })
+            if self.modify:
+                await self.post('modify', {'session_id': self.session_id,
+                                           'feedback': 'Add an analyst focused on costs and regulation'})
+            body = await self.post('approve', {'session_id': self.session_id})
+            self.sent = body.get('status_events')
+            # Updates emitted just before the response may still be in flight
+            await asyncio.sleep(self.settle)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            if self.sio.connected:
+                await self.sio.disconnect()
+
+
+async def fetch_server_stats(http, base_url):
+    async with http.get(f"{base_url}/api/server/stats", timeout=aiohttp.ClientTimeout(total=10)) as response:
+        return await response.json()
+
+
+async def sample_server(http, base_url, samples, interval):
+    """Poll server memory and threads until cancelled"""
+    while True:
+        try:
+            samples.append(await fetch_server_stats(http, base_url))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        await asyncio.sleep(interval)
+
+
+async def run_level(base_url, users, args):
+    """Run `users` sessions at once and summarise them"""
+    async with aiohttp.ClientSession() as http:
+        before = await fetch_server_stats(http, base_url)
+        samples = [before]
+        sampler = asyncio.create_task(sample_server(http, base_url, samples, args.sample_interval))
+        modifying = round(users * args.modify_fraction)
+        simulated = [SimulatedUser(i, base_url, http, args.max_analysts, i < modifying, args.timeout)
+                     for i in range(users)]
+        started = time.perf_counter()
+        await asyncio.gather(*(user.run() for user in simulated))
+        wall = time.perf_counter() - started
+        sampler.cancel()
+        after = await fetch_server_stats(http, base_url)
+        samples.append(after)
+
+    completed = [user for user in simulated if user.error is None]
+    errors = [user.error for user in simulated if user.error]
+    return {
+        'users': users,
+        'completed': len(completed),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'wall_seconds': round(wall, 2),
+        'sessions_per_minute': round(len(completed) * 60 / wall, 2),
+        'latency': {name: percentiles([user.latencies[name] for user in simulated if name in user.latencies])
+                    for name in ENDPOINTS},
+        'status_lag': percentiles([lag for user in simulated for lag in user.lags]),
+        'status_received': sum(user.received for user in simulated),
+        'status_dropped': sum(user.dropped for user in completed),
+        'status_misrouted': sum(user.misrouted for user in simulated),
+        'status_unrouted': after['status_events']['unrouted'] - before['status_events']['unrouted'],
+        'server_rss_mb': max((sample.get('rss_mb', 0) for sample in samples), default=0),
+        'server_peak_rss_mb': after.get('peak_rss_mb'),
+        'server_threads': max(sample['threads'] for sample in samples),
+        'server_jobs_queued': max((sample.get('jobs', {}).get('queued', 0) for sample in samples), default=0),
+    }
+
+
+def print_level(result):
+    print(f"\n👥 {result['users']} users: {result['completed']} completed, {result['errors']} failed "
+          f"in {result['wall_seconds']}s ({result['sessions_per_minute']} sessions/min)")
+    if result['first_error']:
+        print(f"   ❌ {result['first_error']}")
+    for name, stats in result['latency'].items():
+        if stats:
+            print(f"   {name:<11} p50 {stats['p50']:.3f}s  p95 {stats['p95']:.3f}s  p99 {stats['p99']:.3f}s")
+    lag = result['status_lag']
+    if lag:
+        print(f"   status lag p50 {lag['p50'] * 1000:.1f} ms  p95 {lag['p95'] * 1000:.1f} ms  p99 {lag['p99'] * 1000:.1f} ms")
+    print(f"   status updates: {result['status_received']} received, {result['status_dropped']} dropped, "
+          f"{result['status_misrouted']} misrouted, {result['status_unrouted']} unrouted on the server")
+    print(f"   server: {result['server_rss_mb']} MB RSS, {result['server_threads']} threads, "
+          f"up to {result['server_jobs_queued']} jobs waiting")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test api_server.py with simulated Socket.IO users")
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--users', nargs='+', type=int, default=[1, 5, 10], help="concurrent users per level")
+    parser.add_argument('--max-analysts', type=int, default=2)
+    parser.add_argument('--modify-fraction', type=float, default=0.0,
+                        help="share of users that send analyst feedback before approving")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds allowed per research job")
+    parser.add_argument('--sample-interval', type=float, default=0.5, help="seconds between server stat samples")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        async with aiohttp.ClientSession() as http:
+            await fetch_server_stats(http, args.url)
+    except Exception as e:
+        print(f"❌ Cannot reach {args.url}/api/server/stats ({e}). Start the server with FAKE_PROVIDERS=1 first.")
+        return
+
+    print(f"🚀 Load testing {args.url} with {args.users} concurrent users")
+    results = []
+    for users in args.users:
+        result = await run_level(args.url, users, args)
+        results.append(result)
+        print_level(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': args.url, 'max_analysts': args.max_analysts, 'results': results}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -10,6 +10,16 @@ import SEOHead from './components/SEOHead';
 import useWebSocket from './hooks/useWebSocket';
 import MessageStatusIndicator from './components/MessageStatusIndicator';
 
+// Research runs are queued jobs: poll one until it has finished and return its session
+const waitForJob = async (jobId, interval = 1000) => {
+  for (;;) {
+    const { data } = await axios.get(`${API_BASE_URL}/api/research/${jobId}`);
+    if (data.job?.state === 'completed') return data;
+    if (data.job?.state === 'failed') throw new Error(data.job.error || 'Research job failed');
+    await new Promise(resolve => setTimeout(resolve, interval));
+  }
+};
+
 const App = () => {
   const [messages, setMessages] = useState([]);
   const [inputValue, setInputValue] = useState('');
@@ -30,6 +40,7 @@ const App = () => {
     isConnected, 
     statusUpdates, 
     currentStatus, 
+    reportDraft,
     joinSession, 
     clearStatusUpdates 
   } = useWebSocket();
@@ -60,6 +71,23 @@ const App = () => {
     }
   }, [currentStatus]);
 
+  // Show the report as it is being written
+  useEffect(() => {
+    const draft = ['introduction', 'content', 'conclusion']
+      .map(part => reportDraft[part])
+      .filter(Boolean)
+      .join('\n\n---\n\n');
+    if (!draft || messages.length === 0) return;
+
+    setMessages(prev => {
+      const newMessages = [...prev];
+      const lastIndex = newMessages.length - 1;
+      if (newMessages[lastIndex].type !== 'assistant' || !newMessages[lastIndex].isLoading) return prev;
+      newMessages[lastIndex] = { ...newMessages[lastIndex], draftReport: draft };
+      return newMessages;
+    });
+  }, [reportDraft]);
+
   // Handle research completion from WebSocket
   useEffect(() => {
     const completionUpdate = statusUpdates.find(update => update.step === 'RESEARCH_COMPLETED');
@@ -78,6 +106,7 @@ const App = () => {
           lastMessage.isLoading = false;
           lastMessage.currentStep = null;
           lastMessage.statusMessage = null;
+          lastMessage.draftReport = null;
           
           // Add final report content if available
           if (completionUpdate.final_report) {
@@ -101,17 +130,22 @@ const App = () => {
     const stepMap = {
       'CREATE_ANALYSTS': 'Creating Analyst Team',
       'INITIATE_ALL_INTERVIEWS': 'Starting Interviews',
+      'CONDUCT_INTERVIEW': 'Conducting Interview',
       'ASK_QUESTION': 'Asking Research Questions',
+      'GENERATE_SEARCH_QUERY': 'Writing Search Queries',
+      'RETRIEVE': 'Searching the Web and Wikipedia',
       'SEARCH_WEB': 'Searching the Web',
       'SEARCH_WIKIPEDIA': 'Searching Wikipedia',
       'GENERATE_ANSWER': 'Generating Expert Answers',
       'SAVE_INTERVIEW': 'Saving Interview',
       'WRITE_SECTION': 'Writing Report Section',
+      'CONDENSE_SECTIONS': 'Merging Report Sections',
       'WRITE_REPORT': 'Compiling Research Report',
       'WRITE_INTRODUCTION': 'Writing Introduction',
       'WRITE_CONCLUSION': 'Writing Conclusion',
       'FINALIZE_REPORT': 'Finalizing Report',
       'SESSION_STARTED': 'Session Started',
+      'ANALYSTS_CREATED': 'Analysts Created',
       'RESEARCH_APPROVED': 'Research Approved',
       'RESEARCH_COMPLETED': 'Research Completed',
       'MODIFICATION_STARTED': 'Modifying Analysts',
@@ -166,29 +200,30 @@ const App = () => {
       addMessage(topic, 'user');
       addMessage('🔍 Starting research on your topic...', 'assistant', { isLoading: true });
 
-      const response = await axios.post(`${API_BASE_URL}/api/research/start`, {
+      const accepted = await axios.post(`${API_BASE_URL}/api/research/start`, {
         topic: topic,
         max_analysts: 3
       });
 
+      // Join the WebSocket session for real-time updates while the analysts are created
+      joinSession(accepted.data.session_id);
+      const research = await waitForJob(accepted.data.job_id);
+
       // Remove loading message
       setMessages(prev => prev.slice(0, -1));
 
-      if (response.data.analysts) {
+      if (research.analysts) {
         const sessionData = {
-          id: response.data.session_id,
+          id: research.session_id,
           topic: topic,
-          analysts: response.data.analysts,
+          analysts: research.analysts,
           state: 'awaiting_approval'
         };
         
         setCurrentSession(sessionData);
-        
-        // Join the WebSocket session for real-time updates
-        joinSession(response.data.session_id);
 
         addMessage('👥 I\'ve created a team of AI analysts for your research topic:', 'assistant', {
-          analysts: response.data.analysts,
+          analysts: research.analysts,
           needsApproval: true
         });
       }
@@ -218,7 +253,7 @@ const App = () => {
         statusMessage: 'Beginning comprehensive analysis. Hold tight, this will take 2-3 mins...'
       });
 
-      const response = await axios.post(`${API_BASE_URL}/api/research/approve`, {
+      await axios.post(`${API_BASE_URL}/api/research/approve`, {
         session_id: currentSession.id
       });
 
@@ -244,15 +279,16 @@ const App = () => {
 
       addMessage(`📝 Modifying analyst team based on your feedback: "${feedback}"`, 'assistant', { isLoading: true });
 
-      const response = await axios.post(`${API_BASE_URL}/api/research/modify`, {
+      const accepted = await axios.post(`${API_BASE_URL}/api/research/modify`, {
         session_id: currentSession.id,
         feedback: feedback
       });
+      const research = await waitForJob(accepted.data.job_id);
 
       // Remove loading message
       setMessages(prev => prev.slice(0, -1));
 
-      if (response.data.analysts) {
+      if (research.analysts) {
         // Find the message that will be updated BEFORE starting animation
         const currentMessages = messages;
         const lastAnalystMessageIndex = currentMessages.findLastIndex(msg => 
@@ -268,7 +304,7 @@ const App = () => {
         
         setCurrentSession(prev => ({
           ...prev,
-          analysts: response.data.analysts
+          analysts: research.analysts
         }));
 
         // Wait for fade out animation to complete before updating
@@ -287,7 +323,7 @@ const App = () => {
               newMessages[lastAnalystMessageIndex] = {
                 ...newMessages[lastAnalystMessageIndex],
                 content: '🔄 I\'ve updated the analyst team based on your feedback:',
-                analysts: response.data.analysts,
+                analysts: research.analysts,
                 needsApproval: true,
                 isUpdated: true // Flag to trigger slide-in animation
               };
@@ -298,7 +334,7 @@ const App = () => {
                 content: '🔄 I\'ve updated the analyst team based on your feedback:',
                 type: 'assistant',
                 timestamp: new Date(),
-                analysts: response.data.analysts,
+                analysts: research.analysts,
                 needsApproval: true,
                 isUpdated: true
               });
@@ -1040,6 +1076,11 @@ const App = () => {
                 </div>
                 <div className="message-content">
                   {message.isLoading && <MessageStatusIndicator message={message} isConnected={isConnected} />}
+                  {message.isLoading && message.draftReport && (
+                    <div className="report-content report-draft">
+                      <ReactMarkdown>{message.draftReport}</ReactMarkdown>
+                    </div>
+                  )}
                   {message.isError && (
                     <div className="error-message" role="alert">
                       <AlertCircle size={16} aria-hidden="true" />
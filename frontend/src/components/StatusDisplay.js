@@ -45,12 +45,16 @@ const StatusDisplay = ({ statusUpdates, currentStatus, isConnected }) => {
     const stepMap = {
       'CREATE_ANALYSTS': 'Creating Analyst Team',
       'INITIATE_ALL_INTERVIEWS': 'Starting Interviews',
+      'CONDUCT_INTERVIEW': 'Conducting Interview',
       'ASK_QUESTION': 'Asking Research Questions',
+      'GENERATE_SEARCH_QUERY': 'Writing Search Queries',
+      'RETRIEVE': 'Searching the Web and Wikipedia',
       'SEARCH_WEB': 'Searching the Web',
       'SEARCH_WIKIPEDIA': 'Searching Wikipedia',
       'GENERATE_ANSWER': 'Generating Expert Answers',
       'SAVE_INTERVIEW': 'Saving Interview',
       'WRITE_SECTION': 'Writing Report Section',
+      'CONDENSE_SECTIONS': 'Merging Report Sections',
       'WRITE_REPORT': 'Compiling Research Report',
       'WRITE_INTRODUCTION': 'Writing Introduction',
       'WRITE_CONCLUSION': 'Writing Conclusion',
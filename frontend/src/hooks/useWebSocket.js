@@ -8,6 +8,7 @@ const useWebSocket = () => {
   const [statusUpdates, setStatusUpdates] = useState([]);
   const [currentStatus, setCurrentStatus] = useState(null);
   const [currentSessionId, setCurrentSessionId] = useState(null);
+  const [reportDraft, setReportDraft] = useState({});
 
   useEffect(() => {
     // Create WebSocket connection - use the same base URL as the API
@@ -73,19 +74,32 @@ const useWebSocket = () => {
     });
 
     // Status update handlers - only process if from current session
-    socketRef.current.on('status_update', (status) => {
-      console.log('📊 Status update received:', status);
+    const handleStatusUpdates = (updates) => {
       // Only process status updates for the current session
-      if (!currentSessionId || status.session_id === currentSessionId) {
-        setCurrentStatus(status);
-        setStatusUpdates(prev => [...prev, {
-          ...status,
-          timestamp: new Date(),
-          id: Date.now()
-        }]);
-      } else {
-        console.log('🚫 Ignoring status update for different session:', status.session_id);
+      const current = updates.filter(status => !currentSessionId || status.session_id === currentSessionId);
+      if (current.length < updates.length) {
+        console.log('🚫 Ignoring status updates for a different session');
+      }
+      if (current.length === 0) {
+        return;
       }
+      setCurrentStatus(current[current.length - 1]);
+      setStatusUpdates(prev => [...prev, ...current.map((status, index) => ({
+        ...status,
+        timestamp: new Date(),
+        id: status.seq ? `${status.session_id}-${status.seq}` : Date.now() + index
+      }))]);
+    };
+
+    socketRef.current.on('status_update', (status) => {
+      console.log('📊 Status update received:', status);
+      handleStatusUpdates([status]);
+    });
+
+    // The server sends status updates in batches, with bursts of one step coalesced to the latest
+    socketRef.current.on('status_batch', (batch) => {
+      console.log('📊 Status batch received:', batch.updates.length);
+      handleStatusUpdates(batch.updates);
     });
 
     // Session event handlers - only process if from current session
@@ -117,9 +131,20 @@ const useWebSocket = () => {
       }
     });
 
+    // Report tokens streamed while the introduction, body and conclusion are written
+    socketRef.current.on('report_delta', (data) => {
+      if (!currentSessionId || data.session_id === currentSessionId) {
+        setReportDraft(prev => ({
+          ...prev,
+          [data.part]: (prev[data.part] || '') + data.delta
+        }));
+      }
+    });
+
     socketRef.current.on('research_completed', (data) => {
       console.log('🎉 Research completed:', data);
       if (!currentSessionId || data.session_id === currentSessionId) {
+        setReportDraft({});
         setStatusUpdates(prev => [...prev, {
           step: 'RESEARCH_COMPLETED',
           message: data.message,
@@ -132,6 +157,20 @@ const useWebSocket = () => {
       }
     });
 
+    socketRef.current.on('analysts_created', (data) => {
+      console.log('👥 Analysts created:', data);
+      if (!currentSessionId || data.session_id === currentSessionId) {
+        setStatusUpdates(prev => [...prev, {
+          step: 'ANALYSTS_CREATED',
+          message: data.message,
+          session_id: data.session_id,
+          timestamp: new Date(),
+          id: Date.now(),
+          type: 'creation'
+        }]);
+      }
+    });
+
     socketRef.current.on('analysts_modification_started', (data) => {
       console.log('🔄 Analyst modification started:', data);
       if (!currentSessionId || data.session_id === currentSessionId) {
@@ -191,12 +230,14 @@ const useWebSocket = () => {
   const clearStatusUpdates = () => {
     setStatusUpdates([]);
     setCurrentStatus(null);
+    setReportDraft({});
   };
 
   return {
     isConnected,
     statusUpdates,
     currentStatus,
+    reportDraft,
     joinSession,
     clearStatusUpdates
   };
@@ -7,19 +7,36 @@ import requests
 import time
 import threading
 import json
+import uuid
 from concurrent.futures import ThreadPoolExecutor
 
 # Test configuration
 BASE_URL = "http://localhost:5000"
 SOCKET_URL = "http://localhost:5000"
 
+def wait_for_job(response, timeout=600):
+    """Poll a 202 Accepted job until it finishes; returns the research session, or None if it failed"""
+    if response.status_code != 202:
+        return None
+    job_id = response.json()['job_id']
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        research = requests.get(f"{BASE_URL}/api/research/{job_id}").json()
+        if research['job']['state'] == 'completed':
+            return research
+        if research['job']['state'] == 'failed':
+            print(f"Job {job_id} failed: {research['job']['error']}")
+            return None
+        time.sleep(0.5)
+    return None
+
 def test_user_session(user_id, topic):
     """Simulate a user session"""
     print(f"🧪 User {user_id} starting test with topic: {topic}")
     
-    # Create socket connection
+    # Create socket connection; the session id is picked here so its room can be joined before starting
     sio = socketio.Client()
-    session_id = None
+    session_id = str(uuid.uuid4())
     received_updates = []
     
     @sio.event
@@ -34,31 +51,36 @@ def test_user_session(user_id, topic):
     def on_status_update(data):
         received_updates.append(data)
         print(f"User {user_id}: Received update - {data.get('message', 'No message')[:50]}...")
+    
+    @sio.on('status_batch')
+    def on_status_batch(data):
+        for update in data.get('updates', []):
+            on_status_update(update)
         
     @sio.on('session_started')
     def on_session_started(data):
-        nonlocal session_id
-        session_id = data.get('session_id')
-        print(f"User {user_id}: Session started with ID: {session_id}")
+        print(f"User {user_id}: Session started with ID: {data.get('session_id')}")
     
     try:
-        # Connect to WebSocket
+        # Connect to WebSocket and join the session room
         sio.connect(SOCKET_URL)
-        time.sleep(1)
+        sio.call('join_session', {'session_id': session_id}, timeout=30)
         
-        # Send research request
-        response = requests.post(f"{BASE_URL}/research", json={
+        # Start the research, then approve the generated analysts; both run as queued jobs
+        research = wait_for_job(requests.post(f"{BASE_URL}/api/research/start", json={
+            "session_id": session_id,
             "topic": topic,
-            "analysts": [
-                {"role": "Research Analyst", "goal": f"Research {topic}", "backstory": "Expert researcher"}
-            ]
-        })
+            "max_analysts": 2
+        }))
+        if research:
+            print(f"User {user_id}: Research started, approving analysts")
+            research = wait_for_job(requests.post(f"{BASE_URL}/api/research/approve", json={"session_id": session_id}))
         
-        if response.status_code == 200:
-            print(f"User {user_id}: Research request sent successfully")
+        if research:
+            print(f"User {user_id}: Research completed")
             
-            # Wait for some updates
-            time.sleep(10)
+            # Let the last updates arrive
+            time.sleep(1)
             
             print(f"User {user_id}: Received {len(received_updates)} updates")
             
@@ -76,7 +98,7 @@ def test_user_session(user_id, topic):
                 print(f"✅ User {user_id}: All updates belong to correct session")
                 
         else:
-            print(f"❌ User {user_id}: Research request failed: {response.status_code}")
+            print(f"❌ User {user_id}: Research request failed")
             
     except Exception as e:
         print(f"❌ User {user_id}: Error - {e}")
@@ -91,12 +113,12 @@ def test_user_session(user_id, topic):
     }
 
 def main():
-    """Run multi-user test"""
+    """Run multi-user test (start the server with FAKE_PROVIDERS=1 to avoid live API calls; see load_test.py)"""
     print("🚀 Starting multi-user session isolation test...")
     
     # Check if server is running
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = requests.get(f"{BASE_URL}/api/health")
         if response.status_code != 200:
             print("❌ Server not responding. Please start the backend first.")
             return
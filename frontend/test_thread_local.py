@@ -1,24 +1,33 @@
 #!/usr/bin/env python3
 """
-Test script to verify thread-local storage session isolation
+Test script to verify contextvars session isolation
+
+The session context used to live in thread-local storage, which LangGraph's
+executor threads never saw. It is now a ContextVar, which follows the request
+into every task started with a copied context (as LangGraph and the research
+assistant do for Send branches and parallel work).
 """
+import contextvars
 import threading
 import time
 import requests
 import json
 from concurrent.futures import ThreadPoolExecutor
 
-# Simulate the thread-local mechanism
-thread_local = threading.local()
+# Simulate the session context mechanism
+current_session = contextvars.ContextVar("current_session", default=None)
+
+# Shared worker pool, like LangGraph's executor
+node_executor = ThreadPoolExecutor(max_workers=2)
 
 def set_session_context(session_id):
-    """Set the session ID in thread-local storage for the current request thread"""
-    thread_local.session_id = session_id
+    """Set the session ID in the context of the current request"""
+    current_session.set(session_id)
     print(f"🧵 Thread {threading.current_thread().ident}: Set session context to {session_id}")
 
 def get_session_context():
-    """Get the session ID from thread-local storage for the current request thread"""
-    session_id = getattr(thread_local, 'session_id', None)
+    """Get the session ID from the context of the current request"""
+    session_id = current_session.get()
     print(f"🧵 Thread {threading.current_thread().ident}: Got session context: {session_id}")
     return session_id
 
@@ -29,9 +38,9 @@ def simulate_research_session(user_id, session_id):
     # Set session context for this thread
     set_session_context(session_id)
     
-    # Simulate multiple status updates
+    # Simulate multiple status updates, sent from a shared worker thread like a graph node's
     for i in range(5):
-        current_session = get_session_context()
+        current_session = node_executor.submit(contextvars.copy_context().run, get_session_context).result()
         print(f"📊 User {user_id}: Status update {i+1} - Session context: {current_session}")
         
         if current_session != session_id:
@@ -49,8 +58,8 @@ def simulate_research_session(user_id, session_id):
     }
 
 def test_concurrent_sessions():
-    """Test that thread-local storage isolates sessions correctly"""
-    print("🧪 Testing Thread-Local Storage Session Isolation")
+    """Test that the session context isolates sessions correctly, including on worker threads"""
+    print("🧪 Testing contextvars Session Isolation")
     print("=" * 60)
     
     # Test scenarios
@@ -86,15 +95,15 @@ def test_concurrent_sessions():
     
     print("-" * 30)
     if all_passed:
-        print("🎉 ALL TESTS PASSED: Thread-local storage is working correctly!")
+        print("🎉 ALL TESTS PASSED: contextvars session context is working correctly!")
     else:
-        print("❌ TESTS FAILED: Thread-local storage is not isolating sessions properly!")
+        print("❌ TESTS FAILED: contextvars session context is not isolating sessions properly!")
     
     return all_passed
 
 def test_api_endpoints():
-    """Test actual API endpoints to ensure they work with thread-local storage"""
-    print("\n🌐 Testing API Endpoints with Thread-Local Storage")
+    """Test actual API endpoints to ensure they are reachable"""
+    print("\n🌐 Testing API Endpoints")
     print("=" * 60)
     
     base_url = "http://localhost:5000"
@@ -117,10 +126,10 @@ def test_api_endpoints():
     return True
 
 if __name__ == "__main__":
-    print("🔬 Thread-Local Storage Test Suite")
+    print("🔬 Session Context Test Suite")
     print("=" * 60)
     
-    # Test 1: Thread-local storage mechanism
+    # Test 1: Session context mechanism
     thread_test_passed = test_concurrent_sessions()
     
     # Test 2: API endpoint accessibility
@@ -128,10 +137,10 @@ if __name__ == "__main__":
     
     print("\n🏆 FINAL RESULTS:")
     print("=" * 60)
-    print(f"Thread-Local Storage Test: {'✅ PASSED' if thread_test_passed else '❌ FAILED'}")
+    print(f"Session Context Test: {'✅ PASSED' if thread_test_passed else '❌ FAILED'}")
     print(f"API Endpoint Test: {'✅ PASSED' if api_test_passed else '❌ FAILED'}")
     
     if thread_test_passed and api_test_passed:
-        print("\n🎉 All tests passed! The thread-local storage implementation should work correctly.")
+        print("\n🎉 All tests passed! The session context implementation should work correctly.")
     else:
         print("\n⚠️ Some tests failed. Please review the implementation.")
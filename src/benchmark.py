@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the research graphs (runs offline, no API keys needed).
+
+Gemini, Tavily and Wikipedia are replaced by the deterministic fakes in
+fakes.py, so every run does the same work with the same simulated provider
+latencies (scaled by --time-scale). graph (create analysts, approve at
+human_feedback, resume) and graph_no_interrupt are run over a matrix of
+max_analysts, max_num_turns and concurrency. For each configuration:
+
+- throughput (sessions per second) and p50/p95/p99 session latency,
+- graph overhead: session latency and mean wall time per node call in a
+  second pass with zero provider latency, i.e. what the graph itself spends,
+- peak RSS of the benchmark process so far.
+
+Results are compared with a baseline recorded on the same machine (absolute
+throughput, latency and RSS do not carry over between hosts, so baselines are
+not committed). The first run records it in .cache/benchmark_baseline.json;
+later runs compare with it, and a metric worse than the baseline by more than
+--tolerance is a regression and the exit code is 1. The LLM and search caches
+are off unless --cache is given, so repeated sessions are not served from
+them.
+
+Usage:
+    python benchmark.py                     # default matrix, compared with this machine's baseline
+    python benchmark.py --save-baseline     # record a new baseline
+    python benchmark.py --graphs graph_no_interrupt --analysts 4 --turns 2 --concurrency 1 16 --runs 32
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "benchmark_baseline.json")
+
+TOPIC = "Machine learning in drug discovery"
+
+GRAPHS = ("graph", "graph_no_interrupt")
+
+# Metrics compared with the baseline -> whether higher is better
+COMPARED = {
+    "throughput": True,
+    "p50": False,
+    "p95": False,
+    "p99": False,
+    "overhead_seconds": False,
+    "peak_rss_mb": False,
+}
+
+# Nodes that run the interview subgraph; their wall time is the subgraph's nodes, not their own
+CONTAINER_NODES = ("conduct_interview",)
+
+
+# Factories in research_assistant whose results depend on the environment use_fake_providers sets
+ENV_FACTORIES = ("fake_providers", "get_llm", "web_search_tool", "get_checkpointer", "get_graph",
+                 "get_graph_no_interrupt")
+
+
+@contextlib.contextmanager
+def environ(**values):
+    """os.environ with `values` set, restored on exit"""
+    saved = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def clear_factories(research_assistant):
+    for name in ENV_FACTORIES:
+        getattr(research_assistant, name).cache_clear()
+
+
+@contextlib.contextmanager
+def use_fake_providers(time_scale: float, cache: bool = False):
+    """research_assistant wired to the fakes, with the caches off unless `cache`.
+
+    The environment, the caches and the providers and graph built under them are restored on exit. """
+    # Checkpoints in memory, unless set explicitly
+    with environ(FAKE_PROVIDERS="1", CHECKPOINT_PATH=os.getenv("CHECKPOINT_PATH", "")):
+        import research_assistant
+
+        caches = (research_assistant.llm_cache.enabled, research_assistant.search_cache.enabled)
+        clear_factories(research_assistant)
+        research_assistant.fake_providers().set_time_scale(time_scale)
+        research_assistant.llm_cache.enabled = cache
+        research_assistant.search_cache.enabled = cache
+        try:
+            yield research_assistant
+        finally:
+            research_assistant.llm_cache.enabled, research_assistant.search_cache.enabled = caches
+            clear_factories(research_assistant)
+
+
+def percentile(samples: list, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(math.ceil(len(samples) * q) - 1, 0))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def initial_state(max_analysts: int, max_num_turns: int) -> dict:
+    return {"topic": TOPIC, "max_analysts": max_analysts, "max_num_turns": max_num_turns,
+            "human_analyst_feedback": ""}
+
+
+def run_session(ra, graph_name: str, max_analysts: int, max_num_turns: int, session: str) -> float:
+    """Seconds for one session to produce its final report"""
+    config = ra.thread_config(session)
+    started = time.perf_counter()
+    if graph_name == "graph":
+        ra.graph.invoke(initial_state(max_analysts, max_num_turns), config)
+        ra.graph.update_state(config, {"human_analyst_feedback": "approve"}, as_node="human_feedback")
+        result = ra.graph.invoke(None, config)
+    else:
+        result = ra.graph_no_interrupt.invoke(initial_state(max_analysts, max_num_turns), config)
+    if not result.get("final_report"):
+        raise RuntimeError(f"session {session} finished without a report")
+    return time.perf_counter() - started
+
+
+async def arun_session(ra, graph_name: str, max_analysts: int, max_num_turns: int, session: str) -> float:
+    """Async counterpart of run_session"""
+    config = ra.thread_config(session)
+    started = time.perf_counter()
+    if graph_name == "graph":
+        await ra.graph.ainvoke(initial_state(max_analysts, max_num_turns), config)
+        await ra.graph.aupdate_state(config, {"human_analyst_feedback": "approve"}, as_node="human_feedback")
+        result = await ra.graph.ainvoke(None, config)
+    else:
+        result = await ra.graph_no_interrupt.ainvoke(initial_state(max_analysts, max_num_turns), config)
+    if not result.get("final_report"):
+        raise RuntimeError(f"session {session} finished without a report")
+    return time.perf_counter() - started
+
+
+def run_sessions(ra, graph_name: str, max_analysts: int, max_num_turns: int,
+                 concurrency: int, runs: int, use_async: bool = False):
+    """(session latencies, failures, wall seconds, session ids) for `runs` sessions, `concurrency` at a time"""
+    sessions = [f"bench-{uuid.uuid4().hex[:12]}" for _ in range(runs)]
+    latencies, failures = [], []
+    started = time.perf_counter()
+
+    if use_async:
+        async def run_all():
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one(session):
+                async with slots:
+                    return await arun_session(ra, graph_name, max_analysts, max_num_turns, session)
+            return await asyncio.gather(*(one(session) for session in sessions), return_exceptions=True)
+        outcomes = asyncio.run(run_all())
+    else:
+        def one(session):
+            try:
+                return run_session(ra, graph_name, max_analysts, max_num_turns, session)
+            except Exception as e:
+                return e
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, sessions))
+
+    wall = time.perf_counter() - started
+    for outcome in outcomes:
+        (failures if isinstance(outcome, BaseException) else latencies).append(outcome)
+    return latencies, failures, wall, sessions
+
+
+def node_seconds(sessions: list) -> dict:
+    """Mean wall seconds per call of each node across sessions (see metrics.session_usage)"""
+    from metrics import metrics
+
+    totals = {}
+    for session in sessions:
+        for row in metrics.session_usage(session):
+            entry = totals.setdefault(row["node"], [0, 0.0])
+            entry[0] += row["runs"]
+            entry[1] += row["seconds"]
+    return {node: round(seconds / runs, 4) for node, (runs, seconds) in sorted(totals.items())
+            if runs and node not in CONTAINER_NODES}
+
+
+def benchmark_config(ra, graph_name: str, max_analysts: int, max_num_turns: int, concurrency: int,
+                     runs: int, time_scale: float, use_async: bool = False, overhead: bool = True) -> dict:
+    """One configuration: a pass with scaled provider latency, then one with none to isolate graph overhead"""
+    from metrics import metrics
+
+    metrics.max_sessions = max(metrics.max_sessions, runs)
+    fakes = ra.fake_providers()
+    fakes.set_time_scale(time_scale)
+    latencies, failures, wall, _ = run_sessions(ra, graph_name, max_analysts, max_num_turns,
+                                                concurrency, runs, use_async)
+    result = {
+        "graph": graph_name, "max_analysts": max_analysts, "max_num_turns": max_num_turns,
+        "concurrency": concurrency, "runs": runs, "failures": len(failures),
+        "throughput": round(len(latencies) / wall, 3),
+    }
+    if failures:
+        result["error"] = f"{type(failures[0]).__name__}: {failures[0]}"[:200]
+    if latencies:
+        result.update({f"p{q}": round(percentile(latencies, q / 100), 4) for q in (50, 95, 99)})
+
+    if overhead:
+        fakes.set_time_scale(0)
+        try:
+            latencies, _, _, sessions = run_sessions(ra, graph_name, max_analysts, max_num_turns,
+                                                     concurrency, runs, use_async)
+        finally:
+            fakes.set_time_scale(time_scale)
+        if latencies:
+            result["overhead_seconds"] = round(sum(latencies) / len(latencies), 4)
+        result["node_overhead_seconds"] = node_seconds(sessions)
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def config_key(result: dict) -> str:
+    return (f"{result['graph']}/analysts={result['max_analysts']}/turns={result['max_num_turns']}"
+            f"/concurrency={result['concurrency']}")
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """(config, metric, baseline, current, relative change) for every metric worse than baseline by > tolerance"""
+    previous = {config_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(config_key(result))
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((config_key(result), metric, old, new, change))
+    return regressions
+
+
+def print_result(result: dict):
+    line = f"{config_key(result):<58} {result['throughput']:>8.2f}/s"
+    if "p50" in result:
+        line += f"  p50 {result['p50']:.3f}s  p95 {result['p95']:.3f}s  p99 {result['p99']:.3f}s"
+    if "overhead_seconds" in result:
+        line += f"  overhead {result['overhead_seconds']:.3f}s"
+    line += f"  rss {result['peak_rss_mb']:.0f} MB"
+    if result["failures"]:
+        line += f"  ❌ {result['failures']} failed ({result['error']})"
+    print(line)
+    slowest = sorted(result.get("node_overhead_seconds", {}).items(), key=lambda item: -item[1])[:4]
+    if slowest:
+        print("    node overhead: " + ", ".join(f"{node} {seconds * 1000:.1f} ms" for node, seconds in slowest))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the research graphs against fake providers")
+    parser.add_argument("--graphs", nargs="+", choices=GRAPHS, default=list(GRAPHS))
+    parser.add_argument("--analysts", nargs="+", type=int, default=[2, 4], help="max_analysts values")
+    parser.add_argument("--turns", nargs="+", type=int, default=[1, 2], help="max_num_turns values")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8], help="sessions run at once")
+    parser.add_argument("--runs", type=int, default=8, help="sessions per configuration")
+    parser.add_argument("--time-scale", type=float, default=0.02,
+                        help="multiplier on the fake provider latencies (see fakes.py)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run sessions with ainvoke")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM and search caches on")
+    parser.add_argument("--no-overhead", dest="overhead", action="store_false",
+                        help="skip the zero-latency pass that measures graph overhead")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="relative change allowed before a regression (small runs are noisy)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    configs = list(itertools.product(args.graphs, args.analysts, args.turns, args.concurrency))
+    print(f"🚀 Benchmarking {len(configs)} configurations, {args.runs} sessions each "
+          f"(time scale {args.time_scale}, {'async' if args.use_async else 'sync'})")
+
+    results = []
+    with use_fake_providers(args.time_scale, args.cache) as ra:
+        for graph_name, max_analysts, max_num_turns, concurrency in configs:
+            # Status updates are echoed for every node; keep them out of the report
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = benchmark_config(ra, graph_name, max_analysts, max_num_turns, concurrency, args.runs,
+                                          args.time_scale, args.use_async, args.overhead)
+                ra.status_console.flush()
+            results.append(result)
+            print_result(result)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "host": {"name": platform.node(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "settings": {"runs": args.runs, "time_scale": args.time_scale, "async": args.use_async, "cache": args.cache},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline for this machine saved to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("host") != report["host"]:
+        print(f"⚠️ Baseline was recorded on {baseline.get('host')}, not this machine; "
+              f"run with --save-baseline to record one here")
+    if baseline.get("settings") != report["settings"]:
+        print(f"⚠️ Baseline settings {baseline.get('settings')} differ from this run's; changes may not be comparable")
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return
+    print(f"❌ {len(regressions)} regressions against {args.baseline}:")
+    for key, metric, old, new, change in regressions:
+        print(f"    {key} {metric}: {old} -> {new} ({change:+.0%})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,530 @@
+"""
+Response caches shared by every research session.
+
+LLMCache sits in front of the shared Gemini client. It has an in-memory LRU
+tier backed by an on-disk SQLite tier with a TTL, and it coalesces identical
+in-flight calls so concurrent sessions share a single upstream request.
+
+SearchCache stores the formatted Tavily and Wikipedia results so repeat
+topics skip the retrieval round trips. Identical in-flight searches are
+coalesced too, but a search waits on another at most SEARCH_CACHE_WAIT_SECONDS
+before fetching for itself, so one hung request does not hold up the rest.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage, message_to_dict, messages_from_dict
+
+from textutils import normalize_query
+
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with an optional per-entry TTL.
+
+    Eviction is bounded by entry count and, when max_bytes is set, by the
+    total UTF-8 size of the stored string values. """
+
+    def __init__(self, max_entries: int = 512, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(value) -> int:
+        if isinstance(value, str):
+            return len(value.encode("utf-8"))
+        return len(value) if isinstance(value, bytes) else 0
+
+    def _pop(self, key: str):
+        value, _ = self._data.pop(key)
+        self.size_bytes -= self._sizeof(value)
+
+    def get(self, key: str, default=MISSING):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                self._pop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at)
+            self.size_bytes += self._sizeof(value)
+            while len(self._data) > 1 and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self.size_bytes > self.max_bytes)
+            ):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk key/value tier with a TTL, safe to share between threads and processes"""
+
+    def __init__(self, path: str, ttl: float, table: str = "cache"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._conn.commit()
+            self._writes += 1
+            purge = self._writes % 500 == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+
+class _Flight:
+    """An upstream call that other callers with the same key are waiting on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # Set when the leader gave up (timed out or was cancelled) rather than the call failing
+        self.abandoned = False
+
+
+# Result of an async flight whose leader gave up; its followers start over
+ABANDONED = object()
+
+
+class WaitTimeout(TimeoutError):
+    """A caller gave up waiting on a coalesced call that another caller is making"""
+
+
+def _shared_failure(error: BaseException) -> bool:
+    """Whether followers should see the leader's error: not when it was the leader's own timeout or cancellation"""
+    return isinstance(error, Exception) and not isinstance(error, TimeoutError)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    do()/ado() return (value, shared) where shared is True for callers that
+    waited on another caller's result. Async flights are scoped to their
+    event loop.
+
+    Each caller waits at most its own timeout. A leader's timeout or
+    cancellation is its own: its followers do not inherit the error, one of
+    them takes over the call instead. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+
+    @staticmethod
+    def _remaining(expires: Optional[float]) -> Optional[float]:
+        if expires is None:
+            return None
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise WaitTimeout("gave up waiting for a coalesced call")
+        return remaining
+
+    def do(self, key, fn: Callable[[], Any], timeout: Optional[float] = None):
+        expires = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+
+            if leader:
+                break
+            if not flight.done.wait(self._remaining(expires)):
+                raise WaitTimeout("gave up waiting for a coalesced call")
+            if flight.abandoned:
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        try:
+            flight.value = fn()
+            return flight.value, False
+        except BaseException as e:
+            if _shared_failure(e):
+                flight.error = e
+            else:
+                flight.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    async def ado(self, key, afn: Callable[[], Any], timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        expires = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                future = self._async_flights.get(flight_key)
+                leader = future is None
+                if leader:
+                    future = self._async_flights[flight_key] = loop.create_future()
+
+            if leader:
+                break
+            # The shield keeps a follower's own timeout or cancellation from cancelling the flight
+            try:
+                value = await asyncio.wait_for(asyncio.shield(future), self._remaining(expires))
+            except asyncio.TimeoutError:
+                raise WaitTimeout("gave up waiting for a coalesced call") from None
+            if value is not ABANDONED:
+                return value, True
+
+        try:
+            value = await afn()
+            future.set_result(value)
+            return value, False
+        except BaseException as e:
+            if _shared_failure(e):
+                future.set_exception(e)
+                # Mark the exception as retrieved when nobody else was waiting
+                future.exception()
+            else:
+                future.set_result(ABANDONED)
+            raise
+        finally:
+            with self._lock:
+                self._async_flights.pop(flight_key, None)
+
+
+class LLMCache:
+    """Two-tier cache with single-flight for chat model responses and structured outputs"""
+
+    def __init__(self, max_entries: int = 512, path: Optional[str] = None,
+                 ttl: float = 24 * 3600, enabled: bool = True):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries, ttl)
+        self.disk = SQLiteCache(path, ttl, table="llm_cache") if (enabled and path) else None
+        self.flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    # Keys and (de)serialization
+
+    @staticmethod
+    def make_key(model: Any, messages: list, schema: Optional[type] = None) -> str:
+        """Key a call on model, system prompt, conversation and structured-output schema"""
+        system = [m.content for m in messages if isinstance(m, SystemMessage)]
+        # Message ids and response metadata differ between otherwise identical runs
+        conversation = [
+            {"type": m.type, "name": m.name, "content": m.content}
+            for m in messages if not isinstance(m, SystemMessage)
+        ]
+        payload = {
+            "model": getattr(model, "model", type(model).__name__),
+            "temperature": getattr(model, "temperature", None),
+            "system": system,
+            "messages": conversation,
+            "schema": schema.model_json_schema() if schema else None,
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def encode(value) -> str:
+        if isinstance(value, BaseMessage):
+            return json.dumps({"kind": "message", "data": message_to_dict(value)})
+        return json.dumps({"kind": "model", "data": value.model_dump(mode="json")})
+
+    @staticmethod
+    def decode(raw: str, schema: Optional[type] = None):
+        item = json.loads(raw)
+        if item["kind"] == "model":
+            return schema.model_validate(item["data"])
+        return messages_from_dict([item["data"]])[0]
+
+    # Lookups
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def lookup(self, key: str):
+        """Return the cached encoding for key, promoting disk hits into memory"""
+        raw = self.memory.get(key, None)
+        if raw is not None:
+            self._count("memory_hits")
+            return raw
+        if self.disk is not None:
+            raw = self.disk.get(key)
+            if raw is not None:
+                self.memory.set(key, raw)
+                self._count("disk_hits")
+                return raw
+        return None
+
+    def store(self, key: str, value) -> str:
+        raw = self.encode(value)
+        self.memory.set(key, raw)
+        if self.disk is not None:
+            self.disk.set(key, raw)
+        return raw
+
+    def call(self, key: str, call: Callable[[], Any], schema: Optional[type] = None,
+             timeout: Optional[float] = None):
+        """Return a cached response for key, or run call once for all concurrent callers.
+
+        timeout bounds how long this caller waits on a call another caller is making. """
+        if not self.enabled:
+            return call()
+
+        raw = self.lookup(key)
+        if raw is not None:
+            return self.decode(raw, schema)
+
+        # The leader keeps its live response; followers decode their own copy
+        response = {}
+        def fetch():
+            try:
+                response["value"] = call()
+            except Exception:
+                self._count("errors")
+                raise
+            return self.store(key, response["value"])
+
+        raw, shared = self.flights.do(key, fetch, timeout)
+        self._count("coalesced" if shared else "misses")
+        return self.decode(raw, schema) if shared else response["value"]
+
+    async def acall(self, key: str, call: Callable[[], Any], schema: Optional[type] = None,
+                    timeout: Optional[float] = None):
+        """Async counterpart of call"""
+        if not self.enabled:
+            return await call()
+
+        raw = self.lookup(key)
+        if raw is not None:
+            return self.decode(raw, schema)
+
+        response = {}
+        async def fetch():
+            try:
+                response["value"] = await call()
+            except Exception:
+                self._count("errors")
+                raise
+            return self.store(key, response["value"])
+
+        raw, shared = await self.flights.ado(key, fetch, timeout)
+        self._count("coalesced" if shared else "misses")
+        return self.decode(raw, schema) if shared else response["value"]
+
+    def stats(self) -> dict:
+        """Hit/miss counters for export"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+class SearchCache:
+    """Retrieval cache for formatted <Document> blobs, keyed on source and normalized query.
+
+    Each source has its own TTL (web results go stale faster than
+    encyclopedia pages) and all sources share one size-bounded LRU. A search
+    waits at most `wait` seconds on an identical one in flight, then fetches
+    for itself. """
+
+    def __init__(self, ttls: dict, max_bytes: int = 32 * 1024 * 1024,
+                 max_entries: int = 4096, enabled: bool = True, wait: Optional[float] = 30.0):
+        self.enabled = enabled
+        self.ttls = ttls
+        self.wait = wait
+        self.memory = LRUCache(max_entries, max_bytes=max_bytes)
+        self.flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def make_key(source: str, query: str) -> str:
+        return f"{source}:{normalize_query(query)}"
+
+    def _count(self, source: str, stat: str):
+        with self._lock:
+            counters = self._stats.setdefault(source, {"hits": 0, "misses": 0, "coalesced": 0, "wait_timeouts": 0})
+            counters[stat] += 1
+
+    def get(self, source: str, query: str) -> Optional[str]:
+        """Cached blob for a query, or None"""
+        if not self.enabled:
+            return None
+        return self.memory.get(self.make_key(source, query), None)
+
+    def set(self, source: str, query: str, blob: str):
+        if self.enabled:
+            self.memory.set(self.make_key(source, query), blob, ttl=self.ttls.get(source))
+
+    def call(self, source: str, query: str, fetch: Callable[[], str]) -> str:
+        """Return the cached blob for (source, query), fetching it at most once concurrently"""
+        if not self.enabled:
+            return fetch()
+
+        key = self.make_key(source, query)
+        blob = self.memory.get(key, None)
+        if blob is not None:
+            self._count(source, "hits")
+            return blob
+
+        def fetch_and_store():
+            blob = fetch()
+            self.memory.set(key, blob, ttl=self.ttls.get(source))
+            return blob
+
+        try:
+            blob, shared = self.flights.do(key, fetch_and_store, self.wait)
+        except WaitTimeout:
+            # The search waited on is stuck; make this one without it
+            self._count(source, "wait_timeouts")
+            return fetch_and_store()
+        self._count(source, "coalesced" if shared else "misses")
+        return blob
+
+    async def acall(self, source: str, query: str, fetch: Callable[[], Any]) -> str:
+        """Async counterpart of call"""
+        if not self.enabled:
+            return await fetch()
+
+        key = self.make_key(source, query)
+        blob = self.memory.get(key, None)
+        if blob is not None:
+            self._count(source, "hits")
+            return blob
+
+        async def fetch_and_store():
+            blob = await fetch()
+            self.memory.set(key, blob, ttl=self.ttls.get(source))
+            return blob
+
+        try:
+            blob, shared = await self.flights.ado(key, fetch_and_store, self.wait)
+        except WaitTimeout:
+            self._count(source, "wait_timeouts")
+            return await fetch_and_store()
+        self._count(source, "coalesced" if shared else "misses")
+        return blob
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {source: dict(counters) for source, counters in self._stats.items()}
+        stats["entries"] = len(self.memory)
+        stats["size_bytes"] = self.memory.size_bytes
+        stats["evictions"] = self.memory.evictions
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+
+
+def _env_flag(name: str, default: str = "1") -> bool:
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def llm_cache_from_env() -> LLMCache:
+    """Build the process-wide LLM cache from LLM_CACHE_* environment variables"""
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cache.sqlite")
+    path = os.getenv("LLM_CACHE_PATH", default_path)
+    return LLMCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+        path=path or None,
+        ttl=float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))),
+        enabled=_env_flag("LLM_CACHE"),
+    )
+
+
+def search_cache_from_env() -> SearchCache:
+    """Build the process-wide retrieval cache from SEARCH_CACHE_* environment variables"""
+    return SearchCache(
+        ttls={
+            "web": float(os.getenv("SEARCH_CACHE_WEB_TTL", str(3600))),
+            "wikipedia": float(os.getenv("SEARCH_CACHE_WIKIPEDIA_TTL", str(7 * 24 * 3600))),
+        },
+        max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        enabled=_env_flag("SEARCH_CACHE"),
+        wait=float(os.getenv("SEARCH_CACHE_WAIT_SECONDS", "30")),
+    )
@@ -0,0 +1,182 @@
+"""
+Persistent checkpoints for the research graph.
+
+Every step of a run is saved under its thread_id, so a session paused at
+human_feedback can be resumed with graph.invoke(None, config) instead of
+being rebuilt from scratch. A run interrupted by a crash or restart picks
+up from the last saved step: interviews that already finished keep their
+sections and are not run again.
+
+Checkpoints are stored in SQLite (WAL mode) and compressed with zlib, since
+interview state is mostly repetitive text (messages and source documents).
+A finished run keeps only its last checkpoint (enough to restore the
+session and its report), and threads not written to for
+CHECKPOINT_RETENTION_SECONDS are deleted.
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(__file__), ".cache", "checkpoints.sqlite")
+
+# Threads idle for longer than this are deleted (a week)
+DEFAULT_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Small values (channel versions, short strings) are not worth compressing
+COMPRESS_MIN_BYTES = 512
+
+# Application types stored in graph state that checkpoints may load back
+CHECKPOINT_TYPES = [("schema", "Analyst")]
+
+
+class CompressedSerializer(SerializerProtocol):
+    """Serializer that zlib-compresses the output of another serializer.
+
+    Compressed values are tagged by appending "+zlib" to their type, so data
+    written before compression was enabled still loads. """
+
+    def __init__(self, serde: SerializerProtocol = None, level: int = 6,
+                 min_bytes: int = COMPRESS_MIN_BYTES):
+        self.serde = serde or JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES)
+        self.level = level
+        self.min_bytes = min_bytes
+
+    def dumps_typed(self, obj: Any) -> tuple:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_bytes:
+            return type_, data
+        return f"{type_}+zlib", zlib.compress(data, self.level)
+
+    def loads_typed(self, data: tuple) -> Any:
+        type_, payload = data
+        if type_.endswith("+zlib"):
+            return self.serde.loads_typed((type_[:-len("+zlib")], zlib.decompress(payload)))
+        return self.serde.loads_typed(data)
+
+
+class SqliteCheckpointer(SqliteSaver):
+    """SqliteSaver that also serves graph.ainvoke, and does not keep threads forever.
+
+    SQLite calls are short, so the async methods run the sync ones on a worker
+    thread rather than holding a second aiosqlite connection per event loop.
+
+    The last write to each thread is recorded; prune() deletes threads idle
+    for longer than `retention` seconds (0 keeps them), and runs every
+    `prune_every` checkpoints. """
+
+    def __init__(self, conn, *, serde=None, retention: float = DEFAULT_RETENTION_SECONDS, prune_every: int = 500):
+        super().__init__(conn, serde=serde)
+        self.retention = retention
+        self.prune_every = prune_every
+        self._puts = 0
+
+    def setup(self):
+        if self.is_setup:
+            return
+        super().setup()
+        # Called from cursor(), which already holds the lock
+        self.conn.execute("CREATE TABLE IF NOT EXISTS thread_activity "
+                          "(thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+        # Threads written before activity was recorded age from now
+        self.conn.execute("INSERT OR IGNORE INTO thread_activity SELECT DISTINCT thread_id, ? FROM checkpoints",
+                          (time.time(),))
+        self.conn.commit()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cur:
+            cur.execute("INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                        (str(config["configurable"]["thread_id"]), time.time()))
+        with self.lock:
+            self._puts += 1
+            prune = self._puts % self.prune_every == 0
+        if prune:
+            self.prune()
+        return saved
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    def finish_thread(self, thread_id: str):
+        """Drop every checkpoint of a finished run but its last, which is all get_state needs"""
+        thread_id = str(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns != ''", (thread_id,))
+            cur.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns != ''", (thread_id,))
+            row = cur.execute("SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()
+            if row[0] is None:
+                return
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, row[0]))
+            cur.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, row[0]))
+
+    def prune(self) -> int:
+        """Delete threads not written to for `retention` seconds; returns how many"""
+        if not self.retention:
+            return 0
+        with self.cursor() as cur:
+            rows = cur.execute("SELECT thread_id FROM thread_activity WHERE updated_at < ?",
+                               (time.time() - self.retention,)).fetchall()
+        for (thread_id,) in rows:
+            self.delete_thread(thread_id)
+        return len(rows)
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def checkpointer_from_env():
+    """Checkpointer configured from CHECKPOINT_PATH and CHECKPOINT_RETENTION_SECONDS.
+
+    An empty CHECKPOINT_PATH keeps checkpoints in memory (lost on restart). """
+    path = os.getenv("CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+    serde = CompressedSerializer()
+    if not path:
+        return InMemorySaver(serde=serde)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    retention = float(os.getenv("CHECKPOINT_RETENTION_SECONDS", DEFAULT_RETENTION_SECONDS))
+    checkpointer = SqliteCheckpointer(conn, serde=serde, retention=retention)
+    checkpointer.setup()
+    checkpointer.prune()
+    return checkpointer
+
+
+def thread_config(thread_id: str, recursion_limit: int = 100, budget_seconds: float = None) -> dict:
+    """Run config that saves and resumes checkpoints under thread_id.
+
+    LLM calls made by the run must finish within budget_seconds (RUN_BUDGET_SECONDS
+    by default, 0 for no limit) of the config being created. """
+    if budget_seconds is None:
+        budget_seconds = float(os.getenv("RUN_BUDGET_SECONDS", "1200"))
+    configurable = {"thread_id": thread_id}
+    if budget_seconds > 0:
+        configurable["deadline"] = time.time() + budget_seconds
+    return {"configurable": configurable, "recursion_limit": recursion_limit}
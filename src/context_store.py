@@ -0,0 +1,146 @@
+"""
+Per-interview context store.
+
+InterviewState.context is reduced with merge_context, which keeps one entry
+per source document: a document already in the context (same canonical URL,
+or the same content under another URL) is not appended again. Each turn,
+generate_answer records what it showed the expert in
+InterviewState.seen_context (the keys of the passages it picked, or of whole
+documents when passage ranking is off), so later turns can send only what is
+new.
+"""
+
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from passages import DOCUMENT_PATTERN, parse_documents
+
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "mc_cid", "mc_eid", "ref"})
+TRACKING_PREFIXES = ("utm_",)
+
+
+def is_tracking_param(key: str) -> bool:
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so trivially different links to one page compare equal"""
+    parts = urlsplit(url.strip())
+    if not parts.scheme:
+        return url.strip()
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    host = host.replace(".m.wikipedia.org", ".wikipedia.org")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query)
+        if not is_tracking_param(key)
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def content_hash(body: str) -> str:
+    normalized = " ".join(body.casefold().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def document_keys(header: str, body: str) -> tuple:
+    """(url key, content key) identifying a document"""
+    attributes = dict(ATTRIBUTE_PATTERN.findall(header))
+    url = attributes.get("href") or attributes.get("source") or ""
+    page = attributes.get("page", "")
+    url_key = f"url:{canonical_url(url)}#{page}" if url else None
+    return url_key, f"sha1:{content_hash(body)}"
+
+
+def document_key(header: str, body: str) -> str:
+    """Stable key recorded in seen_context"""
+    url_key, hash_key = document_keys(header, body)
+    return url_key or hash_key
+
+
+def passage_key(doc_key: str, passage_index: int) -> str:
+    """Key recorded in seen_context for one passage of a document"""
+    return f"{doc_key}|passage:{passage_index}"
+
+
+def seen_passages(documents: list, seen_keys) -> set:
+    """(doc_index, passage_index) of the passages of (header, body) documents the expert has been shown"""
+    by_document = {}
+    for key in seen_keys or []:
+        doc_key, separator, passage_index = key.rpartition("|passage:")
+        if separator:
+            by_document.setdefault(doc_key, set()).add(int(passage_index))
+    if not by_document:
+        return set()
+    return {
+        (doc_index, passage_index)
+        for doc_index, (header, body) in enumerate(documents)
+        for passage_index in by_document.get(document_key(header, body), ())
+    }
+
+
+def format_document(header: str, body: str) -> str:
+    return f"{header}\n{body}\n</Document>"
+
+
+def split_context(items) -> list:
+    """Split context entries into one formatted string per document.
+
+    Entries with no <Document> markup are kept whole. """
+    documents = []
+    for item in items or []:
+        found = DOCUMENT_PATTERN.findall(item)
+        if found:
+            documents.extend(format_document(header, body) for header, body in found)
+        elif item.strip():
+            documents.append(item)
+    return documents
+
+
+def _entry_keys(entry: str) -> tuple:
+    found = parse_documents(entry)
+    if found:
+        return document_keys(*found[0])
+    return None, f"sha1:{content_hash(entry)}"
+
+
+class ContextEntries(list):
+    """Merged context that carries the keys of its entries, so the next merge does not hash them again.
+
+    Context loaded from a checkpoint is a plain list; its keys are computed once. """
+
+    __slots__ = ("entry_keys",)
+
+
+def merge_context(existing: list, new: list) -> list:
+    """Reducer for InterviewState.context: append only documents not already present"""
+    existing = existing or []
+    seen = getattr(existing, "entry_keys", None)
+    if seen is None:
+        seen = {key for entry in existing for key in _entry_keys(entry) if key}
+    # Never add to the carried set in place: earlier states may still hold it
+    seen = set(seen)
+
+    merged = ContextEntries(existing)
+    for entry in split_context(new if isinstance(new, list) else [new]):
+        keys = [key for key in _entry_keys(entry) if key]
+        if any(key in seen for key in keys):
+            continue
+        seen.update(keys)
+        merged.append(entry)
+    merged.entry_keys = seen
+    return merged
+
+
+def unseen_documents(context: list, seen_keys) -> list:
+    """(header, body) pairs of context documents the expert has not been shown yet"""
+    seen_keys = set(seen_keys or [])
+    return [
+        (header, body) for header, body in parse_documents(context)
+        if document_key(header, body) not in seen_keys
+    ]
@@ -0,0 +1,266 @@
+"""
+Deterministic in-process stand-ins for Gemini, Tavily and Wikipedia.
+
+With FAKE_PROVIDERS=1, get_llm(), web_search_tool() and wikipedia_loader()
+return these instead of the live clients, so the research graph runs offline
+with no API keys (see benchmark.py). Every reply, document and latency is
+derived from a hash of the request, so a run produces the same report and the
+same simulated timings at any concurrency.
+
+Latencies are log-normal, given as "median[:sigma]" seconds per provider and
+multiplied by FAKE_TIME_SCALE:
+
+    FAKE_LLM_LATENCY        1.5:0.4    per LLM call (streams spread it over chunks)
+    FAKE_WEB_LATENCY        0.8:0.3    per web search
+    FAKE_WIKIPEDIA_LATENCY  1.2:0.5    per Wikipedia lookup
+
+Payload sizes are set with FAKE_ANSWER_TOKENS (tokens per LLM answer),
+FAKE_DOC_CHARS (characters per document) and FAKE_SEED.
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+import time
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from passages import estimate_tokens
+
+# Words for generated answers and documents
+VOCABULARY = (
+    "analysis", "model", "data", "evidence", "study", "results", "trend", "impact", "risk", "cost",
+    "market", "policy", "research", "method", "signal", "growth", "adoption", "benchmark", "system",
+    "network", "sample", "effect", "outcome", "report", "survey", "trial", "metric", "baseline",
+    "platform", "process", "quality", "scale", "design", "review", "factor", "region", "sector",
+)
+
+# Chunks per streamed answer
+STREAM_CHUNKS = 8
+
+
+def digest(*parts) -> int:
+    """Stable seed for a request, independent of PYTHONHASHSEED"""
+    raw = "\x1f".join(str(part) for part in parts)
+    return int.from_bytes(hashlib.sha256(raw.encode("utf-8")).digest()[:8], "big")
+
+
+def words(rng: random.Random, count: int, extra: tuple = ()) -> str:
+    pool = VOCABULARY + tuple(extra)
+    return " ".join(rng.choice(pool) for _ in range(count))
+
+
+class LatencyModel:
+    """Log-normal latency around a median, sampled per request key"""
+
+    def __init__(self, median: float, sigma: float = 0.0, scale: float = 1.0, seed: int = 0):
+        self.median = median
+        self.sigma = sigma
+        self.scale = scale
+        self.seed = seed
+
+    @classmethod
+    def parse(cls, spec: str, scale: float = 1.0, seed: int = 0) -> "LatencyModel":
+        median, _, sigma = spec.partition(":")
+        return cls(float(median), float(sigma or 0), scale, seed)
+
+    def sample(self, key) -> float:
+        rng = random.Random(digest(self.seed, "latency", key))
+        return self.median * math.exp(self.sigma * rng.gauss(0, 1)) * self.scale
+
+
+def prompt_text(messages) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+class FakeStructuredModel:
+    """with_structured_output() counterpart of FakeChatModel"""
+
+    def __init__(self, model: "FakeChatModel", schema: type):
+        self.model = model
+        self.schema = schema
+
+    def build(self, messages):
+        text = prompt_text(messages)
+        rng = random.Random(digest(self.model.seed, self.schema.__name__, text))
+        fields = self.schema.model_fields
+        if "analysts" in fields:
+            # The analyst prompt asks for "the top N themes"
+            match = re.search(r"top (\d+) themes", text)
+            count = int(match.group(1)) if match else 3
+            analyst = fields["analysts"].annotation.__args__[0]
+            return self.schema(analysts=[
+                analyst(name=f"Analyst {i + 1}", affiliation=f"{words(rng, 2).title()} Institute",
+                        role=f"{words(rng, 2).title()} Lead", description=words(rng, 30))
+                for i in range(count)
+            ])
+        # Search queries differ per question, so every turn retrieves new documents
+        return self.schema(**{name: words(rng, 5) for name in fields})
+
+    def invoke(self, messages, config=None, **kwargs):
+        time.sleep(self.model.latency.sample((self.schema.__name__, prompt_text(messages))))
+        return self.build(messages)
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        await asyncio.sleep(self.model.latency.sample((self.schema.__name__, prompt_text(messages))))
+        return self.build(messages)
+
+
+class FakeChatModel:
+    """Chat model answering with cited markdown of answer_tokens tokens"""
+
+    model = "fake-chat"
+    temperature = 0
+
+    def __init__(self, latency: LatencyModel, answer_tokens: int = 300, seed: int = 0):
+        self.latency = latency
+        self.answer_tokens = answer_tokens
+        self.seed = seed
+
+    def with_structured_output(self, schema, **kwargs):
+        return FakeStructuredModel(self, schema)
+
+    def answer(self, messages) -> AIMessage:
+        text = prompt_text(messages)
+        seed = digest(self.seed, text)
+        rng = random.Random(seed)
+        # About 4 characters per token (see estimate_tokens), ~7 per word
+        body = words(rng, max(self.answer_tokens * 4 // 7, 1))
+        content = f"## {words(rng, 3).title()}\n\n{body} [1]\n\n## Sources\n[1] https://fake.example/{seed:x}"
+        input_tokens = estimate_tokens(text)
+        output_tokens = estimate_tokens(content)
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+    def chunks(self, messages):
+        reply = self.answer(messages)
+        size = math.ceil(len(reply.content) / STREAM_CHUNKS)
+        parts = [reply.content[i:i + size] for i in range(0, len(reply.content), size)]
+        for i, part in enumerate(parts):
+            # Usage arrives with the last chunk, as with the live client
+            yield AIMessageChunk(content=part, usage_metadata=reply.usage_metadata if i == len(parts) - 1 else None)
+
+    def invoke(self, messages, config=None, **kwargs):
+        time.sleep(self.latency.sample(prompt_text(messages)))
+        return self.answer(messages)
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        await asyncio.sleep(self.latency.sample(prompt_text(messages)))
+        return self.answer(messages)
+
+    def stream(self, messages, config=None, **kwargs):
+        delay = self.latency.sample(prompt_text(messages)) / STREAM_CHUNKS
+        for chunk in self.chunks(messages):
+            time.sleep(delay)
+            yield chunk
+
+    async def astream(self, messages, config=None, **kwargs):
+        delay = self.latency.sample(prompt_text(messages)) / STREAM_CHUNKS
+        for chunk in self.chunks(messages):
+            await asyncio.sleep(delay)
+            yield chunk
+
+
+def document_text(seed: int, query: str, chars: int) -> str:
+    """Text of about `chars` characters mentioning the query's words, so passage ranking has overlap"""
+    rng = random.Random(seed)
+    terms = tuple(re.findall(r"\w+", query.lower()))
+    sentences, length = [], 0
+    while length < chars:
+        sentence = words(rng, 12, terms).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)[:chars]
+
+
+class FakeSearchTool:
+    """TavilySearchResults counterpart returning `results` documents per query"""
+
+    def __init__(self, latency: LatencyModel, results: int = 3, doc_chars: int = 2000, seed: int = 0):
+        self.latency = latency
+        self.results = results
+        self.doc_chars = doc_chars
+        self.seed = seed
+
+    def search(self, query: str) -> list:
+        return [{"url": f"https://fake.example/web/{digest(self.seed, query, i):x}",
+                 "content": document_text(digest(self.seed, "web", query, i), query, self.doc_chars)}
+                for i in range(self.results)]
+
+    def invoke(self, query, config=None, **kwargs):
+        time.sleep(self.latency.sample(("web", query)))
+        return self.search(query)
+
+    async def ainvoke(self, query, config=None, **kwargs):
+        await asyncio.sleep(self.latency.sample(("web", query)))
+        return self.search(query)
+
+
+class FakeWikipediaLoader:
+    """WikipediaLoader counterpart for one query"""
+
+    def __init__(self, query: str, latency: LatencyModel, load_max_docs: int = 2, doc_chars: int = 2000, seed: int = 0):
+        self.query = query
+        self.latency = latency
+        self.load_max_docs = load_max_docs
+        self.doc_chars = doc_chars
+        self.seed = seed
+
+    def documents(self) -> list:
+        documents = []
+        for i in range(self.load_max_docs):
+            title = f"{self.query.title()} ({i + 1})"
+            documents.append(Document(
+                page_content=document_text(digest(self.seed, "wikipedia", self.query, i), self.query, self.doc_chars),
+                metadata={"title": title, "source": f"https://fake.example/wiki/{title.replace(' ', '_')}"},
+            ))
+        return documents
+
+    def load(self) -> list:
+        time.sleep(self.latency.sample(("wikipedia", self.query)))
+        return self.documents()
+
+    async def aload(self) -> list:
+        await asyncio.sleep(self.latency.sample(("wikipedia", self.query)))
+        return self.documents()
+
+
+class FakeProviders:
+    """The fake LLM, web search and Wikipedia loader sharing one seed and time scale"""
+
+    def __init__(self, llm_latency: str = "1.5:0.4", web_latency: str = "0.8:0.3",
+                 wikipedia_latency: str = "1.2:0.5", time_scale: float = 1.0,
+                 answer_tokens: int = 300, doc_chars: int = 2000, seed: int = 0):
+        self.wikipedia_latency = LatencyModel.parse(wikipedia_latency, time_scale, seed)
+        self.doc_chars = doc_chars
+        self.seed = seed
+        self.llm = FakeChatModel(LatencyModel.parse(llm_latency, time_scale, seed), answer_tokens, seed)
+        self.web_search = FakeSearchTool(LatencyModel.parse(web_latency, time_scale, seed),
+                                         doc_chars=doc_chars, seed=seed)
+
+    def set_time_scale(self, scale: float):
+        """Rescale every provider's latency (0 runs the graph with no simulated waiting)"""
+        for latency in (self.llm.latency, self.web_search.latency, self.wikipedia_latency):
+            latency.scale = scale
+
+    def wikipedia_loader(self, query: str) -> FakeWikipediaLoader:
+        return FakeWikipediaLoader(query, self.wikipedia_latency, doc_chars=self.doc_chars, seed=self.seed)
+
+
+def fake_providers_from_env() -> FakeProviders:
+    """Fakes configured from the FAKE_* environment variables"""
+    return FakeProviders(
+        llm_latency=os.getenv("FAKE_LLM_LATENCY", "1.5:0.4"),
+        web_latency=os.getenv("FAKE_WEB_LATENCY", "0.8:0.3"),
+        wikipedia_latency=os.getenv("FAKE_WIKIPEDIA_LATENCY", "1.2:0.5"),
+        time_scale=float(os.getenv("FAKE_TIME_SCALE", "1")),
+        answer_tokens=int(os.getenv("FAKE_ANSWER_TOKENS", "300")),
+        doc_chars=int(os.getenv("FAKE_DOC_CHARS", "2000")),
+        seed=int(os.getenv("FAKE_SEED", "0")),
+    )
@@ -0,0 +1,362 @@
+"""
+Background research jobs.
+
+Starting, modifying and approving a research session each run the graph for
+seconds to minutes. The API no longer does that inside the HTTP request: it
+validates the request, submits a Job and answers 202 Accepted with the job id.
+Progress and results reach clients through the Socket.IO events as before, and
+GET /api/research/<id> reports the state of a job or session at any time.
+
+JobQueue runs jobs on a fixed pool of worker threads. At most `max_queued`
+jobs may wait for a worker; submitting past that raises QueueFull, which the
+API turns into 503 so clients back off instead of piling up work. Finished
+job records are kept for the most recent `history` jobs.
+
+A job is plain data (kind, session id and a JSON payload) handed to a single
+runner(job) callable, so the same jobs can be run by another process.
+
+SqliteJobQueue is the durable alternative: the API records jobs in a SQLite
+database (WAL mode) and research_worker.py processes claim and run them. A
+claimed job holds a lease its worker keeps renewing; when a worker dies the
+lease runs out and another worker picks the job up again. Workers write
+status updates, events and job results to an event table the API reads back
+in order, so progress still reaches the session's Socket.IO room.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Optional
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+FINISHED = (COMPLETED, FAILED)
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """One start, modify or approve run of a research session"""
+
+    def __init__(self, kind: str, session_id: str, payload: dict = None, job_id: str = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.session_id = session_id
+        self.payload = payload or {}
+        self.state = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.attempts = 0
+        # Token of the worker's current claim on a durable job (see SqliteJobQueue.claim)
+        self.claim = None
+        # Lock of the JobQueue that updates this job in place, so as_dict() never sees a half-made update
+        self.lock = None
+
+    def as_dict(self) -> dict:
+        with self.lock or nullcontext():
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "session_id": self.session_id,
+                "state": self.state,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "result": self.result,
+                "error": self.error,
+                "attempts": self.attempts,
+            }
+
+
+class JobQueue:
+    """Bounded queue of jobs run by runner(job) on a pool of worker threads"""
+
+    def __init__(self, runner: Callable, max_workers: int = 4, max_queued: int = 32, history: int = 1000):
+        self.runner = runner
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="research-job")
+        self._jobs = OrderedDict()
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def _count(self, state: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.state == state)
+
+    def submit(self, kind: str, session_id: str, payload: dict = None) -> Job:
+        """Queue a job for the next free worker; raises QueueFull when max_queued jobs are waiting"""
+        with self._lock:
+            if self._count(QUEUED) >= self.max_queued:
+                self._counts["rejected"] += 1
+                raise QueueFull(f"{self.max_queued} research jobs are already waiting")
+            job = Job(kind, session_id, payload)
+            job.lock = self._lock
+            self._jobs[job.id] = job
+            self._latest[session_id] = job.id
+            self._counts["submitted"] += 1
+            self._trim()
+        self._pool.submit(self._run, job)
+        return job
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in FINISHED]
+        for job_id in finished[:max(len(self._jobs) - self.history, 0)]:
+            job = self._jobs.pop(job_id)
+            if self._latest.get(job.session_id) == job_id:
+                del self._latest[job.session_id]
+
+    def _run(self, job: Job):
+        # Readers see a job before, during or after its run, never half way between
+        with self._lock:
+            job.started_at = time.time()
+            job.state = RUNNING
+            job.attempts += 1
+        result, error, outcome = None, None, FAILED
+        try:
+            result = self.runner(job)
+            outcome = COMPLETED
+        except Exception as e:
+            error = str(e)
+        finally:
+            with self._lock:
+                job.result, job.error = result, error
+                job.finished_at = time.time()
+                job.state = outcome
+                self._counts[outcome] += 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self, session_id: str) -> Optional[Job]:
+        """The most recently submitted job of a session"""
+        with self._lock:
+            job_id = self._latest.get(session_id)
+            return self._jobs.get(job_id) if job_id else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counts,
+                "workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "queued": self._count(QUEUED),
+                "running": self._count(RUNNING),
+            }
+
+
+JOB_COLUMNS = ("id", "kind", "session_id", "payload", "state", "attempts", "created_at", "started_at",
+               "finished_at", "result", "error", "claim")
+
+
+def _job(row) -> Job:
+    values = dict(zip(JOB_COLUMNS, row))
+    job = Job(values["kind"], values["session_id"], json.loads(values["payload"]), values["id"])
+    for column in ("state", "attempts", "created_at", "started_at", "finished_at", "error", "claim"):
+        setattr(job, column, values[column])
+    job.result = json.loads(values["result"]) if values["result"] else None
+    return job
+
+
+class SqliteJobQueue:
+    """Durable job queue and event log shared by the API and research worker processes"""
+
+    def __init__(self, path: str, max_queued: int = 32, max_attempts: int = 2, retention: float = 3600):
+        self.path = path
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; statements that must see and change the queue together run in BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, kind TEXT NOT NULL, session_id TEXT NOT NULL, payload TEXT NOT NULL,
+                state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL,
+                started_at REAL, finished_at REAL, result TEXT, error TEXT,
+                worker TEXT, claim TEXT, lease_until REAL);
+            CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_by_session ON jobs (session_id, created_at);
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, event TEXT NOT NULL,
+                data TEXT NOT NULL, created_at REAL NOT NULL);
+        """)
+
+    def _transaction(self, work: Callable):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _select(self, where: str, params: tuple):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE {where}", params).fetchone()
+        return _job(row) if row else None
+
+    # API side
+
+    def submit(self, kind: str, session_id: str, payload: dict = None) -> Job:
+        """Record a job for the next free worker; raises QueueFull when max_queued jobs are waiting"""
+        job = Job(kind, session_id, payload)
+
+        def insert(conn):
+            if conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0] >= self.max_queued:
+                return False
+            conn.execute(
+                "INSERT INTO jobs (id, kind, session_id, payload, state, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, kind, session_id, json.dumps(job.payload), QUEUED, job.created_at),
+            )
+            return True
+
+        if not self._transaction(insert):
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull(f"{self.max_queued} research jobs are already waiting")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._select("id = ?", (job_id,))
+
+    def latest(self, session_id: str) -> Optional[Job]:
+        """The most recently submitted job of a session"""
+        return self._select("session_id = ? ORDER BY created_at DESC LIMIT 1", (session_id,))
+
+    def events(self, after: int, limit: int = 500) -> list:
+        """(id, session_id, event, data) of the events written after event id `after`, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, session_id, event, data FROM job_events WHERE id > ? ORDER BY id LIMIT ?", (after, limit)
+            ).fetchall()
+        return [(event_id, session_id, event, json.loads(data)) for event_id, session_id, event, data in rows]
+
+    def last_event_id(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM job_events").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            workers = self._conn.execute(
+                "SELECT COUNT(DISTINCT worker) FROM jobs WHERE state = ? AND lease_until >= ?", (RUNNING, time.time())
+            ).fetchone()[0]
+            rejected = self._rejected
+        return {
+            "submitted": sum(counts.values()),
+            "completed": counts.get(COMPLETED, 0),
+            "failed": counts.get(FAILED, 0),
+            "rejected": rejected,
+            "workers": workers,
+            "max_queued": self.max_queued,
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+        }
+
+    # Worker side
+
+    def claim(self, worker: str, lease: float = 60) -> Optional[Job]:
+        """Take the oldest waiting job, or one whose worker's lease ran out, and run it under `worker`"""
+        now = time.time()
+        claim = uuid.uuid4().hex
+
+        def take(conn):
+            # Jobs whose workers died max_attempts times fail instead of taking down yet another worker
+            lost = conn.execute(
+                "SELECT id, session_id FROM jobs WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (RUNNING, now, self.max_attempts),
+            ).fetchall()
+            for job_id, session_id in lost:
+                self._finish(conn, job_id, session_id, None, f"Research worker lost {self.max_attempts} times")
+            conn.execute(
+                "UPDATE jobs SET state = ?, worker = ?, claim = ?, lease_until = ?, attempts = attempts + 1, "
+                "started_at = ? WHERE id = (SELECT id FROM jobs WHERE state = ? OR (state = ? AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1)",
+                (RUNNING, worker, claim, now + lease, now, QUEUED, RUNNING, now),
+            )
+
+        self._transaction(take)
+        return self._select("claim = ?", (claim,))
+
+    def renew(self, job: Job, lease: float = 60) -> bool:
+        """Extend the lease on a claimed job; False if the lease was lost to another worker"""
+        with self._lock:
+            renewed = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND claim = ? AND state = ?",
+                (time.time() + lease, job.id, job.claim, RUNNING),
+            ).rowcount
+        return renewed > 0
+
+    def publish_events(self, session_id: str, events: list):
+        """Append {"event": ..., "data": ...} events of a session to the event log"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO job_events (session_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, event["event"], json.dumps(event["data"]), now) for event in events],
+            )
+
+    def _finish(self, conn, job_id: str, session_id: str, result, error, claim: str = None) -> bool:
+        now = time.time()
+        state = FAILED if error is not None else COMPLETED
+        # Only the current claim may finish a job: an earlier worker whose lease ran out has lost it
+        updated = conn.execute(
+            "UPDATE jobs SET state = ?, finished_at = ?, result = ?, error = ?, lease_until = NULL "
+            "WHERE id = ? AND state = ? AND (? IS NULL OR claim = ?)",
+            (state, now, json.dumps(result) if result is not None else None, error, job_id, RUNNING, claim, claim),
+        ).rowcount
+        if not updated:
+            return False
+        # The API learns of finished jobs from the event log, after the job's own events
+        row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.execute(
+            "INSERT INTO job_events (session_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, "job", json.dumps(_job(row).as_dict()), now),
+        )
+        return True
+
+    def finish(self, job: Job, result: dict = None, error: str = None) -> bool:
+        """Record the outcome of a claimed job; False if the lease was lost and another worker owns the job"""
+        if job.claim is None:
+            return False
+        return self._transaction(lambda conn: self._finish(conn, job.id, job.session_id, result, error, job.claim))
+
+    def prune(self):
+        """Drop events and finished jobs older than `retention` seconds"""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            self._conn.execute("DELETE FROM job_events WHERE created_at < ?", (cutoff,))
+            self._conn.execute("DELETE FROM jobs WHERE state IN (?, ?) AND finished_at < ?", (*FINISHED, cutoff))
+
+
+def job_queue_from_env(runner: Callable):
+    """JobQueue running jobs with runner(job) on RESEARCH_WORKERS threads, at most RESEARCH_QUEUE_SIZE waiting.
+
+    With RESEARCH_QUEUE_PATH set, a SqliteJobQueue at that path instead, whose jobs are
+    run by research_worker.py processes. """
+    max_queued = int(os.getenv("RESEARCH_QUEUE_SIZE", "32"))
+    path = os.getenv("RESEARCH_QUEUE_PATH", "")
+    if path:
+        return SqliteJobQueue(path, max_queued=max_queued)
+    return JobQueue(runner, max_workers=int(os.getenv("RESEARCH_WORKERS", "4")), max_queued=max_queued)
@@ -0,0 +1,188 @@
+"""
+Per-node instrumentation for the research graph.
+
+StatusUpdater.node() wraps every graph node (see make_node): it times the
+node and collects what the node spent while it ran, tagged with the session,
+analyst and node name:
+
+- LLM calls and input/output tokens (from response usage metadata, or the
+  prompt estimate when the reply carries none, e.g. structured output),
+- retrieval bytes per source,
+- LLM and search cache hits and misses.
+
+Spending is recorded from anywhere inside the node (including worker threads
+started with a copied context) with add_usage(). Aggregates per node are kept
+in a process-wide Metrics registry and rendered in the Prometheus text format
+for /api/metrics. Totals per node and analyst are also kept for the most
+recent sessions (session_usage), which would be too many labels for Prometheus.
+"""
+
+import contextvars
+import math
+import threading
+from collections import OrderedDict
+
+from retrieval import LatencyHistogram
+
+# Node durations span milliseconds (routing) to minutes (a whole interview)
+NODE_SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Metric name -> (type, help)
+METRICS = {
+    "research_node_duration_seconds": ("histogram", "Wall time of graph node runs"),
+    "research_node_runs_total": ("counter", "Graph node runs by outcome"),
+    "research_llm_calls_total": ("counter", "LLM requests sent upstream"),
+    "research_llm_tokens_total": ("counter", "LLM tokens by direction"),
+    "research_retrieval_bytes_total": ("counter", "Bytes of retrieved documents by source"),
+    "research_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+}
+
+
+class NodeUsage:
+    """What one node run spent, filled in by add_usage() while the node runs"""
+
+    def __init__(self, node: str, session: str = "", analyst: str = ""):
+        self.node = node
+        self.session = session
+        self.analyst = analyst
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, amount: float = 1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {"node": self.node, "session": self.session, "analyst": self.analyst, **self.counts}
+
+
+current_usage = contextvars.ContextVar("node_usage", default=None)
+
+
+def add_usage(key: str, amount: float = 1):
+    """Charge amount to the running node (no-op outside a node)"""
+    usage = current_usage.get()
+    if usage is not None:
+        usage.add(key, amount)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: tuple) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}" if labels else ""
+
+
+def _value(value) -> str:
+    """A sample value without losing precision: integers as is, floats at full precision"""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+class Metrics:
+    """Labelled counters and histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, max_sessions: int = 200):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._sessions = OrderedDict()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(NODE_SECONDS_BUCKETS)
+        histogram.observe(seconds)
+
+    def observe_node(self, usage: NodeUsage, seconds: float, outcome: str = "ok"):
+        """Fold a finished node run into the per-node aggregates"""
+        node = usage.node
+        counts = usage.as_dict()
+        if usage.session:
+            self._add_session(usage, seconds)
+        self.observe("research_node_duration_seconds", seconds, node=node)
+        self.inc("research_node_runs_total", node=node, outcome=outcome)
+        if counts.get("llm_calls"):
+            self.inc("research_llm_calls_total", counts["llm_calls"], node=node)
+        for direction in ("input", "output"):
+            if counts.get(f"{direction}_tokens"):
+                self.inc("research_llm_tokens_total", counts[f"{direction}_tokens"], node=node, direction=direction)
+        for key, amount in counts.items():
+            if key.startswith("retrieval_bytes:"):
+                self.inc("research_retrieval_bytes_total", amount, node=node, source=key.split(":", 1)[1])
+            elif key.startswith("cache_hits:") or key.startswith("cache_misses:"):
+                kind, cache = key.split(":", 1)
+                self.inc("research_cache_requests_total", amount, node=node, cache=cache,
+                         result="hit" if kind == "cache_hits" else "miss")
+
+    def _add_session(self, usage: NodeUsage, seconds: float):
+        with self._lock:
+            session = self._sessions.pop(usage.session, {})
+            self._sessions[usage.session] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            totals = session.setdefault((usage.node, usage.analyst), {"runs": 0, "seconds": 0.0})
+            totals["runs"] += 1
+            totals["seconds"] += seconds
+            for key, amount in usage.as_dict().items():
+                if key not in ("node", "session", "analyst"):
+                    totals[key] = totals.get(key, 0) + amount
+
+    def session_usage(self, session: str) -> list:
+        """Totals per node and analyst for a recent session"""
+        with self._lock:
+            totals = dict(self._sessions.get(session, {}))
+        return [{"node": node, "analyst": analyst, **{key: round(value, 3) if isinstance(value, float) else value
+                                                      for key, value in counts.items()}}
+                for (node, analyst), counts in totals.items()]
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+        lines, described = [], set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, help_text = METRICS.get(name, ("untyped", name))
+                lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_labels(labels)} {_value(value)}")
+        for (name, labels), histogram in histograms:
+            describe(name)
+            stats = histogram.stats()
+            for bound, count in stats["buckets"].items():
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_value(stats['sum_seconds'])}")
+            lines.append(f"{name}_count{_labels(labels)} {stats['count']}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._sessions.clear()
+
+
+# Shared by every session in the process
+metrics = Metrics()
@@ -0,0 +1,129 @@
+"""
+Passage-level retrieval for the expert's answer prompt.
+
+Search nodes append whole <Document> blobs to the interview context. Before
+answering, the context is split back into documents, each document is
+chunked into overlapping passages, and the passages are scored with BM25
+against the analyst's latest question. Only the top passages that fit the
+token budget are sent, each under its original <Document ...> header so
+citations still point at the right source.
+"""
+
+import os
+import re
+from collections import Counter
+
+from textutils import bm25_idf, bm25_term_score, content_tokens
+
+DOCUMENT_PATTERN = re.compile(r"(<Document [^>]*?/>)\n(.*?)\n</Document>", re.S)
+DOCUMENT_SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def parse_documents(context) -> list:
+    """Split context blobs into (header, body) pairs in order of appearance"""
+    if isinstance(context, str):
+        context = [context]
+    documents = []
+    for blob in context:
+        documents.extend(DOCUMENT_PATTERN.findall(blob))
+    return documents
+
+
+def chunk_text(text: str, words: int = 120, overlap: int = 30) -> list:
+    """Split text into passages of roughly `words` words that overlap by `overlap` words"""
+    tokens = text.split()
+    if len(tokens) <= words:
+        return [text.strip()] if text.strip() else []
+    step = max(words - overlap, 1)
+    passages = []
+    for start in range(0, len(tokens), step):
+        passages.append(" ".join(tokens[start:start + words]))
+        if start + words >= len(tokens):
+            break
+    return passages
+
+
+def rank_passages(documents: list, query: str, words: int = 120, overlap: int = 30) -> list:
+    """Score every passage of every document against the query.
+
+    Returns (score, doc_index, passage_index, header, passage) tuples, best first. """
+    passages = []
+    for doc_index, (header, body) in enumerate(documents):
+        for passage_index, passage in enumerate(chunk_text(body, words, overlap)):
+            passages.append((doc_index, passage_index, header, passage, Counter(content_tokens(passage))))
+    if not passages:
+        return []
+
+    query_terms = set(content_tokens(query))
+    doc_freq = Counter(term for *_, counts in passages for term in query_terms if term in counts)
+    avg_len = sum(sum(counts.values()) for *_, counts in passages) / len(passages)
+
+    ranked = []
+    for doc_index, passage_index, header, passage, counts in passages:
+        length = sum(counts.values())
+        score = sum(
+            bm25_term_score(counts[term], bm25_idf(len(passages), doc_freq[term]), length, avg_len)
+            for term in query_terms if term in counts
+        )
+        ranked.append((score, doc_index, passage_index, header, passage))
+
+    # Ties (including queries with no overlap) keep the retrieval order
+    ranked.sort(key=lambda item: (-item[0], item[1], item[2]))
+    return ranked
+
+
+def pick_passages(documents: list, query: str, top_k: int = 8, token_budget: int = 1500,
+                  words: int = 120, overlap: int = 30, skip=()) -> list:
+    """Best passages of the (header, body) documents for the query, within the token budget.
+
+    Passages in skip, as (doc_index, passage_index), are only used once every passage has been skipped. """
+    ranked = rank_passages(documents, query, words, overlap)
+    if skip:
+        ranked = [item for item in ranked if (item[1], item[2]) not in skip] or ranked
+
+    # Passages sharing no terms with the question are only used when nothing matched
+    matching = [item for item in ranked if item[0] > 0] or ranked[:1]
+
+    selected, used = [], 0
+    for item in matching:
+        if len(selected) >= top_k:
+            break
+        cost = estimate_tokens(item[4])
+        if selected and used + cost > token_budget:
+            continue
+        selected.append(item)
+        used += cost
+    return selected
+
+
+def format_passages(selected: list) -> str:
+    """Group passages under their source header, in retrieval order"""
+    by_document = {}
+    for _, doc_index, passage_index, header, passage in sorted(selected, key=lambda item: (item[1], item[2])):
+        by_document.setdefault(doc_index, (header, []))[1].append(passage)
+
+    return DOCUMENT_SEPARATOR.join(
+        f"{header}\n" + "\n...\n".join(chunks) + "\n</Document>"
+        for header, chunks in by_document.values()
+    )
+
+
+def select_passages(context, query: str, top_k: int = 8, token_budget: int = 1500,
+                    words: int = 120, overlap: int = 30) -> str:
+    """Format the best passages for the query as <Document> blobs within the token budget"""
+    return format_passages(pick_passages(parse_documents(context), query, top_k, token_budget, words, overlap))
+
+
+def passage_settings_from_env() -> dict:
+    """Passage ranking settings from PASSAGE_* environment variables"""
+    return {
+        "top_k": int(os.getenv("PASSAGE_TOP_K", "8")),
+        "token_budget": int(os.getenv("PASSAGE_TOKEN_BUDGET", "1500")),
+        "words": int(os.getenv("PASSAGE_WORDS", "120")),
+        "overlap": int(os.getenv("PASSAGE_OVERLAP", "30")),
+    }
@@ -1,10 +1,50 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+import contextvars
 import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Optional, Dict, Any, Callable
 
 from dotenv import load_dotenv
 load_dotenv()
 
+from langchain_core.messages import AIMessageChunk, message_chunk_to_message
+from langgraph.config import get_config, get_stream_writer
+
+from caching import llm_cache_from_env, search_cache_from_env
+from metrics import NodeUsage, add_usage, current_usage, metrics
+from tracing import KIND_CLIENT, add_event, set_attributes, tracer_from_env
+from context_store import document_key, format_document, passage_key, seen_passages, unseen_documents
+from passages import (DOCUMENT_SEPARATOR, estimate_tokens, format_passages, parse_documents,
+                      passage_settings_from_env, pick_passages)
+from retrieval import source_race_from_env
+from status_bus import status_bus_from_env
+from resilience import (BranchCancelled, breakers_from_env, call_policy_from_env, join_from_env,
+                        provider_limiters_from_env)
+
+def print_status_batch(key, updates):
+    """ Console sink of status_console: one write per batch """
+    sys.stdout.write("".join(f"{update['message']}\n" for update in updates))
+
+# Status updates are echoed to the console from a background thread, so nodes never wait on stdout
+status_console = status_bus_from_env(print_status_batch, coalesce=())
+
+# Session of code running outside a graph run (inside one, the run's thread_id is used, see session_id)
+current_session = contextvars.ContextVar("current_session", default="")
+
+def session_id() -> str:
+    """ Session the running code belongs to.
+
+    The run config travels with LangGraph's executor threads, Send branches and every
+    task started with a copied context, so any node or helper can find its session. """
+    try:
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:
+        thread_id = None
+    return str(thread_id) if thread_id else current_session.get()
+
 # Status update mechanism
 class StatusUpdater:
     """Class to handle sending status updates to the frontend"""
@@ -15,7 +55,7 @@ class StatusUpdater:
     def update(self, step: str, step_number: int, additional_info: Dict[str, Any] = None):
         """Send a status update to the frontend and print to console"""
         message = f"{step_number}. STEP [{step}]"
-        print(message)  # Still print to console for debugging
+        self.log(message)  # Still print to console for debugging
         
         # Create status update object
         status = {
@@ -27,42 +67,325 @@ class StatusUpdater:
         # Add any additional info
         if additional_info:
             status.update(additional_info)
+
+        # Tag the update with its session, whichever thread the node runs on
+        session = session_id()
+        if session:
+            status["session_id"] = session
+        # ...and with its analyst, so updates of parallel interviews are told apart (and not coalesced together)
+        usage = current_usage.get()
+        if usage is not None and usage.analyst:
+            status.setdefault("analyst", usage.analyst)
             
+        # Record on the running trace span (see tracing.py)
+        add_event(step, additional_info)
+
         # Send to frontend if callback is provided
         if self.callback:
             self.callback(message, status)
 
+    def log(self, message: str):
+        """Echo a line to the console without blocking the calling node"""
+        status_console.publish("console", {"message": message})
+
+    @contextmanager
+    def node(self, node: str, session: str = "", analyst: str = ""):
+        """Time a graph node, collect its LLM, retrieval and cache usage (see metrics.py) and trace it"""
+        usage = NodeUsage(node, session, analyst)
+        token = current_usage.set(usage)
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            with tracer.span("node", session=session, node=node, analyst=analyst) as span:
+                try:
+                    yield usage
+                finally:
+                    if span is not None:
+                        span.set(**usage.counts)
+            outcome = "ok"
+        finally:
+            current_usage.reset(token)
+            metrics.observe_node(usage, time.monotonic() - started, outcome)
+
+# Span trees per session, written to TRACE_DIR
+tracer = tracer_from_env()
+
 # Default status updater that just prints
 status_updater = StatusUpdater()
 
 # Set this function to connect the status updater to your frontend
 def set_status_callback(callback: Callable[[str, Dict[str, Any]], None]):
-    """Set the callback function that will receive status updates"""
+    """Set the callback function that will receive status updates.
+
+    It is called on the thread running the node, so it should hand the update off
+    (e.g. to a StatusBus, see status_bus.py) rather than do I/O itself."""
     global status_updater
     status_updater = StatusUpdater(callback)
 
-llm = ChatGoogleGenerativeAI(
-    model = 'gemini-2.5-flash',
-    temperature=0,
-    max_tokens=None,
-    timeout=None,
-    max_retries=10,
-)
+# The LLM client, graphs and checkpointer are built on first use (see get_llm, get_graph),
+# so importing this module does not load the Gemini SDK or compile anything
+@lru_cache(maxsize=None)
+def fake_providers():
+    """ Deterministic offline stand-ins for every provider when FAKE_PROVIDERS is set (see fakes.py) """
+    if os.getenv("FAKE_PROVIDERS", "0").lower() not in ("1", "true", "yes", "on"):
+        return None
+    from fakes import fake_providers_from_env
+    return fake_providers_from_env()
+
+@lru_cache(maxsize=None)
+def get_llm():
+    """ Chat model shared by every node """
+    if fake_providers():
+        return fake_providers().llm
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model = 'gemini-2.5-flash',
+        temperature=0,
+        max_tokens=None,
+        # call_policy enforces per-node timeouts; this only stops abandoned requests from lingering
+        timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", "300")),
+        # Rate limits are enforced before the call (see limiters), so only a few retries are needed
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+    )
 
+@lru_cache(maxsize=None)
+def get_llm_cache():
+    """ Responses are deterministic at temperature=0, so identical prompts are served from the cache.
+
+    Built on first use, so importing this module does not open the cache's SQLite file """
+    return llm_cache_from_env()
+
+# Process-wide concurrency and rate limits per provider, shared by every session
+limiters = provider_limiters_from_env()
+
+# Per-node timeouts, the run's deadline and optional hedging for every LLM call
+call_policy = call_policy_from_env()
+
+def call_context():
+    """ (node name, run deadline) of the graph step making an LLM call """
+    try:
+        config = get_config()
+    except RuntimeError:
+        return "", None
+    return config.get("metadata", {}).get("langgraph_node", ""), config.get("configurable", {}).get("deadline")
+
+def time_left(deadline):
+    """ Seconds until the run's deadline: how long a call may wait on the same call made by another session """
+    return None if deadline is None else deadline - time.time()
+
+def prompt_tokens(messages) -> int:
+    """ Token estimate for a prompt, charged to the LLM's tokens-per-minute budget """
+    return sum(estimate_tokens(str(message.content)) for message in messages)
+
+def usage_tokens(reply):
+    """ Total tokens reported by the provider, when the reply carries usage metadata """
+    usage = getattr(reply, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+def record_llm_usage(messages, reply):
+    """ Charge an upstream LLM reply to the running node """
+    usage = getattr(reply, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", prompt_tokens(messages))
+    output_tokens = usage.get("output_tokens", 0)
+    add_usage("llm_calls")
+    add_usage("input_tokens", input_tokens)
+    add_usage("output_tokens", output_tokens)
+    set_attributes(input_tokens=input_tokens, output_tokens=output_tokens)
+
+def record_cache(cache: str, hit: bool):
+    add_usage(f"cache_hits:{cache}" if hit else f"cache_misses:{cache}")
+    set_attributes(cache_hit=hit)
+
+@tracer.traced("llm", KIND_CLIENT)
+def invoke_llm(messages, schema=None):
+    """Call the shared LLM, optionally enforcing a structured output schema"""
+    llm = get_llm()
+    runnable = llm.with_structured_output(schema) if schema else llm
+    cache = get_llm_cache()
+    key = cache.make_key(llm, messages, schema)
+
+    node, deadline = call_context()
+
+    upstream = []
+
+    def attempt():
+        with limiters["gemini"].limit(prompt_tokens(messages)) as permit:
+            reply = runnable.invoke(messages)
+            permit.record_usage(usage_tokens(reply))
+        upstream.append(reply)
+        record_llm_usage(messages, reply)
+        return reply
+
+    reply = cache.call(key, lambda: call_policy.call(node, attempt, deadline), schema, time_left(deadline))
+    record_cache("llm", hit=not upstream)
+    return reply
+
+@tracer.traced("llm", KIND_CLIENT)
+async def ainvoke_llm(messages, schema=None):
+    """Async counterpart of invoke_llm"""
+    llm = get_llm()
+    runnable = llm.with_structured_output(schema) if schema else llm
+    cache = get_llm_cache()
+    key = cache.make_key(llm, messages, schema)
+
+    node, deadline = call_context()
+
+    upstream = []
+
+    async def attempt():
+        async with limiters["gemini"].alimit(prompt_tokens(messages)) as permit:
+            reply = await runnable.ainvoke(messages)
+            permit.record_usage(usage_tokens(reply))
+        upstream.append(reply)
+        record_llm_usage(messages, reply)
+        return reply
+
+    reply = await cache.acall(key, lambda: call_policy.acall(node, attempt, deadline), schema,
+                              time_left(deadline))
+    record_cache("llm", hit=not upstream)
+    return reply
+
+# Report parts streamed to clients as report_delta events, in reading order
+REPORT_PARTS = ("introduction", "content", "conclusion")
+
+def report_stream_writer():
+    """ The run's custom stream writer, or a no-op outside a graph run """
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
+
+@tracer.traced("llm", KIND_CLIENT)
+def stream_llm(messages, part: str):
+    """ Call the shared LLM chunk by chunk, forwarding each chunk as a report_delta event.
+
+    Cached and coalesced replies arrive whole, so they are forwarded as one delta. """
+    llm = get_llm()
+    cache = get_llm_cache()
+    write = report_stream_writer()
+    node, deadline = call_context()
+    streamed = False
+    upstream = []
+
+    def attempt():
+        nonlocal streamed
+        reply = AIMessageChunk(content="")
+        with limiters["gemini"].limit(prompt_tokens(messages)) as permit:
+            for chunk in llm.stream(messages):
+                reply += chunk
+                if chunk.text:
+                    streamed = True
+                    write({"type": "report_delta", "part": part, "delta": chunk.text})
+            permit.record_usage(usage_tokens(reply))
+        reply = message_chunk_to_message(reply)
+        upstream.append(reply)
+        record_llm_usage(messages, reply)
+        return reply
+
+    # Streams are bounded by the node timeout but never hedged, which would repeat deltas
+    reply = cache.call(cache.make_key(llm, messages, None),
+                       lambda: call_policy.call(node, attempt, deadline, hedge=False), None, time_left(deadline))
+    record_cache("llm", hit=not upstream)
+    if not streamed:
+        write({"type": "report_delta", "part": part, "delta": reply.text})
+    return reply
+
+@tracer.traced("llm", KIND_CLIENT)
+async def astream_llm(messages, part: str):
+    """ Async counterpart of stream_llm """
+    llm = get_llm()
+    cache = get_llm_cache()
+    write = report_stream_writer()
+    node, deadline = call_context()
+    streamed = False
+    upstream = []
+
+    async def attempt():
+        nonlocal streamed
+        reply = AIMessageChunk(content="")
+        async with limiters["gemini"].alimit(prompt_tokens(messages)) as permit:
+            async for chunk in llm.astream(messages):
+                reply += chunk
+                if chunk.text:
+                    streamed = True
+                    write({"type": "report_delta", "part": part, "delta": chunk.text})
+            permit.record_usage(usage_tokens(reply))
+        reply = message_chunk_to_message(reply)
+        upstream.append(reply)
+        record_llm_usage(messages, reply)
+        return reply
+
+    reply = await cache.acall(cache.make_key(llm, messages, None),
+                              lambda: call_policy.acall(node, attempt, deadline, hedge=False), None,
+                              time_left(deadline))
+    record_cache("llm", hit=not upstream)
+    if not streamed:
+        write({"type": "report_delta", "part": part, "delta": reply.text})
+    return reply
+
+import asyncio
+import functools
 import operator
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, Field
 from typing import Annotated, List
 from typing_extensions import TypedDict
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.runnables import RunnableLambda
 
 from langgraph.constants import Send
 from langgraph.graph import END, MessagesState, START, StateGraph
 
 from schema import *
 
+# Set by conduct_interview when it stops waiting for an interview running on a worker thread
+interview_cancelled = contextvars.ContextVar("interview_cancelled", default=None)
+
+def node_tags(state, default: str):
+    """ (node, session, analyst) a node run is recorded under """
+    try:
+        config = get_config()
+    except RuntimeError:
+        config = {}
+    analyst = state.get("analyst") if isinstance(state, dict) else None
+    return (config.get("metadata", {}).get("langgraph_node", default), session_id(), getattr(analyst, "name", ""))
+
+def make_node(func, afunc=None):
+    """ Wrap a node function so graph.invoke uses func and graph.ainvoke uses afunc.
+
+    Nodes without I/O get a coroutine that runs func inline, so the async graph
+    never hops to an executor thread. Every run is timed and its usage recorded
+    through status_updater.node(). Sync nodes of an abandoned interview raise
+    BranchCancelled instead of running (async interviews are cancelled outright). """
+    if afunc is None:
+        async def afunc(state):
+            return func(state)
+    inner_afunc = afunc
+
+    @functools.wraps(func)
+    def run(state):
+        cancelled = interview_cancelled.get()
+        if cancelled is not None and cancelled.is_set():
+            raise BranchCancelled(f"{func.__name__} skipped: interview abandoned")
+        with status_updater.node(*node_tags(state, func.__name__)):
+            return func(state)
+
+    @functools.wraps(inner_afunc)
+    async def arun(state):
+        with status_updater.node(*node_tags(state, func.__name__)):
+            return await inner_afunc(state)
+
+    return RunnableLambda(run, afunc=arun, name=func.__name__)
+
+def make_edge(func):
+    """ Wrap a conditional edge function; edges run inline and are not recorded as nodes """
+    async def afunc(state):
+        return func(state)
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
 ### Nodes and edges
 
 analyst_instructions="""You are tasked with creating a set of AI analyst personas. Follow these instructions carefully:
@@ -95,17 +418,12 @@ analyst_modifier_instructions="""You are tasked with modifying the AI analyst pe
 7. Assign one analyst to each theme."""
 
 
-def create_analysts(state: GenerateAnalystsState):
-    status_updater.update("CREATE_ANALYSTS", 1)
-    
-    """ Create analysts """
-    
+def analyst_messages(state: GenerateAnalystsState):
+    """ Build the prompt used to create (or modify) the analysts """
+
     topic=state['topic']
     max_analysts=state['max_analysts']
     human_analyst_feedback=state.get('human_analyst_feedback', '')
-        
-    # Enforce structured output
-    structured_llm = llm.with_structured_output(Perspectives)
 
     # System message
     if human_analyst_feedback:
@@ -120,15 +438,31 @@ def create_analysts(state: GenerateAnalystsState):
             max_analysts=max_analysts, existing_analysts=formatted_existing_analysts,
             human_analyst_feedback=human_analyst_feedback)
         
-        print(f"FORMATTED ANALYSTS: {system_message}")
+        status_updater.log(f"FORMATTED ANALYSTS: {system_message}")
 
     else:
         system_message = analyst_instructions.format(topic=topic, max_analysts=max_analysts)
 
-    # Generate question 
-    analysts = structured_llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")])
+    return [SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")]
+
+def create_analysts(state: GenerateAnalystsState):
+    status_updater.update("CREATE_ANALYSTS", 1)
     
+    """ Create analysts """
+    
+    # Generate analysts, enforcing structured output
+    analysts = invoke_llm(analyst_messages(state), Perspectives)
+
+    # Write the list of analysis to state
+    return {"analysts": analysts.analysts}
 
+async def acreate_analysts(state: GenerateAnalystsState):
+    status_updater.update("CREATE_ANALYSTS", 1)
+    
+    """ Create analysts (async) """
+    
+    # Generate analysts, enforcing structured output
+    analysts = await ainvoke_llm(analyst_messages(state), Perspectives)
 
     # Write the list of analysis to state
     return {"analysts": analysts.analysts}
@@ -170,18 +504,34 @@ When you are satisfied with your understanding, complete the interview with: "Th
 
 Remember to stay in character throughout your response, reflecting the persona and goals provided to you."""
 
+def question_messages(state: InterviewState):
+    """ Build the prompt for the analyst's next question """
+
+    # Get state
+    analyst = state["analyst"]
+    messages = state["messages"]
+
+    system_message = question_instructions.format(goals=analyst.persona)
+    return [SystemMessage(content=system_message)]+messages
+
 def generate_question(state: InterviewState):
     status_updater.update("GENERATE_QUESTION", 3)
     
     """ Node to generate a question """
 
-    # Get state
-    analyst = state["analyst"]
-    messages = state["messages"]
+    # Generate question 
+    question = invoke_llm(question_messages(state))
+        
+    # Write messages to state
+    return {"messages": [question]}
+
+async def agenerate_question(state: InterviewState):
+    status_updater.update("GENERATE_QUESTION", 3)
+    
+    """ Node to generate a question (async) """
 
     # Generate question 
-    system_message = question_instructions.format(goals=analyst.persona)
-    question = llm.invoke([SystemMessage(content=system_message)]+messages)
+    question = await ainvoke_llm(question_messages(state))
         
     # Write messages to state
     return {"messages": [question]}
@@ -197,53 +547,222 @@ Pay particular attention to the final question posed by the analyst.
 
 Convert this final question into a well-structured web search query""")
 
-def search_web(state: InterviewState):
-    status_updater.update("SEARCH_WEB", 4)
-    
-    """ Retrieve docs from web search """
-
-    # Search
-    tavily_search = TavilySearchResults(max_results=3)
-
-    # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions]+state['messages'])
-    
-    # Search
-    search_docs = tavily_search.invoke(search_query.search_query)
-
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
+def format_web_docs(search_docs):
+    """ Format Tavily results as <Document> blobs """
+    return "\n\n---\n\n".join(
         [
             f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
             for doc in search_docs
         ]
     )
 
-    return {"context": [formatted_search_docs]} 
-
-def search_wikipedia(state: InterviewState):
-    status_updater.update("SEARCH_WIKIPEDIA", 5)
-    
-    """ Retrieve docs from wikipedia """
-
-    # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions]+state['messages'])
-    
-    # Search
-    search_docs = WikipediaLoader(query=search_query.search_query, 
-                                  load_max_docs=2).load()
-
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
+def format_wikipedia_docs(search_docs):
+    """ Format Wikipedia pages as <Document> blobs """
+    return "\n\n---\n\n".join(
         [
             f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
             for doc in search_docs
         ]
     )
 
-    return {"context": [formatted_search_docs]} 
+# Retrieval results are shared across turns, analysts and sessions
+search_cache = search_cache_from_env()
+
+@lru_cache(maxsize=None)
+def web_search_tool():
+    """ Tavily client shared by every web search """
+    if fake_providers():
+        return fake_providers().web_search
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults(max_results=3)
+
+def wikipedia_loader(query: str):
+    """ Live Wikipedia loader for a query """
+    if fake_providers():
+        return fake_providers().wikipedia_loader(query)
+    from langchain_community.document_loaders import WikipediaLoader
+    return WikipediaLoader(query=query, load_max_docs=2)
+
+# A degraded source fails fast for every session instead of being waited out on each turn
+breakers = breakers_from_env()
+
+def record_retrieval(source: str, blob: str, fetched: bool):
+    """ Charge a retrieval to the running node """
+    size = len(blob.encode("utf-8"))
+    record_cache("search", hit=not fetched)
+    add_usage(f"retrieval_bytes:{source}", size)
+    set_attributes(retrieval_bytes=size)
+    return blob
+
+@tracer.traced("search.web", KIND_CLIENT)
+def fetch_web_docs(query: str) -> str:
+    """ Formatted Tavily results for a query, served from the search cache when possible """
+    fetched = []
+
+    def fetch():
+        fetched.append(query)
+        breakers["web"].check()
+        with limiters["tavily"].limit():
+            with breakers["web"].track():
+                return format_web_docs(web_search_tool().invoke(query))
+    return record_retrieval("web", search_cache.call("web", query, fetch), bool(fetched))
+
+@tracer.traced("search.web", KIND_CLIENT)
+async def afetch_web_docs(query: str) -> str:
+    """ Async counterpart of fetch_web_docs """
+    fetched = []
+
+    async def fetch():
+        fetched.append(query)
+        breakers["web"].check()
+        async with limiters["tavily"].alimit():
+            with breakers["web"].track():
+                return format_web_docs(await web_search_tool().ainvoke(query))
+    return record_retrieval("web", await search_cache.acall("web", query, fetch), bool(fetched))
+
+@lru_cache(maxsize=None)
+def offline_wikipedia():
+    """ Local BM25 index (see wiki_index.py) used instead of live Wikipedia when WIKIPEDIA_INDEX_DIR is set """
+    index_dir = os.getenv("WIKIPEDIA_INDEX_DIR")
+    if not index_dir:
+        return None
+    from wiki_index import WikiIndex
+    return WikiIndex(index_dir)
+
+@tracer.traced("search.wikipedia", KIND_CLIENT)
+def fetch_wikipedia_docs(query: str) -> str:
+    """ Formatted Wikipedia pages for a query, served from the search cache when possible """
+    fetched = []
+
+    def fetch():
+        fetched.append(query)
+        index = offline_wikipedia()
+        if index is not None:
+            return format_wikipedia_docs(index.search(query, k=2))
+        breakers["wikipedia"].check()
+        with limiters["wikipedia"].limit():
+            with breakers["wikipedia"].track():
+                return format_wikipedia_docs(wikipedia_loader(query).load())
+    return record_retrieval("wikipedia", search_cache.call("wikipedia", query, fetch), bool(fetched))
+
+@tracer.traced("search.wikipedia", KIND_CLIENT)
+async def afetch_wikipedia_docs(query: str) -> str:
+    """ Async counterpart of fetch_wikipedia_docs """
+    fetched = []
+
+    async def fetch():
+        fetched.append(query)
+        index = offline_wikipedia()
+        if index is not None:
+            # Local lookups take milliseconds, so they run inline on the loop
+            return format_wikipedia_docs(index.search(query, k=2))
+        breakers["wikipedia"].check()
+        async with limiters["wikipedia"].alimit():
+            with breakers["wikipedia"].track():
+                return format_wikipedia_docs(await wikipedia_loader(query).aload())
+    return record_retrieval("wikipedia", await search_cache.acall("wikipedia", query, fetch), bool(fetched))
+
+# Source-specific phrasing asks for one query per retriever in the same structured call
+source_specific_queries = os.getenv("SEARCH_QUERY_PER_SOURCE", "0").lower() in ("1", "true", "yes", "on")
+
+source_query_instructions = SystemMessage(content=f"""You will be given a conversation between an analyst and an expert. 
+
+Your goal is to generate retrieval queries related to the conversation, one for each search source.
+        
+First, analyze the full conversation.
+
+Pay particular attention to the final question posed by the analyst.
+
+Convert this final question into:
+
+1. A well-structured web search query.
+
+2. A short Wikipedia lookup: the title of the encyclopedia article (an entity or concept) most likely to answer it.""")
+
+def search_query_update(query):
+    """ State update for a generated SearchQuery or SourceSearchQueries """
+    if isinstance(query, SourceSearchQueries):
+        return {"search_query": query.web_query,
+                "search_queries": {"web": query.web_query, "wikipedia": query.wikipedia_query or query.web_query}}
+    return {"search_query": query.search_query, "search_queries": {}}
+
+def generate_search_query(state: InterviewState):
+    status_updater.update("GENERATE_SEARCH_QUERY", 16)
+
+    """ Write the search query once per turn and share it with every retriever """
+
+    if source_specific_queries:
+        query = invoke_llm([source_query_instructions]+state['messages'], SourceSearchQueries)
+    else:
+        query = invoke_llm([search_instructions]+state['messages'], SearchQuery)
+
+    update = search_query_update(query)
+    status_updater.update("GENERATE_SEARCH_QUERY", 16, {"search_query": update["search_query"]})
+    return update
+
+async def agenerate_search_query(state: InterviewState):
+    status_updater.update("GENERATE_SEARCH_QUERY", 16)
+
+    """ Write the search query once per turn and share it with every retriever (async) """
+
+    if source_specific_queries:
+        query = await ainvoke_llm([source_query_instructions]+state['messages'], SourceSearchQueries)
+    else:
+        query = await ainvoke_llm([search_instructions]+state['messages'], SearchQuery)
+
+    update = search_query_update(query)
+    status_updater.update("GENERATE_SEARCH_QUERY", 16, {"search_query": update["search_query"]})
+    return update
+
+def query_for(state: InterviewState, source: str) -> str:
+    """ The query a retriever should run this turn """
+    return (state.get("search_queries") or {}).get(source) or state["search_query"]
+
+# Sources are searched side by side; the answer waits for the first plus a grace window (see retrieval.py)
+retrieval_race = source_race_from_env()
+RETRIEVAL_SOURCES = ("web", "wikipedia")
+
+def retrieval_update(state: InterviewState, queries: dict, results: dict, late: list):
+    """ Context for this turn, including last turn's late results if they have reached the search cache """
+    folded = [search_cache.get(item["source"], item["query"]) for item in state.get("late_sources") or []]
+    folded = [blob for blob in folded if blob]
+    context = folded + [results[source] for source in RETRIEVAL_SOURCES if source in results]
+    status_updater.update("RETRIEVE", 19, {"sources": sorted(results), "late": late, "folded": len(folded)})
+    return {"context": context, "late_sources": [{"source": source, "query": queries[source]} for source in late]}
+
+def retrieve(state: InterviewState):
+    status_updater.update("RETRIEVE", 19)
+
+    """ Node to search the web and Wikipedia at once, answering from the sources that return in time """
+
+    queries = {source: query_for(state, source) for source in RETRIEVAL_SOURCES}
+    try:
+        results, late = retrieval_race.run({
+            "web": lambda: fetch_web_docs(queries["web"]),
+            "wikipedia": lambda: fetch_wikipedia_docs(queries["wikipedia"]),
+        })
+    except Exception as e:
+        # Every source failed or its circuit is open; the expert answers from the context gathered so far
+        status_updater.update("RETRIEVE", 19, {"warning": f"No source returned: {e}"})
+        results, late = {}, []
+    return retrieval_update(state, queries, results, late)
+
+async def aretrieve(state: InterviewState):
+    status_updater.update("RETRIEVE", 19)
+
+    """ Node to search the web and Wikipedia at once, answering from the sources that return in time (async) """
+
+    queries = {source: query_for(state, source) for source in RETRIEVAL_SOURCES}
+    try:
+        results, late = await retrieval_race.arun({
+            "web": lambda: afetch_web_docs(queries["web"]),
+            "wikipedia": lambda: afetch_wikipedia_docs(queries["wikipedia"]),
+        })
+    except Exception as e:
+        # Every source failed or its circuit is open; the expert answers from the context gathered so far
+        status_updater.update("RETRIEVE", 19, {"warning": f"No source returned: {e}"})
+        results, late = {}, []
+    return retrieval_update(state, queries, results, late)
 
 # Generate expert answer
 answer_instructions = """You are an expert being interviewed by an analyst.
@@ -274,25 +793,70 @@ When answering questions, follow these guidelines:
         
 And skip the addition of the brackets as well as the Document source preamble in your citation."""
 
-def generate_answer(state: InterviewState):
-    status_updater.update("GENERATE_ANSWER", 6)
-    
-    """ Node to answer a question """
+# Passage ranking keeps the answer prompt bounded as the interview context grows
+passage_ranking = os.getenv("PASSAGE_RANKING", "1").lower() not in ("0", "false", "no", "off")
+passage_settings = passage_settings_from_env()
+
+def answer_messages(state: InterviewState):
+    """ Build the expert's answer prompt from the gathered context.
+
+    Returns the messages and the keys of the passages (or, without passage
+    ranking, the documents) shown, so later turns only send what the expert
+    has not seen yet. """
 
     # Get state
     analyst = state["analyst"]
     messages = state["messages"]
     context = state["context"]
+    seen_before = set(state.get("seen_context") or [])
+
+    # Earlier answers already carry what the expert learned from what it has seen
+    if passage_ranking:
+        # Only send the passages most relevant to the analyst's latest question. Passages already
+        # shown are skipped, but the rest of their documents can still be picked.
+        documents = parse_documents(context)
+        skip = seen_passages(documents, seen_before)
+        selected = pick_passages(documents, messages[-1].content, skip=skip, **passage_settings)
+        keys = {doc_index: document_key(*documents[doc_index]) for _, doc_index, *_ in selected}
+        shown = {passage_key(keys[doc_index], passage_index) for _, doc_index, passage_index, *_ in selected}
+        context = format_passages(selected)
+    else:
+        documents = unseen_documents(context, seen_before) or parse_documents(context)
+        shown = {document_key(header, body) for header, body in documents}
+        context = DOCUMENT_SEPARATOR.join(format_document(header, body) for header, body in documents)
 
-    # Answer question
     system_message = answer_instructions.format(goals=analyst.persona, context=context)
-    answer = llm.invoke([SystemMessage(content=system_message)]+messages)
+    return [SystemMessage(content=system_message)]+messages, sorted(shown - seen_before)
+
+def generate_answer(state: InterviewState):
+    status_updater.update("GENERATE_ANSWER", 6)
+    
+    """ Node to answer a question """
+
+    # Answer question
+    prompt, seen = answer_messages(state)
+    answer = invoke_llm(prompt)
             
     # Name the message as coming from the expert
     answer.name = "expert"
     
     # Append it to state
-    return {"messages": [answer]}
+    return {"messages": [answer], "seen_context": seen}
+
+async def agenerate_answer(state: InterviewState):
+    status_updater.update("GENERATE_ANSWER", 6)
+    
+    """ Node to answer a question (async) """
+
+    # Answer question
+    prompt, seen = answer_messages(state)
+    answer = await ainvoke_llm(prompt)
+            
+    # Name the message as coming from the expert
+    answer.name = "expert"
+    
+    # Append it to state
+    return {"messages": [answer], "seen_context": seen}
 
 def save_interview(state: InterviewState):
     status_updater.update("SAVE_INTERVIEW", 7)
@@ -390,39 +954,62 @@ There should be no redundant sources. It should simply be:
 - Include no preamble before the title of the report
 - Check that all guidelines have been followed"""
 
-def write_section(state: InterviewState):
-    status_updater.update("WRITE_SECTION", 9)
-    
-    """ Node to write a section """
+# Upper bound on the source material handed to write_section
+section_token_budget = int(os.getenv("SECTION_TOKEN_BUDGET", "4000"))
+
+def section_messages(state: InterviewState):
+    """ Build the section writer prompt for a finished interview """
 
     # Get state
-    interview = state["interview"]
-    context = state["context"]
     analyst = state["analyst"]
+    documents = parse_documents(state["context"])
+    context = DOCUMENT_SEPARATOR.join(format_document(header, body) for header, body in documents)
+
+    # Long interviews keep only the passages closest to the analyst's focus
+    if estimate_tokens(context) > section_token_budget:
+        context = format_passages(pick_passages(documents, analyst.description, top_k=len(documents) * 50,
+                                                token_budget=section_token_budget,
+                                                words=passage_settings["words"], overlap=passage_settings["overlap"]))
    
     # Write section using either the gathered source docs from interview (context) or the interview itself (interview)
     system_message = section_writer_instructions.format(focus=analyst.description)
-    section = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]) 
+    return [SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]
+
+def write_section(state: InterviewState):
+    status_updater.update("WRITE_SECTION", 9)
+    
+    """ Node to write a section """
+
+    section = invoke_llm(section_messages(state)) 
+                
+    # Append it to state
+    return {"sections": [section.content]}
+
+async def awrite_section(state: InterviewState):
+    status_updater.update("WRITE_SECTION", 9)
+    
+    """ Node to write a section (async) """
+
+    section = await ainvoke_llm(section_messages(state)) 
                 
     # Append it to state
     return {"sections": [section.content]}
 
 # Add nodes and edges 
 interview_builder = StateGraph(InterviewState)
-interview_builder.add_node("ask_question", generate_question)
-interview_builder.add_node("search_web", search_web)
-interview_builder.add_node("search_wikipedia", search_wikipedia)
-interview_builder.add_node("answer_question", generate_answer)
-interview_builder.add_node("save_interview", save_interview)
-interview_builder.add_node("write_section", write_section)
+interview_builder.add_node("ask_question", make_node(generate_question, agenerate_question))
+interview_builder.add_node("search_query", make_node(generate_search_query, agenerate_search_query))
+interview_builder.add_node("retrieve", make_node(retrieve, aretrieve))
+interview_builder.add_node("answer_question", make_node(generate_answer, agenerate_answer))
+interview_builder.add_node("save_interview", make_node(save_interview))
+interview_builder.add_node("write_section", make_node(write_section, awrite_section))
 
 # Flow
 interview_builder.add_edge(START, "ask_question")
-interview_builder.add_edge("ask_question", "search_web")
-interview_builder.add_edge("ask_question", "search_wikipedia")
-interview_builder.add_edge("search_web", "answer_question")
-interview_builder.add_edge("search_wikipedia", "answer_question")
-interview_builder.add_conditional_edges("answer_question", route_messages,['ask_question','save_interview'])
+interview_builder.add_edge("ask_question", "search_query")
+interview_builder.add_edge("search_query", "retrieve")
+interview_builder.add_edge("retrieve", "answer_question")
+interview_builder.add_conditional_edges("answer_question", make_edge(route_messages),['ask_question','save_interview'])
 interview_builder.add_edge("save_interview", "write_section")
 interview_builder.add_edge("write_section", END)
 
@@ -440,13 +1027,129 @@ def initiate_all_interviews(state: ResearchGraphState):
 
     # Otherwise kick off interviews in parallel via Send() API
     else:
-        topic = state["topic"]
         status_updater.update("INITIATE_ALL_INTERVIEWS", 10, {"decision": "conduct_interview", "count": len(state["analysts"])})
-        return [Send("conduct_interview", {"analyst": analyst,
-                                           "messages": [HumanMessage(
-                                               content=f"So you said you were writing an article on {topic}?"
-                                           )
-                                                       ]}) for analyst in state["analysts"]]
+        return interview_sends(state)
+
+def interview_sends(state: ResearchGraphState):
+    """ One conduct_interview branch per analyst, all sharing one join """
+    topic = state["topic"]
+    join_id = uuid.uuid4().hex
+    return [Send("conduct_interview", {"analyst": analyst,
+                                       "messages": [HumanMessage(
+                                           content=f"So you said you were writing an article on {topic}?"
+                                       )],
+                                       "max_num_turns": state.get("max_num_turns", 2),
+                                       "join_id": join_id,
+                                       "analyst_count": len(state["analysts"])}) for analyst in state["analysts"]]
+
+# Joins of the interview branches in flight, keyed by join_id, with how many branches are inside each
+interview_joins = {}
+interview_joins_lock = threading.Lock()
+
+def interview_branches(state) -> int:
+    """ Branches the join waits for: every analyst's, or after a resume only those that had not finished """
+    try:
+        scheduled = get_config().get("configurable", {}).get("interview_branches")
+    except RuntimeError:
+        scheduled = None
+    return scheduled or state["analyst_count"]
+
+def resume_config(config: dict, snapshot) -> dict:
+    """ Config for resuming a stopped run from its checkpoint snapshot.
+
+    Interviews that finished before the run stopped are not run again, so the
+    join is sized from the conduct_interview branches still pending. """
+    pending = sum(1 for task in snapshot.tasks if task.name == "conduct_interview" and task.result is None)
+    if pending:
+        config["configurable"]["interview_branches"] = pending
+    return config
+
+def interview_join(state):
+    """ The join shared by this branch and its siblings, started by whichever runs first """
+    with interview_joins_lock:
+        entry = interview_joins.get(state["join_id"])
+        if entry is None:
+            entry = interview_joins[state["join_id"]] = [join_from_env(interview_branches(state)), 0]
+        entry[1] += 1
+        return entry[0]
+
+def leave_join(state, join):
+    """ Settle this branch; the join is forgotten once every branch has settled or none is left inside it """
+    with interview_joins_lock:
+        settled = join.settle()
+        entry = interview_joins.get(state["join_id"])
+        if entry is not None and entry[0] is join:
+            entry[1] -= 1
+            if settled or entry[1] == 0:
+                del interview_joins[state["join_id"]]
+
+def interview_input(state):
+    """ The branch payload without the join bookkeeping, as input for the interview subgraph """
+    return {key: value for key, value in state.items() if key not in ("join_id", "analyst_count")}
+
+def skip_interview(analyst, reason: str):
+    status_updater.update("CONDUCT_INTERVIEW", 18, {"analyst": analyst.name, "skipped": reason})
+    return {"skipped_analysts": [{"name": analyst.name, "reason": reason}]}
+
+@lru_cache(maxsize=None)
+def interview_executor():
+    """ Worker threads for sync interviews, so conduct_interview can stop waiting on one """
+    return ThreadPoolExecutor(max_workers=int(os.getenv("INTERVIEW_MAX_WORKERS", "32")),
+                              thread_name_prefix="interview")
+
+def conduct_interview(state):
+    analyst = state["analyst"]
+    status_updater.update("CONDUCT_INTERVIEW", 18, {"analyst": analyst.name})
+
+    """ Node to run one analyst's interview, giving up on it once the join stops waiting (see QuorumJoin) """
+
+    cancelled = threading.Event()
+    started = []
+
+    def run():
+        # The branch's time starts when a worker picks it up, not while it waits for a free one
+        started.append(time.monotonic())
+        join.notify()
+        interview_cancelled.set(cancelled)
+        return get_interview_graph().invoke(interview_input(state))
+
+    join = interview_join(state)
+    try:
+        # The copied context carries the run's config, so the interview still runs as a subgraph
+        future = interview_executor().submit(contextvars.copy_context().run, run)
+        future.add_done_callback(lambda _: join.notify())
+        if not join.wait_for(future.done, lambda: started[0] if started else None):
+            cancelled.set()
+            return skip_interview(analyst, "timed out")
+        # A failed interview no longer holds up the join either
+        join.finish()
+        try:
+            return {"sections": future.result()["sections"]}
+        except Exception as e:
+            return skip_interview(analyst, f"failed: {type(e).__name__}")
+    finally:
+        leave_join(state, join)
+
+async def aconduct_interview(state):
+    analyst = state["analyst"]
+    status_updater.update("CONDUCT_INTERVIEW", 18, {"analyst": analyst.name})
+
+    """ Node to run one analyst's interview, giving up on it once the join stops waiting (async) """
+
+    join, task = interview_join(state), None
+    try:
+        task = asyncio.ensure_future(get_interview_graph().ainvoke(interview_input(state)))
+        if not await join.await_for(task):
+            return skip_interview(analyst, "timed out")
+        join.finish()
+        try:
+            return {"sections": task.result()["sections"]}
+        except Exception as e:
+            return skip_interview(analyst, f"failed: {type(e).__name__}")
+    finally:
+        if task is not None and not task.done():
+            task.cancel()
+        leave_join(state, join)
 
 # Write a report based on the interviews
 report_writer_instructions = """You are a technical writer creating a report on this overall topic: 
@@ -486,30 +1189,175 @@ Here are the memos from your analysts to build your report from:
 
 {context}"""
 
+def finish_stage(stage: str, step: str, step_number: int, started_at: float, info: Dict[str, Any]):
+    """ Report a finished report-writing stage and return its timing as a state update """
+    seconds = round(time.time() - started_at, 3)
+    status_updater.update(step, step_number, {**info, "duration_seconds": seconds})
+    return {"stage_timings": {stage: {"started_at": started_at, "seconds": seconds}}}
+
+# Condense the interview sections when there are too many to write from in one prompt
+condense_instructions = """You are a technical writer merging analyst memos on this overall topic:
+
+{topic}
+
+You will be given a batch of memos. Each memo has its own numbered citations, for example [1] or [2], and its own list of sources.
+
+Your task:
+
+1. Merge the memos into one memo that keeps every distinct insight, finding and figure.
+2. Drop repetition between memos, but do not drop facts.
+3. Keep every citation attached to the claim it supports.
+4. Renumber the citations so they are consistent across the merged memo: one number per unique source, in order of first use.
+5. End with a `### Sources` header listing each numbered source once, in order.
+
+Use markdown formatting. Include no pre-amble. Start with a single `## ` title that covers the whole batch.
+
+Here are the memos to merge:
+
+{context}"""
+
+# Sections are merged in batches of this size until they fit in one prompt
+report_batch_size = max(int(os.getenv("REPORT_BATCH_SIZE", "5")), 2)
+report_token_budget = int(os.getenv("REPORT_TOKEN_BUDGET", "12000"))
+report_max_workers = int(os.getenv("REPORT_MAX_WORKERS", "8"))
+
+def needs_condensing(memos) -> bool:
+    """ True when the memos are too many or too long for the report writers """
+    if len(memos) <= 1:
+        return False
+    return len(memos) > report_batch_size or estimate_tokens("\n\n".join(memos)) > report_token_budget
+
+def batch_memos(memos) -> list:
+    """ Split the memos into consecutive batches of at most report_batch_size """
+    return [memos[start:start + report_batch_size] for start in range(0, len(memos), report_batch_size)]
+
+def condense_messages(batch, topic):
+    """ Build the prompt that merges one batch of memos """
+    context = "\n\n".join(f"{memo}" for memo in batch)
+    system_message = condense_instructions.format(topic=topic, context=context)
+    return [SystemMessage(content=system_message)]+[HumanMessage(content="Merge these memos into one memo.")]
+
+def condense_batch(batch, topic) -> str:
+    """ Merge one batch of memos (a single memo is passed through) """
+    if len(batch) == 1:
+        return batch[0]
+    return invoke_llm(condense_messages(batch, topic)).content
+
+async def acondense_batch(batch, topic) -> str:
+    """ Async counterpart of condense_batch """
+    if len(batch) == 1:
+        return batch[0]
+    return (await ainvoke_llm(condense_messages(batch, topic))).content
+
+def interview_sections(state: ResearchGraphState):
+    """ The sections written by the interviews, failing the run when every interview was skipped """
+    sections = state.get("sections", [])
+    skipped = state.get("skipped_analysts", [])
+    if not sections and skipped:
+        raise RuntimeError("No interview finished: " + skipped_note(skipped))
+    return sections
+
+def skipped_note(skipped) -> str:
+    return ", ".join(f"{entry['name']} ({entry['reason']})" for entry in skipped)
+
+def condense_sections(state: ResearchGraphState):
+    status_updater.update("CONDENSE_SECTIONS", 17)
+    started_at = time.time()
+
+    """ Node to merge the sections level by level, batches in parallel, until they fit one prompt """
+
+    memos = interview_sections(state)
+    topic = state.get("topic", "Unknown Topic")
+    if not needs_condensing(memos):
+        return {"memos": []}
+
+    level = 0
+    with ThreadPoolExecutor(max_workers=report_max_workers) as pool:
+        while needs_condensing(memos):
+            level += 1
+            batches = batch_memos(memos)
+            status_updater.update("CONDENSE_SECTIONS", 17, {"level": level, "memos": len(memos), "batches": len(batches)})
+            # Each task runs in a copy of this context so the run's config and callbacks follow it
+            futures = [pool.submit(contextvars.copy_context().run, condense_batch, batch, topic) for batch in batches]
+            memos = [future.result() for future in futures]
+
+    timing = finish_stage("condense_sections", "CONDENSE_SECTIONS", 17, started_at, {"levels": level, "memos": len(memos)})
+    return {"memos": memos, **timing}
+
+async def acondense_sections(state: ResearchGraphState):
+    status_updater.update("CONDENSE_SECTIONS", 17)
+    started_at = time.time()
+
+    """ Node to merge the sections level by level, batches in parallel, until they fit one prompt (async) """
+
+    memos = interview_sections(state)
+    topic = state.get("topic", "Unknown Topic")
+    if not needs_condensing(memos):
+        return {"memos": []}
+
+    level = 0
+    while needs_condensing(memos):
+        level += 1
+        batches = batch_memos(memos)
+        status_updater.update("CONDENSE_SECTIONS", 17, {"level": level, "memos": len(memos), "batches": len(batches)})
+        memos = list(await asyncio.gather(*(acondense_batch(batch, topic) for batch in batches)))
+
+    timing = finish_stage("condense_sections", "CONDENSE_SECTIONS", 17, started_at, {"levels": level, "memos": len(memos)})
+    return {"memos": memos, **timing}
+
+def report_messages(sections, topic):
+    """ Build the report writer prompt from the interview sections """
+
+    # Concat all sections together
+    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+    
+    # Summarize the sections into a final report
+    system_message = report_writer_instructions.format(topic=topic, context=formatted_str_sections)    
+    return [SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")]
+
 def write_report(state: ResearchGraphState):
     status_updater.update("WRITE_REPORT", 11)
+    started_at = time.time()
 
     """ Node to write the final report body """
 
-    # Full set of sections
-    sections = state.get("sections", [])
+    # Condensed memos when there were too many sections, otherwise the full set of sections
+    sections = state.get("memos") or state.get("sections", [])
     topic = state.get("topic", "Unknown Topic")
     
     if not sections:
         status_updater.update("WRITE_REPORT", 11, {"warning": "No sections found in state"})
-        return {"content": "No sections available for report generation"}
+        return {"content": "No sections available for report generation",
+                "stage_timings": {"write_report": {"started_at": started_at, "seconds": 0.0}}}
 
     status_updater.update("WRITE_REPORT", 11, {"sections_count": len(sections)})
 
-    # Concat all sections together
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+    report = stream_llm(report_messages(sections, topic), "content") 
     
-    # Summarize the sections into a final report
-    system_message = report_writer_instructions.format(topic=topic, context=formatted_str_sections)    
-    report = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")]) 
+    timing = finish_stage("write_report", "WRITE_REPORT", 11, started_at, {"content_length": len(report.content)})
+    return {"content": report.content, **timing}
+
+async def awrite_report(state: ResearchGraphState):
+    status_updater.update("WRITE_REPORT", 11)
+    started_at = time.time()
+
+    """ Node to write the final report body (async) """
+
+    # Condensed memos when there were too many sections, otherwise the full set of sections
+    sections = state.get("memos") or state.get("sections", [])
+    topic = state.get("topic", "Unknown Topic")
     
-    status_updater.update("WRITE_REPORT", 11, {"content_length": len(report.content)})
-    return {"content": report.content}
+    if not sections:
+        status_updater.update("WRITE_REPORT", 11, {"warning": "No sections found in state"})
+        return {"content": "No sections available for report generation",
+                "stage_timings": {"write_report": {"started_at": started_at, "seconds": 0.0}}}
+
+    status_updater.update("WRITE_REPORT", 11, {"sections_count": len(sections)})
+
+    report = await astream_llm(report_messages(sections, topic), "content") 
+    
+    timing = finish_stage("write_report", "WRITE_REPORT", 11, started_at, {"content_length": len(report.content)})
+    return {"content": report.content, **timing}
 
 # Write the introduction or conclusion
 intro_conclusion_instructions = """You are a technical writer finishing a report on {topic}
@@ -534,51 +1382,89 @@ For your conclusion, use ## Conclusion as the section header.
 
 Here are the sections to reflect on for writing: {formatted_str_sections}"""
 
-def write_introduction(state: ResearchGraphState):
-    status_updater.update("WRITE_INTRODUCTION", 12)
+def intro_conclusion_messages(sections, topic, request):
+    """ Build the prompt for the introduction or conclusion """
 
-    """ Node to write the introduction """
+    # Concat all sections together
+    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+    
+    # Summarize the sections into a final report
+    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
+    return [SystemMessage(content=instructions)]+[HumanMessage(content=request)]
 
-    # Full set of sections
-    sections = state.get("sections", [])
+def introduction_inputs(state: ResearchGraphState):
+    """ Sections and topic for the introduction, with a placeholder when nothing was written """
+
+    # Condensed memos when there were too many sections, otherwise the full set of sections
+    sections = state.get("memos") or state.get("sections", [])
     topic = state.get("topic", "Unknown Topic")
     
     if not sections:
         status_updater.update("WRITE_INTRODUCTION", 12, {"warning": "No sections found for introduction"})
         sections = ["No sections available"]
 
-    # Concat all sections together
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-    
-    # Summarize the sections into a final report
-    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-    intro = llm.invoke([SystemMessage(content=instructions)]+[HumanMessage(content=f"Write the report introduction")]) 
+    return sections, topic
+
+def write_introduction(state: ResearchGraphState):
+    status_updater.update("WRITE_INTRODUCTION", 12)
+    started_at = time.time()
+
+    """ Node to write the introduction """
+
+    sections, topic = introduction_inputs(state)
+    intro = stream_llm(intro_conclusion_messages(sections, topic, "Write the report introduction"), "introduction") 
     
-    status_updater.update("WRITE_INTRODUCTION", 12, {"content_length": len(intro.content)})
-    return {"introduction": intro.content}
+    timing = finish_stage("write_introduction", "WRITE_INTRODUCTION", 12, started_at, {"content_length": len(intro.content)})
+    return {"introduction": intro.content, **timing}
 
-def write_conclusion(state: ResearchGraphState):
-    status_updater.update("WRITE_CONCLUSION", 13)
+async def awrite_introduction(state: ResearchGraphState):
+    status_updater.update("WRITE_INTRODUCTION", 12)
+    started_at = time.time()
 
-    """ Node to write the conclusion """
+    """ Node to write the introduction (async) """
 
-    # Full set of sections
-    sections = state.get("sections", [])
+    sections, topic = introduction_inputs(state)
+    intro = await astream_llm(intro_conclusion_messages(sections, topic, "Write the report introduction"), "introduction") 
+    
+    timing = finish_stage("write_introduction", "WRITE_INTRODUCTION", 12, started_at, {"content_length": len(intro.content)})
+    return {"introduction": intro.content, **timing}
+
+def conclusion_inputs(state: ResearchGraphState):
+    """ Sections and topic for the conclusion, with a placeholder when nothing was written """
+
+    # Condensed memos when there were too many sections, otherwise the full set of sections
+    sections = state.get("memos") or state.get("sections", [])
     topic = state.get("topic", "Unknown Topic")
     
     if not sections:
         status_updater.update("WRITE_CONCLUSION", 13, {"warning": "No sections found for conclusion"})
         sections = ["No sections available"]
 
-    # Concat all sections together
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+    return sections, topic
+
+def write_conclusion(state: ResearchGraphState):
+    status_updater.update("WRITE_CONCLUSION", 13)
+    started_at = time.time()
+
+    """ Node to write the conclusion """
+
+    sections, topic = conclusion_inputs(state)
+    conclusion = stream_llm(intro_conclusion_messages(sections, topic, "Write the report conclusion"), "conclusion") 
     
-    # Summarize the sections into a final report
-    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-    conclusion = llm.invoke([SystemMessage(content=instructions)]+[HumanMessage(content=f"Write the report conclusion")]) 
+    timing = finish_stage("write_conclusion", "WRITE_CONCLUSION", 13, started_at, {"content_length": len(conclusion.content)})
+    return {"conclusion": conclusion.content, **timing}
+
+async def awrite_conclusion(state: ResearchGraphState):
+    status_updater.update("WRITE_CONCLUSION", 13)
+    started_at = time.time()
+
+    """ Node to write the conclusion (async) """
+
+    sections, topic = conclusion_inputs(state)
+    conclusion = await astream_llm(intro_conclusion_messages(sections, topic, "Write the report conclusion"), "conclusion") 
     
-    status_updater.update("WRITE_CONCLUSION", 13, {"content_length": len(conclusion.content)})
-    return {"conclusion": conclusion.content}
+    timing = finish_stage("write_conclusion", "WRITE_CONCLUSION", 13, started_at, {"content_length": len(conclusion.content)})
+    return {"conclusion": conclusion.content, **timing}
 
 def finalize_report(state: ResearchGraphState):
     status_updater.update("FINALIZE_REPORT", 14)
@@ -618,62 +1504,140 @@ def finalize_report(state: ResearchGraphState):
 
     # Combine all parts
     final_report = introduction + "\n\n---\n\n" + content + "\n\n---\n\n" + conclusion
+    skipped = state.get("skipped_analysts", [])
+    if skipped:
+        final_report += f"\n\n> **Note:** This report does not include the interviews of {skipped_note(skipped)}."
     if sources is not None:
         final_report += "\n\n## Sources\n" + sources
     
     status_updater.update("FINALIZE_REPORT", 14, {"report_length": len(final_report)})
+
+    # The writers run in parallel, so the stage costs the slowest writer rather than their sum
+    timings = state.get("stage_timings") or {}
+    if timings:
+        ended_at = max(t["started_at"] + t["seconds"] for t in timings.values())
+        status_updater.update("FINALIZE_REPORT", 14, {
+            "stage_timings": {stage: t["seconds"] for stage, t in timings.items()},
+            "reduce_wall_seconds": round(ended_at - min(t["started_at"] for t in timings.values()), 3),
+            "reduce_sequential_seconds": round(sum(t["seconds"] for t in timings.values()), 3),
+        })
     return {"final_report": final_report}
 
-# Add nodes and edges 
-builder = StateGraph(ResearchGraphState)
-builder.add_node("create_analysts", create_analysts)
-builder.add_node("human_feedback", human_feedback)
-builder.add_node("conduct_interview", interview_builder.compile())
-builder.add_node("write_report",write_report)
-builder.add_node("write_introduction",write_introduction)
-builder.add_node("write_conclusion",write_conclusion)
-builder.add_node("finalize_report",finalize_report)
-
-# Logic
-builder.add_edge(START, "create_analysts")
-builder.add_edge("create_analysts", "human_feedback")
-builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "conduct_interview"])
-builder.add_edge("conduct_interview", "write_report")
-builder.add_edge("write_report", "write_introduction")
-builder.add_edge("write_introduction", "write_conclusion")
-builder.add_edge("write_conclusion", "finalize_report")
-builder.add_edge("finalize_report", END)
-
-# Compile two versions of the graph
-graph = builder.compile(interrupt_before=['human_feedback'])
-
-# Version without interrupts for direct execution
-builder_no_interrupt = StateGraph(ResearchGraphState)
-builder_no_interrupt.add_node("create_analysts", create_analysts)
-builder_no_interrupt.add_node("conduct_interview", interview_builder.compile())
-builder_no_interrupt.add_node("write_report", write_report)
-builder_no_interrupt.add_node("write_introduction", write_introduction)
-builder_no_interrupt.add_node("write_conclusion", write_conclusion)
-builder_no_interrupt.add_node("finalize_report", finalize_report)
+@lru_cache(maxsize=None)
+def get_interview_graph():
+    """ Interview subgraph, compiled once and shared by both research graphs """
+    return interview_builder.compile()
+
+def conduct_interview_node():
+    """ The conduct_interview node, compiling the interview subgraph up front so errors surface at build time """
+    get_interview_graph()
+    return make_node(conduct_interview, aconduct_interview)
+
+@lru_cache(maxsize=None)
+def get_checkpointer():
+    """ Checkpoint store for graph (see checkpointing.py) """
+    from checkpointing import checkpointer_from_env
+    return checkpointer_from_env()
+
+def thread_config(thread_id: str, recursion_limit: int = 100, budget_seconds: float = None) -> dict:
+    """ Run config for a session's thread (see checkpointing.thread_config) """
+    from checkpointing import thread_config as checkpoint_config
+    return checkpoint_config(thread_id, recursion_limit, budget_seconds)
+
+def finish_thread(thread_id: str):
+    """ Keep only the last checkpoint of a finished run, which is enough to restore its session """
+    finish = getattr(get_checkpointer(), "finish_thread", None)
+    if finish is not None:
+        finish(thread_id)
+
+@lru_cache(maxsize=None)
+def research_builder():
+    """ Nodes and edges of the research graph that pauses for human feedback """
+
+    # Add nodes and edges 
+    builder = StateGraph(ResearchGraphState)
+    builder.add_node("create_analysts", make_node(create_analysts, acreate_analysts))
+    builder.add_node("human_feedback", make_node(human_feedback))
+    builder.add_node("conduct_interview", conduct_interview_node())
+    builder.add_node("condense_sections", make_node(condense_sections, acondense_sections))
+    builder.add_node("write_report", make_node(write_report, awrite_report))
+    builder.add_node("write_introduction", make_node(write_introduction, awrite_introduction))
+    builder.add_node("write_conclusion", make_node(write_conclusion, awrite_conclusion))
+    builder.add_node("finalize_report", make_node(finalize_report))
+
+    # Logic
+    builder.add_edge(START, "create_analysts")
+    builder.add_edge("create_analysts", "human_feedback")
+    builder.add_conditional_edges("human_feedback", make_edge(initiate_all_interviews), ["create_analysts", "conduct_interview"])
+    builder.add_edge("conduct_interview", "condense_sections")
+    builder.add_edge("condense_sections", "write_report")
+    builder.add_edge("condense_sections", "write_introduction")
+    builder.add_edge("condense_sections", "write_conclusion")
+    builder.add_edge(["write_report", "write_introduction", "write_conclusion"], "finalize_report")
+    builder.add_edge("finalize_report", END)
+
+    return builder
+
+@lru_cache(maxsize=None)
+def get_graph():
+    """ Research graph that pauses before human_feedback.
+
+    Checkpoints are saved per thread_id, so approval and feedback resume the paused run. """
+    return research_builder().compile(checkpointer=get_checkpointer(), interrupt_before=['human_feedback'])
+
+@lru_cache(maxsize=None)
+def get_server_graph():
+    """ Research graph exported to the LangGraph server (langgraph.json), which supplies its own checkpointer """
+    return research_builder().compile(interrupt_before=['human_feedback'])
 
 # Direct flow without human feedback
 def initiate_all_interviews_direct(state: ResearchGraphState):
     status_updater.update("INITIATE_ALL_INTERVIEWS_DIRECT", 15)
     
     """ Conditional edge to initiate all interviews via Send() API """
-    topic = state["topic"]
     status_updater.update("INITIATE_ALL_INTERVIEWS_DIRECT", 15, {"count": len(state["analysts"])})
-    return [Send("conduct_interview", {"analyst": analyst,
-                                       "messages": [HumanMessage(
-                                           content=f"So you said you were writing an article on {topic}?"
-                                       )]}) for analyst in state["analysts"]]
-
-builder_no_interrupt.add_edge(START, "create_analysts")
-builder_no_interrupt.add_conditional_edges("create_analysts", initiate_all_interviews_direct, ["conduct_interview"])
-builder_no_interrupt.add_edge("conduct_interview", "write_report")
-builder_no_interrupt.add_edge("write_report", "write_introduction")
-builder_no_interrupt.add_edge("write_introduction", "write_conclusion")
-builder_no_interrupt.add_edge("write_conclusion", "finalize_report")
-builder_no_interrupt.add_edge("finalize_report", END)
-
-graph_no_interrupt = builder_no_interrupt.compile()
\ No newline at end of file
+    return interview_sends(state)
+
+@lru_cache(maxsize=None)
+def get_graph_no_interrupt():
+    """ Version without interrupts for direct execution from a complete state.
+
+    Checkpointed like graph, so a run stopped part way resumes from its last step. """
+
+    builder_no_interrupt = StateGraph(ResearchGraphState)
+    builder_no_interrupt.add_node("create_analysts", make_node(create_analysts, acreate_analysts))
+    builder_no_interrupt.add_node("conduct_interview", conduct_interview_node())
+    builder_no_interrupt.add_node("condense_sections", make_node(condense_sections, acondense_sections))
+    builder_no_interrupt.add_node("write_report", make_node(write_report, awrite_report))
+    builder_no_interrupt.add_node("write_introduction", make_node(write_introduction, awrite_introduction))
+    builder_no_interrupt.add_node("write_conclusion", make_node(write_conclusion, awrite_conclusion))
+    builder_no_interrupt.add_node("finalize_report", make_node(finalize_report))
+
+    # Direct flow without human feedback
+    builder_no_interrupt.add_edge(START, "create_analysts")
+    builder_no_interrupt.add_conditional_edges("create_analysts", make_edge(initiate_all_interviews_direct), ["conduct_interview"])
+    builder_no_interrupt.add_edge("conduct_interview", "condense_sections")
+    builder_no_interrupt.add_edge("condense_sections", "write_report")
+    builder_no_interrupt.add_edge("condense_sections", "write_introduction")
+    builder_no_interrupt.add_edge("condense_sections", "write_conclusion")
+    builder_no_interrupt.add_edge(["write_report", "write_introduction", "write_conclusion"], "finalize_report")
+    builder_no_interrupt.add_edge("finalize_report", END)
+
+    return builder_no_interrupt.compile(checkpointer=get_checkpointer())
+
+# `from research_assistant import graph` (and llm, graph_no_interrupt, ...) still works:
+# these names are resolved through their factories on first access
+LAZY_ATTRIBUTES = {
+    "llm": get_llm,
+    "llm_cache": get_llm_cache,
+    "graph": get_graph,
+    "graph_no_interrupt": get_graph_no_interrupt,
+    "server_graph": get_server_graph,
+    "interview_graph": get_interview_graph,
+    "checkpointer": get_checkpointer,
+}
+
+def __getattr__(name):
+    if name in LAZY_ATTRIBUTES:
+        return LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
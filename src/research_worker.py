@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Research jobs, and a worker process that runs them from the durable job queue.
+
+run_job() runs one start, modify, approve or research job of a session and
+returns the session's new state with the event announcing it. api_server.py
+calls it on its own worker threads by default. With RESEARCH_QUEUE_PATH set,
+the API only records jobs in that SQLite queue (see jobs.SqliteJobQueue), and
+worker processes started with
+
+    RESEARCH_QUEUE_PATH=research_jobs.db python research_worker.py --jobs 4
+
+claim and run them, so graph work no longer competes with request handling
+for the API process's GIL, a crashing worker does not take the web tier down,
+and workers scale across cores on their own. Status updates, report tokens
+and job results are written to the queue's event log, which the API relays
+to each session's Socket.IO room.
+
+The API and its workers must share CHECKPOINT_PATH: a session's jobs may run
+in different workers, each resuming the graph from the last checkpoint.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import SqliteJobQueue
+from research_assistant import (current_session, fake_providers, finish_thread, get_graph, get_graph_no_interrupt,
+                                resume_config, set_status_callback, status_console, thread_config, tracer)
+from status_bus import StatusBus
+
+
+def analysts_data(analysts) -> list:
+    """Analysts in dict format for JSON responses and events"""
+    return [analyst if isinstance(analyst, dict) else {
+        'name': analyst.name,
+        'role': analyst.role,
+        'affiliation': analyst.affiliation,
+        'description': analyst.description
+    } for analyst in analysts or []]
+
+
+def analysts_ready(job, result: dict, event: str, message: str) -> dict:
+    analysts = analysts_data(result.get('analysts', []))
+    return {
+        'state': 'awaiting_approval',
+        'analysts': analysts,
+        'event': event,
+        'data': {'session_id': job.session_id, 'analysts': analysts, 'message': message},
+    }
+
+
+def report_ready(job, final_result: dict) -> dict:
+    final_report = final_result.get('final_report', 'No report generated')
+    tracer.end_session(job.session_id, interface="api", report_length=len(final_report))
+    finish_thread(job.session_id)
+    return {
+        'state': 'completed',
+        'final_report': final_report,
+        'event': 'research_completed',
+        'data': {'session_id': job.session_id, 'final_report': final_report,
+                 'message': 'Research completed successfully!'},
+    }
+
+
+def stream_report(graph, graph_input, config, job, emit) -> dict:
+    """Run a graph to its end, forwarding report tokens as they are written; returns the final state"""
+    final_result = {}
+    for mode, chunk in graph.stream(graph_input, config, stream_mode=["custom", "values"]):
+        if mode == "values":
+            final_result = chunk
+        elif chunk.get("type") == "report_delta":
+            emit(job.session_id, 'report_delta', {
+                'session_id': job.session_id,
+                'part': chunk['part'],
+                'delta': chunk['delta']
+            })
+    return final_result
+
+
+def initial_state(job) -> dict:
+    return {
+        'topic': job.payload['topic'],
+        'max_analysts': job.payload.get('max_analysts', 3),
+        'human_analyst_feedback': ''
+    }
+
+
+def run_start(job, emit) -> dict:
+    """Run the graph until human feedback is needed, checkpointed under the session id"""
+    with tracer.graph(job.session_id, "start", interface="api"):
+        result = get_graph().invoke(initial_state(job), thread_config(job.session_id, recursion_limit=10))
+    result = analysts_ready(job, result, 'analysts_created', 'Analyst team created, awaiting approval')
+    result['data']['topic'] = job.payload['topic']
+    return result
+
+
+def run_modify(job, emit) -> dict:
+    """Record the feedback at the paused human_feedback step and resume, which regenerates the analysts"""
+    config = thread_config(job.session_id, recursion_limit=10)
+    get_graph().update_state(config, {'human_analyst_feedback': job.payload['feedback']}, as_node='human_feedback')
+    with tracer.graph(job.session_id, "modify", interface="api"):
+        result = get_graph().invoke(None, config)
+    return analysts_ready(job, result, 'analysts_modified', 'Analyst team updated successfully!')
+
+
+def run_approve(job, emit) -> dict:
+    """Run the rest of the research process from the paused human_feedback step"""
+    config = thread_config(job.session_id)
+    # A run that stopped part way, or a job retried after its worker died, resumes from the last checkpoint
+    snapshot = get_graph().get_state(config)
+    resuming = snapshot.next != ('human_feedback',)
+    if resuming:
+        resume_config(config, snapshot)
+    else:
+        get_graph().update_state(config, {'human_analyst_feedback': 'approve'}, as_node='human_feedback')
+    with tracer.graph(job.session_id, "resume" if resuming else "approve", interface="api"):
+        final_result = stream_report(get_graph(), None, config, job, emit)
+    return report_ready(job, final_result)
+
+
+def run_research(job, emit) -> dict:
+    """Research a topic from start to report without stopping for approval"""
+    config = thread_config(job.session_id)
+    # A job retried after its worker died resumes from the last checkpoint
+    snapshot = get_graph_no_interrupt().get_state(config)
+    resuming = bool(snapshot.next)
+    if resuming:
+        resume_config(config, snapshot)
+    with tracer.graph(job.session_id, "resume" if resuming else "research", interface="api"):
+        final_result = stream_report(get_graph_no_interrupt(), None if resuming else initial_state(job), config,
+                                     job, emit)
+    return report_ready(job, final_result)
+
+
+JOB_RUNNERS = {'start': run_start, 'modify': run_modify, 'approve': run_approve, 'research': run_research}
+
+
+def run_job(job, emit) -> dict:
+    """Run a job; emit(session_id, event, data) forwards events sent while it runs (report tokens)"""
+    token = current_session.set(job.session_id)
+    try:
+        return JOB_RUNNERS[job.kind](job, emit)
+    except Exception as e:
+        print(f"Error in {job.kind} job of session {job.session_id}: {e}")
+        raise
+    finally:
+        current_session.reset(token)
+
+
+class ResearchWorker:
+    """Claims jobs from a SqliteJobQueue and runs up to `jobs` of them at once"""
+
+    def __init__(self, queue: SqliteJobQueue, name: str, jobs: int = 4, lease: float = 60):
+        self.queue = queue
+        self.name = name
+        self.jobs = jobs
+        self.lease = lease
+        self._slots = threading.Semaphore(jobs)
+        self._running = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="research-job")
+        # Events are written to the queue in batches from one thread, never from a graph node
+        self.outbox = StatusBus(queue.publish_events, max_queue=sys.maxsize, coalesce=())
+
+    def emit(self, session_id: str, event: str, data: dict):
+        self.outbox.publish(session_id, {'event': event, 'data': data})
+
+    def send_status(self, message: str, status: dict):
+        # The API assigns sequence numbers; the send time lets clients measure lag across both processes
+        self.emit(status.get('session_id', ''), 'status', {**status, 'ts': time.time()})
+
+    def handle(self, job):
+        result, error = None, None
+        try:
+            result = run_job(job, self.emit)
+        except Exception as e:
+            error = str(e)
+        finally:
+            # The job's result follows every event it sent
+            self.outbox.flush()
+            if not self.queue.finish(job, result, error):
+                print(f"⚠️ {self.name} lost the lease on {job.kind} job {job.id}; its result is dropped "
+                      f"in favour of the worker that took it over")
+            with self._lock:
+                self._running.pop(job.id, None)
+            self._slots.release()
+
+    def run_once(self) -> bool:
+        """Start the next waiting job if a slot is free; False if there was nothing to do"""
+        if not self._slots.acquire(blocking=False):
+            return False
+        job = self.queue.claim(self.name, self.lease)
+        if job is None:
+            self._slots.release()
+            return False
+        status_console.publish('console', {'message': f"📥 {self.name} running {job.kind} job {job.id} "
+                                                      f"of session {job.session_id} (attempt {job.attempts})"})
+        with self._lock:
+            self._running[job.id] = job
+        self._pool.submit(self.handle, job)
+        return True
+
+    def keep_leases(self):
+        """Renew the leases of running jobs, so other workers only take over jobs of a dead worker"""
+        while True:
+            time.sleep(self.lease / 3)
+            try:
+                with self._lock:
+                    running = list(self._running.values())
+                for job in running:
+                    if not self.queue.renew(job, self.lease):
+                        print(f"⚠️ {self.name} lost the lease on {job.kind} job {job.id} to another worker")
+                self.queue.prune()
+            except Exception as e:
+                print(f"Error renewing job leases: {e}")
+
+    def run(self, poll: float = 0.5):
+        set_status_callback(self.send_status)
+        threading.Thread(target=self.keep_leases, name="job-leases", daemon=True).start()
+        while True:
+            if not self.run_once():
+                time.sleep(poll)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued research jobs for api_server.py")
+    parser.add_argument('--queue', default=os.getenv('RESEARCH_QUEUE_PATH', ''),
+                        help="SQLite job queue shared with api_server.py (RESEARCH_QUEUE_PATH)")
+    parser.add_argument('--jobs', type=int, default=int(os.getenv('RESEARCH_WORKERS', '4')),
+                        help="jobs this process runs at once")
+    parser.add_argument('--poll', type=float, default=0.5, help="seconds between checks of an empty queue")
+    parser.add_argument('--lease', type=float, default=60,
+                        help="seconds without renewal after which another worker takes over a job")
+    parser.add_argument('--name', default=f"{socket.gethostname()}-{os.getpid()}")
+    args = parser.parse_args()
+
+    if not args.queue:
+        print("❌ Set RESEARCH_QUEUE_PATH (or --queue) to the job queue api_server.py writes to")
+        sys.exit(1)
+    if os.getenv('CHECKPOINT_PATH') == '':
+        print("⚠️ CHECKPOINT_PATH is empty: checkpoints stay in this process, so jobs of one session must not "
+              "be split across workers")
+
+    print("🔬 Research Worker")
+    print("=" * 40)
+    print(f"Worker {args.name} running up to {args.jobs} jobs from {args.queue}")
+    if fake_providers():
+        print("🧪 FAKE_PROVIDERS is set: Gemini, Tavily and Wikipedia are replaced by offline fakes (see src/fakes.py)")
+    print("=" * 40)
+
+    worker = ResearchWorker(SqliteJobQueue(args.queue), args.name, args.jobs, args.lease)
+    try:
+        worker.run(args.poll)
+    except KeyboardInterrupt:
+        print("👋 Worker stopped; jobs it was running are retried by another worker once their leases run out")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,776 @@
+"""
+Process-wide limits and time bounds on calls to the LLM and search providers.
+
+Every node that calls out to Gemini, Tavily or Wikipedia first takes a permit
+from that provider's ProviderLimiter. A permit waits for:
+
+1. the provider's token buckets: requests per second and, for the LLM,
+   tokens per minute (the prompt estimate is charged up front and corrected
+   from usage metadata once the reply arrives), then
+2. a free in-flight slot, handed out first come, first served.
+
+Limiters are shared by every session and by both the sync (thread pool) and
+async (event loop) graphs, so a fan-out of analysts across many sessions
+queues here instead of turning into a burst of 429s and retries.
+
+CallPolicy bounds how long one LLM call may take: a timeout per graph node,
+capped by the deadline of the run it belongs to, and optional hedging (a
+duplicate request once a call is slower than that node's p95 latency, keeping
+whichever reply arrives first). Both count from when the call holds its
+provider permit, so calls do not time out while they are still queued.
+
+CircuitBreaker guards a retrieval source shared by every session: once too
+many recent calls failed or were slow, calls fail fast with CircuitOpen until
+a half-open probe succeeds.
+
+QuorumJoin bounds a fan-out: parallel branches wait for each other only until
+a quorum of them has finished (plus a grace period) or a deadline passes.
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second.
+
+    reserve() always succeeds and returns how long the caller must wait before
+    using what it reserved, so the same bucket serves threads and coroutines. """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # The balance may go negative: later callers wait until it is paid back
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) tokens after the fact"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class SlotQueue:
+    """FIFO counting semaphore that threads and coroutines can wait on together"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._available = slots
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def in_use(self) -> int:
+        return self.slots - self._available
+
+    def acquire(self):
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            event = threading.Event()
+            self._waiters.append((None, event))
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            future = loop.create_future()
+            entry = (loop, future)
+            self._waiters.append(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(entry)
+                    granted = False
+                except ValueError:
+                    granted = True
+            # A slot handed over just before the cancellation goes back to the queue
+            if granted and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._available += 1
+                return
+            loop, waiter = self._waiters.popleft()
+        # The slot passes straight to the next waiter
+        if loop is None:
+            waiter.set()
+        else:
+            loop.call_soon_threadsafe(self._grant, waiter)
+
+    def _grant(self, future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class AttemptAbandoned(Exception):
+    """The call an attempt belonged to gave up before the attempt reached the provider"""
+
+
+class _Attempt:
+    """One try of a CallPolicy call. Its clock runs only while it holds a worker thread and a provider permit,
+    and once its call has given up it is dropped instead of going upstream. """
+
+    def __init__(self):
+        self.started_at = None
+        self.abandoned = False
+
+    def begin(self):
+        if self.abandoned:
+            raise AttemptAbandoned("call gave up before this attempt went out")
+        self.started_at = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at if self.started_at is not None else 0.0
+
+    def run(self, fn):
+        _current_attempt.set(self)
+        self.begin()
+        return fn()
+
+    async def arun(self, afn):
+        _current_attempt.set(self)
+        self.begin()
+        return await afn()
+
+
+# The attempt a provider call is made for, so limiters can pause its clock while it queues
+_current_attempt = contextvars.ContextVar("current_attempt", default=None)
+
+
+class Permit:
+    """Handle for one limited call, used to report actual token usage"""
+
+    def __init__(self, limiter: "ProviderLimiter", tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+
+    def record_usage(self, total_tokens: Optional[int]):
+        """Correct the up-front token estimate with the provider's count"""
+        if total_tokens is not None and self.limiter.tpm_bucket is not None:
+            self.limiter.tpm_bucket.adjust(total_tokens - self.tokens)
+            self.tokens = total_tokens
+
+
+class ProviderLimiter:
+    """In-flight cap plus request and token rate limits for one provider"""
+
+    def __init__(self, name: str, max_in_flight: int = 0, rps: float = 0, tpm: float = 0,
+                 burst_seconds: float = 1.0, history: int = 1000):
+        self.name = name
+        self.slots = SlotQueue(max_in_flight) if max_in_flight > 0 else None
+        self.rps_bucket = TokenBucket(rps, max(1.0, rps * burst_seconds)) if rps > 0 else None
+        self.tpm_bucket = TokenBucket(tpm / 60, max(1.0, tpm / 60 * burst_seconds)) if tpm > 0 else None
+
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=history)
+        self._stats = {"calls": 0, "errors": 0, "queued": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+        self._in_flight = 0
+
+    # Waiting
+
+    def _rate_delay(self, tokens: int) -> float:
+        delay = self.rps_bucket.reserve(1) if self.rps_bucket else 0.0
+        if self.tpm_bucket and tokens:
+            delay = max(delay, self.tpm_bucket.reserve(tokens))
+        return delay
+
+    def _record_wait(self, seconds: float):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._in_flight += 1
+            if seconds > 0.001:
+                self._stats["queued"] += 1
+            self._stats["wait_seconds_total"] += seconds
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], seconds)
+            self._waits.append(seconds)
+
+    def _queue(self):
+        """Stop the calling attempt's clock while it waits for a permit"""
+        attempt = _current_attempt.get()
+        if attempt is not None:
+            attempt.started_at = None
+        return attempt
+
+    def _admit(self, attempt):
+        """Restart the attempt's clock now that it holds a slot, or hand the slot back if its call gave up"""
+        if attempt is None:
+            return
+        try:
+            attempt.begin()
+        except AttemptAbandoned:
+            if self.slots:
+                self.slots.release()
+            raise
+
+    def _done(self, failed: bool):
+        with self._lock:
+            self._in_flight -= 1
+            if failed:
+                self._stats["errors"] += 1
+        if self.slots:
+            self.slots.release()
+
+    @contextmanager
+    def limit(self, tokens: int = 0):
+        """Block until the call may go out; usage: `with limiter.limit(tokens) as permit:`"""
+        attempt = self._queue()
+        started = time.monotonic()
+        delay = self._rate_delay(tokens)
+        if delay:
+            time.sleep(delay)
+        if self.slots:
+            self.slots.acquire()
+        self._admit(attempt)
+        self._record_wait(time.monotonic() - started)
+
+        failed = False
+        try:
+            yield Permit(self, tokens)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._done(failed)
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int = 0):
+        """Async counterpart of limit"""
+        attempt = self._queue()
+        started = time.monotonic()
+        delay = self._rate_delay(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.slots:
+            await self.slots.aacquire()
+        self._admit(attempt)
+        self._record_wait(time.monotonic() - started)
+
+        failed = False
+        try:
+            yield Permit(self, tokens)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._done(failed)
+
+    # Metrics
+
+    def stats(self) -> dict:
+        """Queue-wait and throughput counters for export"""
+        with self._lock:
+            stats = dict(self._stats)
+            waits = sorted(self._waits)
+            stats["in_flight"] = self._in_flight
+        stats["max_in_flight"] = self.slots.slots if self.slots else None
+        stats["waiting"] = self.slots.waiting if self.slots else 0
+        stats["wait_seconds_total"] = round(stats["wait_seconds_total"], 3)
+        stats["wait_seconds_max"] = round(stats["wait_seconds_max"], 3)
+        if waits:
+            stats["wait_seconds_p50"] = round(waits[len(waits) // 2], 3)
+            stats["wait_seconds_p95"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3)
+        return stats
+
+
+# Defaults per provider: (max in flight, requests per second, tokens per minute).
+# A rate of 0 means unlimited; set the provider's quota in the environment.
+PROVIDER_DEFAULTS = {
+    "gemini": (8, 0, 0),
+    "tavily": (4, 0, 0),
+    "wikipedia": (4, 0, 0),
+}
+
+
+def limiter_from_env(provider: str) -> ProviderLimiter:
+    """Limiter configured from <PROVIDER>_MAX_IN_FLIGHT, <PROVIDER>_RPS and <PROVIDER>_TPM"""
+    max_in_flight, rps, tpm = PROVIDER_DEFAULTS.get(provider, (0, 0, 0))
+    prefix = provider.upper()
+    return ProviderLimiter(
+        provider,
+        max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", max_in_flight)),
+        rps=float(os.getenv(f"{prefix}_RPS", rps)),
+        tpm=float(os.getenv(f"{prefix}_TPM", tpm)),
+        burst_seconds=float(os.getenv(f"{prefix}_BURST_SECONDS", "1")),
+    )
+
+
+def provider_limiters_from_env() -> dict:
+    """One limiter per known provider, keyed by provider name"""
+    return {provider: limiter_from_env(provider) for provider in PROVIDER_DEFAULTS}
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call ran past its node timeout or its run's deadline"""
+
+
+class CallPolicy:
+    """Per-node timeouts, run deadlines and optional hedging for LLM calls.
+
+    call() runs the attempt on a worker thread so a stuck request cannot hold
+    the node past its timeout; the abandoned request finishes in the
+    background and its reply is dropped. acall() cancels the losing task.
+
+    The node timeout and hedge delay count from when an attempt holds its
+    provider permit, not while it queues for one (the run deadline still
+    applies throughout). Attempts still queued when their call gives up are
+    dropped before they reach the provider. """
+
+    # How often a call whose first attempt is still queued checks whether it has started
+    queued_poll = 0.05
+
+    def __init__(self, default_timeout: float = 90.0, node_timeouts: dict = None, hedging: bool = False,
+                 hedge_min_samples: int = 20, hedge_min_delay: float = 2.0, history: int = 200,
+                 max_workers: int = 32):
+        self.default_timeout = default_timeout
+        self.node_timeouts = dict(node_timeouts or {})
+        self.hedging = hedging
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.history = history
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._latencies = {}
+        self._stats = {}
+
+    # Bookkeeping
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-call")
+            return self._pool
+
+    def _count(self, node: str, stat: str):
+        with self._lock:
+            stats = self._stats.setdefault(node, {"calls": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0})
+            stats[stat] += 1
+
+    def _record(self, node: str, seconds: float, hedge_won: bool):
+        self._count(node, "calls")
+        if hedge_won:
+            self._count(node, "hedge_wins")
+        with self._lock:
+            self._latencies.setdefault(node, deque(maxlen=self.history)).append(seconds)
+
+    def timeout_for(self, node: str, deadline: Optional[float] = None) -> float:
+        """Seconds the call may take: the node's timeout, capped by the run deadline (epoch seconds)"""
+        timeout = self.node_timeouts.get(node, self.default_timeout)
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self._count(node, "timeouts")
+                raise DeadlineExceeded(f"run budget exhausted before {node or 'LLM'} call")
+            timeout = min(timeout, remaining)
+        return timeout
+
+    def hedge_delay(self, node: str) -> Optional[float]:
+        """Observed p95 latency of the node, once there are enough samples to trust it"""
+        if not self.hedging:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(node, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, samples[int(len(samples) * 0.95) - 1])
+
+    def _timed_out(self, node: str, timeout: float):
+        self._count(node, "timeouts")
+        return DeadlineExceeded(f"{node or 'LLM'} call took longer than {timeout:.1f}s")
+
+    def _next_step(self, node: str, first: _Attempt, cutoff: Optional[float], delay: Optional[float]):
+        """(when the call times out, when to hedge it, when to wake up next), all monotonic, the first two optional"""
+        now = time.monotonic()
+        expires, hedge_at = cutoff, None
+        if first.started_at is not None:
+            own = first.started_at + self.node_timeouts.get(node, self.default_timeout)
+            expires = own if expires is None else min(expires, own)
+            if delay is not None:
+                hedge_at = first.started_at + delay
+        wake = [when for when in (expires, hedge_at) if when is not None]
+        if first.started_at is None:
+            wake.append(now + self.queued_poll)
+        return expires, hedge_at, max(min(wake) - now, 0)
+
+    # Calls
+
+    def call(self, node: str, fn, deadline: Optional[float] = None, hedge: bool = True):
+        """Run fn() within the node's time bounds, hedging it if it is slower than usual"""
+        timeout = self.timeout_for(node, deadline)
+        cutoff = None if deadline is None else time.monotonic() + (deadline - time.time())
+        delay = self.hedge_delay(node) if hedge else None
+        pool = self._executor()
+
+        first = _Attempt()
+        first_future = pool.submit(contextvars.copy_context().run, first.run, fn)
+        attempts = {first_future: first}
+        pending, error = {first_future}, None
+        try:
+            while pending:
+                expires, hedge_at, wait_for = self._next_step(node, first, cutoff, delay)
+                if expires is not None and time.monotonic() >= expires:
+                    break
+                may_hedge = hedge_at is not None and pending == {first_future} and error is None
+                done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future.exception() is None:
+                        self._record(node, attempts[future].elapsed(), future is not first_future)
+                        return future.result()
+                    error = future.exception()
+                if error is not None and not pending:
+                    raise error
+                if may_hedge and not done and time.monotonic() >= hedge_at:
+                    self._count(node, "hedges")
+                    attempt = _Attempt()
+                    future = pool.submit(contextvars.copy_context().run, attempt.run, fn)
+                    attempts[future] = attempt
+                    pending.add(future)
+            raise self._timed_out(node, timeout)
+        finally:
+            # Queued attempts never start; ones waiting for a permit give it back unused
+            for future in pending:
+                attempts[future].abandoned = True
+                future.cancel()
+
+    async def acall(self, node: str, afn, deadline: Optional[float] = None, hedge: bool = True):
+        """Async counterpart of call; afn is a coroutine function"""
+        timeout = self.timeout_for(node, deadline)
+        cutoff = None if deadline is None else time.monotonic() + (deadline - time.time())
+        delay = self.hedge_delay(node) if hedge else None
+
+        first = _Attempt()
+        first_task = asyncio.ensure_future(first.arun(afn))
+        attempts = {first_task: first}
+        pending, error = {first_task}, None
+        try:
+            while pending:
+                expires, hedge_at, wait_for = self._next_step(node, first, cutoff, delay)
+                if expires is not None and time.monotonic() >= expires:
+                    break
+                may_hedge = hedge_at is not None and pending == {first_task} and error is None
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        self._record(node, attempts[task].elapsed(), task is not first_task)
+                        return task.result()
+                    error = task.exception()
+                if error is not None and not pending:
+                    raise error
+                if may_hedge and not done and time.monotonic() >= hedge_at:
+                    self._count(node, "hedges")
+                    attempt = _Attempt()
+                    task = asyncio.ensure_future(attempt.arun(afn))
+                    attempts[task] = attempt
+                    pending.add(task)
+            raise self._timed_out(node, timeout)
+        finally:
+            for task in pending:
+                attempts[task].abandoned = True
+                task.cancel()
+
+    def stats(self) -> dict:
+        """Per-node call, timeout and hedge counters with latency percentiles"""
+        with self._lock:
+            stats = {node: dict(counters) for node, counters in self._stats.items()}
+            latencies = {node: sorted(samples) for node, samples in self._latencies.items()}
+        for node, samples in latencies.items():
+            if samples:
+                stats[node]["latency_p50"] = round(samples[len(samples) // 2], 3)
+                stats[node]["latency_p95"] = round(samples[max(int(len(samples) * 0.95) - 1, 0)], 3)
+        return stats
+
+
+# Timeout in seconds for one LLM call made by each graph node
+NODE_TIMEOUTS = {
+    "create_analysts": 60,
+    "ask_question": 45,
+    "search_query": 30,
+    "answer_question": 60,
+    "write_section": 90,
+    "condense_sections": 120,
+    "write_report": 180,
+    "write_introduction": 60,
+    "write_conclusion": 60,
+}
+
+
+def call_policy_from_env() -> CallPolicy:
+    """Call policy configured from LLM_TIMEOUT, LLM_TIMEOUT_<NODE> and LLM_HEDGE_* variables"""
+    node_timeouts = {
+        node: float(os.getenv(f"LLM_TIMEOUT_{node.upper()}", seconds))
+        for node, seconds in NODE_TIMEOUTS.items()
+    }
+    return CallPolicy(
+        default_timeout=float(os.getenv("LLM_TIMEOUT", "90")),
+        node_timeouts=node_timeouts,
+        hedging=os.getenv("LLM_HEDGING", "0").lower() in ("1", "true", "yes", "on"),
+        hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "2")),
+    )
+
+
+class BranchCancelled(Exception):
+    """A branch kept running after its join stopped waiting for it"""
+
+
+class QuorumJoin:
+    """Join point for parallel branches that does not wait for stragglers.
+
+    A branch may keep running until `quorum` (a fraction of `total`) of the
+    branches have finished plus `grace` seconds, or until `timeout` seconds
+    after it started, whichever comes first. Threads wait with wait_for() and
+    coroutines with await_for(). Branches that only start once a worker is
+    free pass wait_for() their start time, so time spent queued does not
+    count against them. """
+
+    def __init__(self, total: int, quorum: float = 1.0, grace: float = 30.0, timeout: float = 300.0):
+        self.total = total
+        self.needed = min(max(math.ceil(total * quorum), 1), total)
+        self.grace = grace
+        self.timeout = timeout
+        self.finished = 0
+        self.settled = 0
+        self._started = time.monotonic()
+        self._quorum_at = None
+        self._cond = threading.Condition()
+        self._events = []
+
+    def remaining(self, started_at: float = None) -> float:
+        """Seconds a branch that has not finished may still run (started when the join was, by default)"""
+        started_at = self._started if started_at is None else started_at
+        limit = started_at + self.timeout
+        if self._quorum_at is not None:
+            limit = min(limit, max(self._quorum_at, started_at) + self.grace)
+        return limit - time.monotonic()
+
+    def _wake(self):
+        self._cond.notify_all()
+        for loop, event in self._events:
+            loop.call_soon_threadsafe(event.set)
+
+    def finish(self):
+        """Count a branch that completed, with a result or an error"""
+        with self._cond:
+            self.finished += 1
+            if self.finished >= self.needed and self._quorum_at is None:
+                self._quorum_at = time.monotonic()
+            self._wake()
+
+    def settle(self) -> bool:
+        """Count a branch that is done (finished or given up), True once every branch is"""
+        with self._cond:
+            self.settled += 1
+            return self.settled >= self.total
+
+    def notify(self):
+        with self._cond:
+            self._wake()
+
+    def wait_for(self, is_done, started_at=None) -> bool:
+        """Block until is_done() is true (False if the branch ran out of time first).
+
+        started_at() is the branch's monotonic start time, None while it is
+        still queued; without it the branch started with the join. Call
+        notify() when the awaited branch starts and when it completes. """
+        with self._cond:
+            while not is_done():
+                began = self._started if started_at is None else started_at()
+                if began is None:
+                    self._cond.wait()
+                    continue
+                remaining = self.remaining(began)
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    async def await_for(self, task) -> bool:
+        """Wait for an asyncio task to finish, False if it ran out of time first"""
+        event = asyncio.Event()
+        entry = (asyncio.get_running_loop(), event)
+        with self._cond:
+            self._events.append(entry)
+        try:
+            while not task.done():
+                remaining = self.remaining()
+                if remaining <= 0:
+                    return False
+                event.clear()
+                woken = asyncio.ensure_future(event.wait())
+                await asyncio.wait({task, woken}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                woken.cancel()
+            return True
+        finally:
+            with self._cond:
+                self._events.remove(entry)
+
+
+def join_from_env(total: int) -> QuorumJoin:
+    """Interview join configured from INTERVIEW_QUORUM, INTERVIEW_GRACE_SECONDS and INTERVIEW_TIMEOUT_SECONDS"""
+    return QuorumJoin(
+        total,
+        quorum=float(os.getenv("INTERVIEW_QUORUM", "0.75")),
+        grace=float(os.getenv("INTERVIEW_GRACE_SECONDS", "30")),
+        timeout=float(os.getenv("INTERVIEW_TIMEOUT_SECONDS", "300")),
+    )
+
+
+class CircuitOpen(Exception):
+    """A call was short-circuited because its source's breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a window of recent call outcomes.
+
+    The breaker opens when at least `min_calls` of the last `window` calls
+    ended and either `error_rate` of them failed or `slow_rate` of them took
+    longer than `slow_seconds`. While open, check() raises CircuitOpen without
+    any I/O. After `cooldown` seconds one probe at a time is let through: a
+    good probe closes the breaker, a bad one opens it again. """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_seconds: float = 10.0, slow_rate: float = 0.5, cooldown: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._stats = {"calls": 0, "errors": 0, "slow": 0, "short_circuits": 0, "trips": 0, "probes": 0}
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _trip(self):
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._stats["trips"] += 1
+
+    def _short_circuit(self):
+        self._stats["short_circuits"] += 1
+        raise CircuitOpen(f"{self.name} circuit is open")
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go out now"""
+        with self._lock:
+            if self._state == "closed":
+                return
+            now = time.monotonic()
+            if self._state == "open":
+                if now - self._opened_at < self.cooldown:
+                    self._short_circuit()
+                self._state, self._probe_at = "half_open", None
+            # A probe that never reported back (cancelled) is replaced after a cooldown
+            if self._probe_at is not None and now - self._probe_at < self.cooldown:
+                self._short_circuit()
+            self._probe_at = now
+            self._stats["probes"] += 1
+
+    def record(self, seconds: float, error: bool = False):
+        """Count the outcome of a call that check() let through"""
+        slow = seconds > self.slow_seconds
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["errors"] += error
+            self._stats["slow"] += slow
+            if self._state == "half_open":
+                if error or slow:
+                    self._trip()
+                else:
+                    self._state = "closed"
+                    self._outcomes.clear()
+                return
+            if self._state == "open":
+                return
+
+            self._outcomes.append((error, slow))
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and (
+                    sum(e for e, _ in self._outcomes) >= self.error_rate * calls
+                    or sum(s for _, s in self._outcomes) >= self.slow_rate * calls):
+                self._trip()
+
+    @contextmanager
+    def track(self):
+        """Time the enclosed call and record whether it raised; works around `await` too"""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(time.monotonic() - started, error=True)
+            raise
+        self.record(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self._state, **self._stats}
+
+
+# Calls slower than this (seconds) count against a retrieval source's breaker
+BREAKER_SLOW_SECONDS = {"web": 10, "wikipedia": 15}
+
+
+def breakers_from_env() -> dict:
+    """One breaker per retrieval source, configured from BREAKER_* variables"""
+    return {
+        source: CircuitBreaker(
+            source,
+            window=int(os.getenv("BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+            error_rate=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+            slow_seconds=float(os.getenv(f"BREAKER_{source.upper()}_SLOW_SECONDS", slow_seconds)),
+            slow_rate=float(os.getenv("BREAKER_SLOW_RATE", "0.5")),
+            cooldown=float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30")),
+        )
+        for source, slow_seconds in BREAKER_SLOW_SECONDS.items()
+    }
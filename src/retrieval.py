@@ -0,0 +1,197 @@
+"""
+Retrieval race for the interview's search step.
+
+Each turn queries every source (Tavily and Wikipedia) at once. The expert's
+answer is written as soon as the first source returns plus a short grace
+window, instead of waiting for the slowest source. A source that misses the
+window keeps running in the background; its result lands in the search cache
+and is folded into the next turn's context, or dropped if the interview has
+ended (see research_assistant.retrieve).
+
+RetrievalStats keeps a latency histogram per source, plus how often each
+source returned first, within the grace window, or late.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Bucketed latency counts (cumulative, Prometheus style) with recent-sample percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, history: int = 1000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            self._samples.append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.total
+            samples = sorted(self._samples)
+
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip([*map(str, self.buckets), "+Inf"], counts):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        stats = {"count": count, "sum_seconds": round(total, 3), "buckets": buckets}
+        if samples:
+            stats["p50"] = round(samples[len(samples) // 2], 3)
+            stats["p95"] = round(samples[max(int(len(samples) * 0.95) - 1, 0)], 3)
+        return stats
+
+
+class RetrievalStats:
+    """Per-source latency histograms and race outcomes"""
+
+    OUTCOMES = ("first", "in_time", "late", "errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}
+
+    def _source(self, source: str) -> dict:
+        with self._lock:
+            if source not in self._sources:
+                self._sources[source] = {"latency": LatencyHistogram(), **{outcome: 0 for outcome in self.OUTCOMES}}
+            return self._sources[source]
+
+    def observe(self, source: str, seconds: float):
+        self._source(source)["latency"].observe(seconds)
+
+    def count(self, source: str, outcome: str):
+        counters = self._source(source)
+        with self._lock:
+            counters[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            sources = dict(self._sources)
+        return {source: {**{outcome: counters[outcome] for outcome in self.OUTCOMES},
+                         "latency": counters["latency"].stats()}
+                for source, counters in sources.items()}
+
+
+class SourceRace:
+    """Run fetchers side by side and stop waiting `grace` seconds after the first result.
+
+    run() and arun() return (results, late): the results keyed by source and
+    the sources still running when the window closed. A failed source is
+    skipped; the race only raises if every source failed. """
+
+    def __init__(self, grace: float = 2.0, max_workers: int = 16):
+        self.grace = grace
+        self.max_workers = max_workers
+        self.stats = RetrievalStats()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._background = set()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="retrieval")
+            return self._pool
+
+    def _timed(self, source: str, fn: Callable[[], str]) -> str:
+        started = time.monotonic()
+        try:
+            return fn()
+        except Exception:
+            self.stats.count(source, "errors")
+            raise
+        finally:
+            self.stats.observe(source, time.monotonic() - started)
+
+    async def _atimed(self, source: str, afn) -> str:
+        started = time.monotonic()
+        try:
+            return await afn()
+        except Exception:
+            self.stats.count(source, "errors")
+            raise
+        finally:
+            self.stats.observe(source, time.monotonic() - started)
+
+    def _collect(self, done, sources, results, errors, closes_at):
+        """Record finished fetches; returns when the grace window closes"""
+        for future in done:
+            source = sources[future]
+            if future.exception() is not None:
+                errors.append(future.exception())
+                continue
+            results[source] = future.result()
+            self.stats.count(source, "first" if closes_at is None else "in_time")
+            if closes_at is None:
+                closes_at = time.monotonic() + self.grace
+        return closes_at
+
+    def _finish(self, pending, sources, results, errors):
+        late = sorted(sources[future] for future in pending)
+        for source in late:
+            self.stats.count(source, "late")
+        if not results and errors:
+            raise errors[0]
+        return results, late
+
+    def run(self, fetchers: Dict[str, Callable[[], str]]):
+        pool = self._executor()
+        # Each fetch runs in a copy of this context so the run's config and callbacks follow it
+        sources = {pool.submit(contextvars.copy_context().run, self._timed, source, fn): source
+                   for source, fn in fetchers.items()}
+        pending, results, errors, closes_at = set(sources), {}, [], None
+        while pending:
+            timeout = None if closes_at is None else max(closes_at - time.monotonic(), 0)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            closes_at = self._collect(done, sources, results, errors, closes_at)
+        return self._finish(pending, sources, results, errors)
+
+    async def arun(self, afetchers: Dict[str, Callable]):
+        sources = {asyncio.ensure_future(self._atimed(source, afn)): source for source, afn in afetchers.items()}
+        pending, results, errors, closes_at = set(sources), {}, [], None
+        while pending:
+            timeout = None if closes_at is None else max(closes_at - time.monotonic(), 0)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            closes_at = self._collect(done, sources, results, errors, closes_at)
+
+        # Late fetches finish in the background so their results still reach the search cache
+        for task in pending:
+            self._background.add(task)
+            task.add_done_callback(self._forget)
+        return self._finish(pending, sources, results, errors)
+
+    def _forget(self, task):
+        self._background.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+
+def source_race_from_env() -> SourceRace:
+    """Retrieval race configured from RETRIEVAL_GRACE_SECONDS (a large value waits for every source)"""
+    return SourceRace(
+        grace=float(os.getenv("RETRIEVAL_GRACE_SECONDS", "2")),
+        max_workers=int(os.getenv("RETRIEVAL_MAX_WORKERS", "16")),
+    )
@@ -3,12 +3,9 @@ from pydantic import BaseModel, Field
 from typing import Annotated, List
 from typing_extensions import TypedDict
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from langgraph.graph import MessagesState
 
-from langgraph.constants import Send
-from langgraph.graph import END, MessagesState, START, StateGraph
+from context_store import merge_context
 
 
 class Analyst(BaseModel):
@@ -41,7 +38,11 @@ class GenerateAnalystsState(TypedDict):
 
 class InterviewState(MessagesState):
     max_num_turns: int # Number turns of conversation
-    context: Annotated[list, operator.add] # Source docs
+    context: Annotated[list, merge_context] # Source docs, one entry per unique document
+    seen_context: Annotated[list, operator.add] # Keys of passages (or documents) already shown to the expert
+    search_query: str # Query shared by every retriever this turn
+    search_queries: dict # Optional source-specific phrasing, keyed by retriever
+    late_sources: list # Sources that missed last turn's grace window, with their queries
     analyst: Analyst # Analyst asking questions
     interview: str # Interview transcript
     sections: list # Final key we duplicate in outer state for Send() API
@@ -49,13 +50,25 @@ class InterviewState(MessagesState):
 class SearchQuery(BaseModel):
     search_query: str = Field(None, description="Search query for retrieval.")
 
+class SourceSearchQueries(BaseModel):
+    web_query: str = Field(None, description="Well-structured query for a web search engine.")
+    wikipedia_query: str = Field(None, description="Short encyclopedia topic (an entity or concept title) to look up on Wikipedia.")
+
+def merge_dicts(left: dict, right: dict) -> dict:
+    """ Reducer for keys written by parallel branches """
+    return {**(left or {}), **(right or {})}
+
 class ResearchGraphState(TypedDict):
     topic: str # Research topic
     max_analysts: int # Number of analysts
+    max_num_turns: int # Question and answer turns per interview (2 when unset)
     human_analyst_feedback: str # Human feedback
     analysts: List[Analyst] # Analyst asking questions
     sections: Annotated[list, operator.add] # Send() API key
+    skipped_analysts: Annotated[list, operator.add] # Analysts whose interviews missed the join, with the reason
+    memos: list # Sections merged down to one prompt's worth, empty when they already fit
     introduction: str # Introduction for the final report
     content: str # Content for the final report
     conclusion: str # Conclusion for the final report
     final_report: str # Final report
+    stage_timings: Annotated[dict, merge_dicts] # Start time and duration of each report-writing stage
@@ -0,0 +1,146 @@
+"""
+Non-blocking delivery of status updates.
+
+Graph nodes send status updates from whichever thread runs them. Printing or
+emitting them over Socket.IO right there makes the node wait on stdout or on
+the socket. StatusBus takes that I/O off the node:
+
+- publish() appends to a bounded in-memory queue and returns at once. It never
+  waits: when the queue is full the update is dropped and counted.
+- One background emitter drains the queue every `interval` seconds, groups the
+  updates by key (a Socket.IO room, or the console), coalesces runs of the
+  same chatty step (ROUTE_MESSAGES, ...) from the same analyst down to the
+  latest one, and hands each group to the sink as one batch. Parallel
+  analysts share a room, so each keeps its own latest update.
+
+The queue is a collections.deque, whose append and popleft are atomic, so
+publishers take no lock.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+# Steps whose latest update supersedes the ones before it
+COALESCE_STEPS = ("ROUTE_MESSAGES", "RETRIEVE")
+
+
+def spawn_thread(target: Callable):
+    thread = threading.Thread(target=target, name="status-bus", daemon=True)
+    thread.start()
+    return thread
+
+
+class StatusBus:
+    """Bounded queue of (key, update) drained by one emitter into sink(key, updates)"""
+
+    def __init__(self, sink: Callable, max_queue: int = 10000, interval: float = 0.05, max_batch: int = 100,
+                 coalesce=COALESCE_STEPS, spawn: Callable = spawn_thread, sleep: Callable = time.sleep):
+        self.sink = sink
+        self.max_queue = max_queue
+        self.interval = interval
+        self.max_batch = max_batch
+        self.coalesce = frozenset(coalesce)
+        self._spawn = spawn
+        self._sleep = sleep
+        self._queue = deque()
+        self._started = False
+        self._busy = False
+        self._lock = threading.Lock()
+        self._counts = {"delivered": 0, "coalesced": 0, "batches": 0, "errors": 0, "dropped": 0}
+
+    def publish(self, key, update: dict) -> bool:
+        """Queue an update for delivery; False if the queue was full and it was dropped"""
+        if not self._started:
+            self.start()
+        if len(self._queue) >= self.max_queue:
+            with self._lock:
+                self._counts["dropped"] += 1
+            return False
+        self._queue.append((key, update))
+        return True
+
+    def start(self):
+        """Start the emitter; publish() does this on first use, but spawn may need the right thread"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._spawn(self._run)
+
+    def _run(self):
+        while True:
+            self._sleep(self.interval)
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"Error delivering status updates: {e}")
+
+    def coalesced(self, updates: list) -> list:
+        """Updates with each run of one coalesced step by one analyst reduced to its latest update"""
+        kept = []
+        for update in updates:
+            previous = kept[-1] if kept else None
+            if (previous is not None and update.get("step") in self.coalesce
+                    and (previous.get("step"), previous.get("analyst")) == (update.get("step"), update.get("analyst"))):
+                # The survivor lists the sequence numbers it stands for, so clients can tell coalesced from dropped
+                merged = [*previous.get("coalesced_seqs", []), *([previous["seq"]] if "seq" in previous else [])]
+                kept[-1] = {**update, "coalesced_seqs": merged} if merged else dict(update)
+                continue
+            kept.append(update)
+        return kept
+
+    def drain(self) -> int:
+        """Deliver everything queued so far; returns the number of updates taken off the queue"""
+        self._busy = True
+        try:
+            groups, taken = {}, 0
+            while self._queue:
+                key, update = self._queue.popleft()
+                groups.setdefault(key, []).append(update)
+                taken += 1
+            for key, queued in groups.items():
+                updates = self.coalesced(queued)
+                with self._lock:
+                    self._counts["coalesced"] += len(queued) - len(updates)
+                for start in range(0, len(updates), self.max_batch):
+                    batch = updates[start:start + self.max_batch]
+                    try:
+                        self.sink(key, batch)
+                        outcome = "delivered"
+                    except Exception as e:
+                        print(f"Error delivering status updates to {key}: {e}")
+                        outcome = "errors"
+                    with self._lock:
+                        self._counts[outcome] += len(batch)
+                        self._counts["batches"] += 1
+            return taken
+        finally:
+            self._busy = False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued update has been handed to the sink"""
+        deadline = time.monotonic() + timeout
+        while self._queue or self._busy:
+            if time.monotonic() >= deadline:
+                return False
+            self._sleep(min(self.interval, 0.01))
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "queued": len(self._queue)}
+
+
+def status_bus_from_env(sink: Callable, **kwargs) -> StatusBus:
+    """StatusBus configured from STATUS_QUEUE_SIZE, STATUS_FLUSH_SECONDS and STATUS_COALESCE_STEPS"""
+    steps = os.getenv("STATUS_COALESCE_STEPS", ",".join(COALESCE_STEPS))
+    kwargs.setdefault("coalesce", [step.strip() for step in steps.split(",") if step.strip()])
+    return StatusBus(
+        sink,
+        max_queue=int(os.getenv("STATUS_QUEUE_SIZE", "10000")),
+        interval=float(os.getenv("STATUS_FLUSH_SECONDS", "0.05")),
+        **kwargs,
+    )
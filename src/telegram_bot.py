@@ -1,11 +1,13 @@
 import os
+import time
+import uuid
 import asyncio
 import logging
 from typing import Dict, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 from dotenv import load_dotenv
-from research_assistant import graph, graph_no_interrupt
+from research_assistant import get_graph, REPORT_PARTS, thread_config, tracer
 from schema import ResearchGraphState
 
 # Load environment variables
@@ -21,6 +23,10 @@ logger = logging.getLogger(__name__)
 # Store user sessions
 user_sessions: Dict[int, Dict[str, Any]] = {}
 
+# Telegram rate-limits message edits, so streamed report tokens are batched into one edit per interval
+STREAM_EDIT_INTERVAL = float(os.getenv('TELEGRAM_STREAM_INTERVAL', '1.5'))
+DRAFT_PREVIEW_LENGTH = 3500
+
 class TelegramResearchBot:
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -119,7 +125,9 @@ Send me a topic to begin!
         user_sessions[user_id] = {
             'topic': topic,
             'state': 'creating_analysts',
-            'waiting_for_feedback': False
+            'waiting_for_feedback': False,
+            # Each research run is checkpointed under its own thread
+            'thread_id': f"telegram-{user_id}-{uuid.uuid4()}"
         }
 
         # Send initial message
@@ -138,9 +146,9 @@ Send me a topic to begin!
             }
 
             # Run the graph until human feedback is needed
-            result = await asyncio.to_thread(
-                lambda: graph.invoke(initial_state, {"recursion_limit": 10})
-            )
+            config = thread_config(user_sessions[user_id]['thread_id'], recursion_limit=10)
+            with tracer.graph(user_sessions[user_id]['thread_id'], "start", interface="telegram"):
+                result = await get_graph().ainvoke(initial_state, config)
 
             # Store the state and analysts
             user_sessions[user_id]['graph_state'] = result
@@ -213,28 +221,19 @@ Send me a topic to begin!
         )
 
         try:
-            # Use the approved analysts to run the full graph
+            # Record the approval at the paused human_feedback step and resume the checkpointed run
+            config = thread_config(session['thread_id'])
             analysts = session['graph_state']['analysts']
-            topic = session['graph_state']['topic']
             
-            logger.info(f"Running full research with approved analysts")
-            logger.info(f"Topic: {topic}")
+            logger.info(f"Resuming research with approved analysts")
+            logger.info(f"Topic: {session['graph_state']['topic']}")
             logger.info(f"Number of analysts: {len(analysts)}")
 
-            # Create state for the no-interrupt graph
-            research_state = {
-                'topic': topic,
-                'max_analysts': len(analysts),
-                'analysts': analysts,
-                'human_analyst_feedback': 'approve'
-            }
+            await get_graph().aupdate_state(config, {'human_analyst_feedback': 'approve'}, as_node='human_feedback')
 
-            # Run the complete research process
-            loop = asyncio.get_event_loop()
-            final_result = await loop.run_in_executor(
-                None,
-                lambda: graph_no_interrupt.invoke(research_state, {"recursion_limit": 100})
-            )
+            # Run the rest of the research process on the bot's event loop, showing the report as it is written
+            with tracer.graph(session['thread_id'], "approve", interface="telegram"):
+                final_result = await self.run_research_streaming(query, config)
             
             print(f"[DEBUG] Final result keys: {final_result.keys()}")
             print(f"[DEBUG] Sections available: {len(final_result.get('sections', []))}")
@@ -311,8 +310,54 @@ Send me a topic to begin!
         finally:
             # Clean up session
             if user_id in user_sessions:
+                tracer.end_session(user_sessions[user_id]['thread_id'], interface="telegram")
                 del user_sessions[user_id]
 
+    async def run_research_streaming(self, query, config) -> dict:
+        """Resume the paused graph, editing a progress message with the report draft as tokens arrive."""
+        draft = {part: "" for part in REPORT_PARTS}
+        progress = None
+        last_edit = 0.0
+        final_result = {}
+
+        async for mode, chunk in get_graph().astream(None, config, stream_mode=["custom", "values"]):
+            if mode == "values":
+                final_result = chunk
+                continue
+            if chunk.get("type") != "report_delta":
+                continue
+
+            draft[chunk["part"]] += chunk["delta"]
+            now = time.monotonic()
+            if now - last_edit < STREAM_EDIT_INTERVAL:
+                continue
+            last_edit = now
+
+            preview = self._draft_preview(draft)
+            try:
+                if progress is None:
+                    progress = await query.message.reply_text(preview)
+                else:
+                    await progress.edit_text(preview)
+            except Exception as e:
+                logger.warning(f"Could not update report draft message: {e}")
+
+        # The finished report replaces the draft
+        if progress is not None:
+            try:
+                await progress.delete()
+            except Exception as e:
+                logger.warning(f"Could not delete report draft message: {e}")
+
+        return final_result
+
+    def _draft_preview(self, draft: Dict[str, str]) -> str:
+        """Plain-text tail of the report written so far (partial markdown would fail to parse)."""
+        text = "\n\n---\n\n".join(draft[part] for part in REPORT_PARTS if draft[part])
+        if len(text) > DRAFT_PREVIEW_LENGTH:
+            text = "…" + text[-DRAFT_PREVIEW_LENGTH:]
+        return f"✍️ Writing the report...\n\n{text}"
+
     async def request_modification(self, query) -> None:
         """Request user feedback for modifying analysts."""
         user_id = query.from_user.id
@@ -339,14 +384,12 @@ Send me a topic to begin!
         )
 
         try:
-            # Update state with feedback and regenerate analysts
-            current_state = session['graph_state']
-            current_state['human_analyst_feedback'] = feedback
-
-            # Run graph to regenerate analysts
-            result = await asyncio.to_thread(
-                lambda: graph.invoke(current_state, {"recursion_limit": 10})
-            )
+            # Record the feedback at the paused human_feedback step and resume,
+            # which regenerates the analysts and pauses for approval again
+            config = thread_config(session['thread_id'], recursion_limit=10)
+            await get_graph().aupdate_state(config, {'human_analyst_feedback': feedback}, as_node='human_feedback')
+            with tracer.graph(session['thread_id'], "modify", interface="telegram"):
+                result = await get_graph().ainvoke(None, config)
 
             # Update session and show new analysts
             user_sessions[user_id]['graph_state'] = result
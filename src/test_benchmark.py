@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for the fake providers and the benchmark harness (runs offline, no API keys needed)
+"""
+
+import asyncio
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from benchmark import benchmark_config, compare, use_fake_providers
+from fakes import FakeProviders, LatencyModel
+from schema import Perspectives, SearchQuery
+
+
+def test_fakes_are_deterministic():
+    print("Testing fake providers...")
+    first, second = FakeProviders(time_scale=0), FakeProviders(time_scale=0)
+    messages = [SystemMessage(content="Strictly pick the top 3 themes."), HumanMessage(content="Generate")]
+
+    analysts = first.llm.with_structured_output(Perspectives).invoke(messages).analysts
+    assert len(analysts) == 3
+    assert analysts == second.llm.with_structured_output(Perspectives).invoke(messages).analysts
+    query = asyncio.run(first.llm.with_structured_output(SearchQuery).ainvoke(messages))
+    assert query.search_query
+
+    answer = first.llm.invoke(messages)
+    assert answer.content == second.llm.invoke(messages).content
+    assert "## Sources" in answer.content and answer.usage_metadata["output_tokens"] > 0
+    streamed = "".join(chunk.content for chunk in first.llm.stream(messages))
+    assert streamed == answer.content
+
+    assert first.web_search.invoke("drug discovery") == second.web_search.invoke("drug discovery")
+    assert len(first.wikipedia_loader("drug discovery").load()) == 2
+
+    # Latency depends on the request only, not on how many were sampled before it
+    latency = LatencyModel(1.0, 0.5, scale=0.1)
+    assert latency.sample("a") == LatencyModel(1.0, 0.5, scale=0.1).sample("a")
+    assert latency.sample("a") != latency.sample("b")
+
+
+def test_benchmark_config():
+    print("Testing one benchmark configuration...")
+    with use_fake_providers(time_scale=0) as ra:
+        result = benchmark_config(ra, "graph", max_analysts=2, max_num_turns=1, concurrency=2, runs=2, time_scale=0)
+    print(f"Result: {result}")
+    assert result["failures"] == 0 and result["throughput"] > 0
+    assert result["p50"] <= result["p95"] <= result["p99"]
+    assert "answer_question" in result["node_overhead_seconds"]
+    assert "conduct_interview" not in result["node_overhead_seconds"]
+
+
+def test_compare_with_baseline():
+    print("Testing baseline comparison...")
+    config = {"graph": "graph", "max_analysts": 2, "max_num_turns": 1, "concurrency": 1}
+    baseline = {"results": [{**config, "throughput": 10.0, "p95": 1.0, "peak_rss_mb": 100.0}]}
+    current = [{**config, "throughput": 7.0, "p95": 1.1, "peak_rss_mb": 80.0}]
+
+    regressions = compare(current, baseline, tolerance=0.2)
+    assert [(metric, change) for _, metric, _, _, change in regressions] == [("throughput", -0.3)]
+    assert compare(current, baseline, tolerance=0.5) == []
+
+
+if __name__ == '__main__':
+    test_fakes_are_deterministic()
+    test_benchmark_config()
+    test_compare_with_baseline()
+    print("All benchmark tests passed")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM response cache (runs offline, no API keys needed)
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from caching import LLMCache, SearchCache
+from schema import SearchQuery
+from textutils import normalize_query
+
+
+class FakeModel:
+    model = "fake-model"
+    temperature = 0
+
+
+def test_memory_and_disk_tiers():
+    print("Testing memory and disk tiers...")
+    path = os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite")
+    cache = LLMCache(max_entries=2, path=path, ttl=60)
+    messages = [SystemMessage(content="system"), HumanMessage(content="hello")]
+    key = cache.make_key(FakeModel(), messages)
+
+    calls = []
+    def call():
+        calls.append(1)
+        return AIMessage(content="hi there")
+
+    first = cache.call(key, call)
+    second = cache.call(key, call)
+    assert first.content == second.content == "hi there"
+    assert len(calls) == 1
+    # Callers get their own copy, so mutating one answer cannot leak into another
+    second.name = "expert"
+    assert cache.call(key, call).name is None
+
+    # A fresh process only has the disk tier
+    cold = LLMCache(max_entries=2, path=path, ttl=60)
+    assert cold.call(key, call).content == "hi there"
+    assert len(calls) == 1
+    assert cold.stats()["disk_hits"] == 1
+    print(f"Stats: {cache.stats()}")
+
+
+def test_structured_output_keys():
+    print("Testing structured output schema is part of the key...")
+    cache = LLMCache(path=None)
+    messages = [HumanMessage(content="query")]
+    assert cache.make_key(FakeModel(), messages) != cache.make_key(FakeModel(), messages, SearchQuery)
+
+    key = cache.make_key(FakeModel(), messages, SearchQuery)
+    cache.call(key, lambda: SearchQuery(search_query="q"), SearchQuery)
+    cached = cache.call(key, lambda: SearchQuery(search_query="other"), SearchQuery)
+    assert isinstance(cached, SearchQuery) and cached.search_query == "q"
+
+
+def test_ttl_expiry():
+    print("Testing TTL expiry...")
+    cache = LLMCache(path=None, ttl=0.05)
+    key = cache.make_key(FakeModel(), [HumanMessage(content="ttl")])
+    cache.call(key, lambda: AIMessage(content="old"))
+    time.sleep(0.1)
+    assert cache.call(key, lambda: AIMessage(content="new")).content == "new"
+
+
+def test_single_flight():
+    print("Testing concurrent identical calls are coalesced...")
+    cache = LLMCache(path=None)
+    key = cache.make_key(FakeModel(), [HumanMessage(content="same prompt")])
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.2)
+        return AIMessage(content="shared")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.call(key, slow_call))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [r.content for r in results] == ["shared"] * 8
+    print(f"Stats: {cache.stats()}")
+
+
+def test_single_flight_leader_gives_up():
+    print("Testing a coalesced call whose leader times out or is cancelled...")
+    cache = LLMCache(path=None)
+    key = cache.make_key(FakeModel(), [HumanMessage(content="slow prompt")])
+    leader_waiting = threading.Event()
+
+    def leader_call():
+        leader_waiting.set()
+        time.sleep(0.1)
+        raise TimeoutError("leader's run deadline")
+
+    def follower():
+        leader_waiting.wait(1)
+        return cache.call(key, lambda: AIMessage(content="retried"))
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(follower()))
+    thread.start()
+    try:
+        cache.call(key, leader_call)
+        assert False, "expected the leader's TimeoutError"
+    except TimeoutError:
+        pass
+    thread.join()
+    # The follower did not inherit the leader's timeout: it made the call itself
+    assert [r.content for r in results] == ["retried"]
+
+    # A follower stops waiting at its own timeout while the leader carries on
+    def slow_call():
+        leader_waiting.set()
+        time.sleep(0.2)
+        return AIMessage(content="slow")
+
+    leader_waiting.clear()
+    key = cache.make_key(FakeModel(), [HumanMessage(content="another prompt")])
+    thread = threading.Thread(target=lambda: results.append(cache.call(key, slow_call)))
+    thread.start()
+    leader_waiting.wait(1)
+    try:
+        cache.call(key, slow_call, timeout=0.05)
+        assert False, "expected the follower's TimeoutError"
+    except TimeoutError:
+        pass
+    thread.join()
+    assert results[-1].content == "slow"
+
+    async def cancelled_leader():
+        calls = []
+
+        async def straggler():
+            calls.append("leader")
+            await asyncio.sleep(5)
+
+        async def replacement():
+            calls.append("follower")
+            return AIMessage(content="taken over")
+
+        key = cache.make_key(FakeModel(), [HumanMessage(content="async prompt")])
+        leader = asyncio.ensure_future(cache.acall(key, straggler))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(cache.acall(key, replacement))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        # Cancelling the leader does not cancel the session waiting on it
+        assert (await follower).content == "taken over"
+        assert calls == ["leader", "follower"]
+
+    asyncio.run(cancelled_leader())
+
+
+def test_query_normalization():
+    print("Testing search query normalization...")
+    assert normalize_query("What is the impact of AI on Healthcare?") == normalize_query("healthcare AI impact")
+    assert normalize_query("The Who") == "the who"
+
+
+def test_search_cache_ttl_and_size():
+    print("Testing search cache per-source TTL and size bound...")
+    cache = SearchCache(ttls={"web": 0.05, "wikipedia": 60}, max_bytes=100)
+    fetches = []
+    def fetch(blob):
+        fetches.append(blob)
+        return blob
+
+    cache.call("web", "AI in healthcare", lambda: fetch("w" * 40))
+    cache.call("wikipedia", "AI in healthcare", lambda: fetch("k" * 40))
+    cache.call("wikipedia", "healthcare and AI", lambda: fetch("unused"))
+    assert fetches == ["w" * 40, "k" * 40]
+
+    # Web results expire sooner than Wikipedia pages
+    time.sleep(0.1)
+    assert cache.get("web", "AI in healthcare") is None
+    assert cache.get("wikipedia", "AI in healthcare") == "k" * 40
+
+    # Adding past the byte budget evicts the least recently used entry
+    cache.call("web", "quantum computing", lambda: fetch("q" * 70))
+    assert cache.get("wikipedia", "AI in healthcare") is None
+    assert cache.memory.size_bytes <= 100
+    print(f"Stats: {cache.stats()}")
+
+    # The budget is in bytes: 30 characters of Devanagari take 90, which leaves no room for the 70 already stored
+    cache.call("wikipedia", "भारत", lambda: fetch("भ" * 30))
+    assert cache.memory.size_bytes == 90
+    assert cache.get("web", "quantum computing") is None
+
+
+def test_search_cache_hung_search():
+    print("Testing searches waiting on a hung identical search...")
+    cache = SearchCache(ttls={"web": 60}, wait=0.05)
+    release, started = threading.Event(), threading.Event()
+
+    def hung():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    thread = threading.Thread(target=cache.call, args=("web", "tidal power", hung))
+    thread.start()
+    started.wait(1)
+    # The follower stops waiting and searches itself instead of blocking behind the stuck leader
+    began = time.monotonic()
+    assert cache.call("web", "tidal power", lambda: "own") == "own"
+    assert time.monotonic() - began < 1
+    release.set()
+    thread.join()
+
+    async def run():
+        async def ahung():
+            await asyncio.sleep(5)
+
+        async def own():
+            return "own async"
+
+        leader = asyncio.ensure_future(cache.acall("web", "wave power", ahung))
+        await asyncio.sleep(0.01)
+        try:
+            return await cache.acall("web", "wave power", own)
+        finally:
+            leader.cancel()
+
+    assert asyncio.run(run()) == "own async"
+    assert cache.stats()["web"]["wait_timeouts"] == 2
+
+
+if __name__ == '__main__':
+    test_memory_and_disk_tiers()
+    test_structured_output_keys()
+    test_ttl_expiry()
+    test_single_flight()
+    test_single_flight_leader_gives_up()
+    test_query_normalization()
+    test_search_cache_ttl_and_size()
+    test_search_cache_hung_search()
+    print("All cache tests passed")
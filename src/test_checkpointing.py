@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for graph checkpointing (runs offline, no API keys needed)
+"""
+
+import asyncio
+import operator
+import os
+import sqlite3
+import tempfile
+from typing import Annotated
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from checkpointing import CompressedSerializer, SqliteCheckpointer, thread_config
+from schema import Analyst
+
+
+class CounterState(TypedDict):
+    steps: Annotated[list, operator.add]
+    feedback: str
+
+
+def build_graph(checkpointer):
+    """ Two-step graph that pauses before its second step, like human_feedback """
+    builder = StateGraph(CounterState)
+    builder.add_node("first", lambda state: {"steps": ["first"]})
+    builder.add_node("second", lambda state: {"steps": [f"second:{state.get('feedback', '')}"]})
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    return builder.compile(checkpointer=checkpointer, interrupt_before=["second"])
+
+
+def new_checkpointer():
+    path = os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite")
+    checkpointer = SqliteCheckpointer(sqlite3.connect(path, check_same_thread=False), serde=CompressedSerializer())
+    checkpointer.setup()
+    return checkpointer
+
+
+def test_compressed_serializer():
+    print("Testing compressed serializer...")
+    serde = CompressedSerializer()
+    analyst = Analyst(affiliation="Lab", name="Ada", role="Researcher", description="Studies " * 200)
+
+    type_, data = serde.dumps_typed({"analysts": [analyst]})
+    assert type_.endswith("+zlib")
+    assert len(data) < len(JsonPlusSerializer().dumps_typed({"analysts": [analyst]})[1]) / 4
+    assert serde.loads_typed((type_, data))["analysts"][0] == analyst
+
+    # Small values are stored as is, and uncompressed data still loads
+    small = serde.dumps_typed("approve")
+    assert not small[0].endswith("+zlib")
+    assert serde.loads_typed(small) == "approve"
+    assert serde.loads_typed(JsonPlusSerializer().dumps_typed([1, 2])) == [1, 2]
+
+
+def test_resume_from_interrupt():
+    print("Testing resume from interrupt...")
+    graph = build_graph(new_checkpointer())
+    config = thread_config("session-1")
+
+    graph.invoke({"steps": [], "feedback": ""}, config)
+    assert graph.get_state(config).next == ("second",)
+
+    graph.update_state(config, {"feedback": "approve"})
+    result = graph.invoke(None, config)
+    assert result["steps"] == ["first", "second:approve"]
+
+    # Threads are independent
+    assert graph.get_state(thread_config("session-2")).values == {}
+
+
+def test_async_resume():
+    print("Testing async resume...")
+    graph = build_graph(new_checkpointer())
+    config = thread_config("session-async")
+
+    async def run():
+        await graph.ainvoke({"steps": [], "feedback": ""}, config)
+        await graph.aupdate_state(config, {"feedback": "approve"})
+        return await graph.ainvoke(None, config)
+
+    result = asyncio.run(run())
+    assert result["steps"] == ["first", "second:approve"]
+
+
+def test_finished_and_idle_threads():
+    print("Testing checkpoint retention...")
+    checkpointer = new_checkpointer()
+    graph = build_graph(checkpointer)
+    for thread_id in ("finished", "idle"):
+        config = thread_config(thread_id)
+        graph.invoke({"steps": [], "feedback": ""}, config)
+        graph.update_state(config, {"feedback": "approve"})
+        graph.invoke(None, config)
+
+    def count(thread_id):
+        return checkpointer.conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?",
+                                         (thread_id,)).fetchone()[0]
+
+    # A finished run keeps only the checkpoint its session is restored from
+    assert count("finished") > 1
+    checkpointer.finish_thread("finished")
+    assert count("finished") == 1
+    state = graph.get_state(thread_config("finished"))
+    assert state.values["steps"] == ["first", "second:approve"] and state.next == ()
+
+    # Threads idle for longer than the retention are deleted
+    checkpointer.retention = 60
+    checkpointer.conn.execute("UPDATE thread_activity SET updated_at = updated_at - 120 WHERE thread_id = 'idle'")
+    assert checkpointer.prune() == 1
+    assert count("idle") == 0 and count("finished") == 1
+
+
+if __name__ == '__main__':
+    test_compressed_serializer()
+    test_resume_from_interrupt()
+    test_async_resume()
+    test_finished_and_idle_threads()
+    print("All checkpointing tests passed")
@@ -3,7 +3,9 @@
 Test script to debug the graph execution
 """
 
-from research_assistant import graph, graph_no_interrupt
+import uuid
+
+from research_assistant import graph, thread_config
 from schema import ResearchGraphState
 
 def test_full_flow():
@@ -16,24 +18,22 @@ def test_full_flow():
         'human_analyst_feedback': ''
     }
     
+    # Checkpoints for this run are saved under its own thread
+    config = thread_config(f"test-{uuid.uuid4()}")
+    
     print("Step 1: Creating analysts...")
     # Run until human feedback
-    result = graph.invoke(initial_state, {"recursion_limit": 10})
+    result = graph.invoke(initial_state, {**config, "recursion_limit": 10})
     print(f"After analyst creation: {result.keys()}")
     print(f"Analysts: {len(result.get('analysts', []))}")
     
     print("\nStep 2: Running full research with approved analysts...")
     
-    # Use the no-interrupt graph with approved analysts
-    research_state = {
-        'topic': result['topic'],
-        'max_analysts': len(result['analysts']),
-        'analysts': result['analysts'],
-        'human_analyst_feedback': 'approve'
-    }
+    # Approve at the paused human_feedback step
+    graph.update_state(config, {'human_analyst_feedback': 'approve'}, as_node='human_feedback')
     
-    # Run the complete research process
-    final_result = graph_no_interrupt.invoke(research_state, {"recursion_limit": 100})
+    # Resume the research process from the checkpoint
+    final_result = graph.invoke(None, config)
     print(f"Final result keys: {final_result.keys()}")
     
     for key in ['sections', 'content', 'introduction', 'conclusion', 'final_report']:
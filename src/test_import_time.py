@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the startup path (runs offline, no API keys needed)
+
+Each module is imported in a fresh interpreter with `python -X importtime`.
+Importing must not load the LLM or search SDKs or the checkpoint store (they
+load on first use), must not create the LLM cache's file, and must stay
+within IMPORT_TIME_BUDGET_MS.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative import time allowed per module, in milliseconds
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2500"))
+
+# Packages that belong to the first LLM call, search or graph run, not to startup
+DEFERRED_PACKAGES = ("langchain_google_genai", "google.genai", "langchain_community", "tavily", "wikipedia",
+                     "checkpointing", "langgraph.checkpoint.sqlite")
+
+STARTUP_MODULES = ("research_assistant", "telegram_bot")
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in microseconds of every module loaded by `import module`"""
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("GOOGLE_API_KEY", "GEMINI_API_KEY", "TAVILY_API_KEY")}
+    env["CHECKPOINT_PATH"] = ""
+    with tempfile.TemporaryDirectory() as directory:
+        env["LLM_CACHE_PATH"] = os.path.join(directory, "llm_cache.sqlite")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SRC_DIR, env=env, capture_output=True, text=True,
+        )
+        assert not os.path.exists(env["LLM_CACHE_PATH"]), f"importing {module} created the LLM cache"
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def is_deferred(name: str) -> bool:
+    return any(name == package or name.startswith(package + ".") for package in DEFERRED_PACKAGES)
+
+
+def test_startup_imports():
+    for module in STARTUP_MODULES:
+        print(f"Benchmarking import of {module}...")
+        times = import_times(module)
+
+        loaded = sorted(name for name in times if is_deferred(name))
+        assert not loaded, f"{module} imports {loaded[:5]} at startup"
+
+        total_ms = times[module] / 1000
+        slowest = sorted(times.items(), key=lambda item: -item[1])[1:6]
+        print(f"  {total_ms:.0f} ms total; slowest: " + ", ".join(f"{name} {us / 1000:.0f} ms" for name, us in slowest))
+        assert total_ms <= IMPORT_TIME_BUDGET_MS, f"{module} took {total_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)"
+
+
+def test_graphs_built_once():
+    print("Testing graph factories...")
+    import research_assistant
+
+    built = research_assistant.get_interview_graph.cache_info().misses
+    checkpoint_path = os.environ.get("CHECKPOINT_PATH")
+    os.environ["CHECKPOINT_PATH"] = ""
+    try:
+        graph = research_assistant.get_graph()
+        assert research_assistant.graph is graph
+        assert research_assistant.get_graph_no_interrupt() is research_assistant.graph_no_interrupt
+
+        # Both research graphs share one compiled interview subgraph (unless an earlier test built it)
+        assert research_assistant.get_interview_graph.cache_info().misses - built <= 1
+    finally:
+        if checkpoint_path is None:
+            os.environ.pop("CHECKPOINT_PATH", None)
+        else:
+            os.environ["CHECKPOINT_PATH"] = checkpoint_path
+        # The graph holds an in-memory checkpointer; later users build their own
+        research_assistant.get_graph.cache_clear()
+        research_assistant.get_graph_no_interrupt.cache_clear()
+        research_assistant.get_checkpointer.cache_clear()
+
+
+if __name__ == '__main__':
+    test_startup_imports()
+    test_graphs_built_once()
+    print("All import-time tests passed")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Test script for the background research job queue (runs offline, no API keys needed)
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from jobs import COMPLETED, FAILED, QUEUED, RUNNING, JobQueue, QueueFull, SqliteJobQueue
+
+
+def wait_until_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.state not in (COMPLETED, FAILED):
+        assert time.monotonic() < deadline, f"job {job.id} still {job.state}"
+        time.sleep(0.01)
+    return job
+
+
+def test_jobs_run_in_the_background():
+    print("Testing submitted jobs...")
+    release = threading.Event()
+
+    def runner(job):
+        release.wait(5)
+        if job.kind == "broken":
+            raise ValueError("graph failed")
+        return {"echo": job.payload["topic"]}
+
+    queue = JobQueue(runner, max_workers=2)
+    started = time.monotonic()
+    ok = queue.submit("start", "s1", {"topic": "batteries"})
+    broken = queue.submit("broken", "s2")
+    # Submitting does not wait for the job to run
+    assert time.monotonic() - started < 0.5
+    assert queue.latest("s1") is ok and queue.get(broken.id) is broken
+
+    release.set()
+    assert wait_until_finished(ok).result == {"echo": "batteries"}
+    failed = wait_until_finished(broken)
+    assert failed.state == FAILED and failed.error == "graph failed"
+    assert failed.as_dict()["finished_at"] >= failed.as_dict()["started_at"]
+    stats = queue.stats()
+    assert stats["completed"] == 1 and stats["failed"] == 1 and stats["running"] == 0
+
+
+def test_full_queue_rejects():
+    print("Testing a full queue...")
+    release = threading.Event()
+    queue = JobQueue(lambda job: release.wait(5), max_workers=1, max_queued=2)
+    running = queue.submit("approve", "s1")
+    while running.state == QUEUED:
+        time.sleep(0.01)
+    queue.submit("approve", "s2")
+    queue.submit("approve", "s3")
+    try:
+        queue.submit("approve", "s4")
+        assert False, "expected QueueFull"
+    except QueueFull:
+        pass
+    assert queue.stats()["rejected"] == 1 and queue.stats()["queued"] == 2
+    release.set()
+
+
+def test_history_is_bounded():
+    print("Testing the job history...")
+    queue = JobQueue(lambda job: None, max_workers=1, history=3)
+    jobs = [queue.submit("start", f"s{i}") for i in range(6)]
+    for job in jobs:
+        wait_until_finished(job)
+    queue.submit("start", "s6")
+    # Only finished jobs are forgotten, oldest first
+    assert queue.get(jobs[0].id) is None and queue.latest("s0") is None
+    assert queue.get(jobs[-1].id) is jobs[-1]
+
+
+def test_polled_jobs_are_consistent():
+    print("Testing jobs read while they finish...")
+    queue = JobQueue(lambda job: {"topic": job.payload["topic"]}, max_workers=4, max_queued=500)
+    jobs = [queue.submit("start", f"s{i}", {"topic": i}) for i in range(200)]
+    # Poll the way GET /api/research/<id> does while the workers finish the jobs
+    while True:
+        views = [queue.get(job.id).as_dict() for job in jobs]
+        for view in views:
+            if view["state"] == RUNNING:
+                assert view["started_at"] is not None and view["attempts"] == 1
+            if view["state"] == COMPLETED:
+                assert view["result"] == {"topic": int(view["session_id"][1:])} and view["finished_at"] is not None
+        if all(view["state"] == COMPLETED for view in views):
+            break
+
+
+
+def test_durable_queue_across_processes():
+    print("Testing the durable job queue...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "jobs.db")
+        api = SqliteJobQueue(path, max_queued=2)
+        first = api.submit("start", "s1", {"topic": "batteries"})
+        api.submit("start", "s2", {"topic": "tides"})
+        try:
+            api.submit("start", "s3")
+            assert False, "expected QueueFull"
+        except QueueFull:
+            pass
+
+        # A worker opens the same database, as another process would
+        worker = SqliteJobQueue(path)
+        job = worker.claim("w1")
+        assert job.id == first.id and job.state == RUNNING and job.payload == {"topic": "batteries"}
+        worker.publish_events("s1", [{"event": "status", "data": {"step": "CREATE_ANALYSTS"}}])
+        worker.finish(job, {"state": "awaiting_approval"})
+
+        assert api.get(first.id).state == COMPLETED and api.get(first.id).result == {"state": "awaiting_approval"}
+        assert api.latest("s2").state == QUEUED
+        events = api.events(0)
+        # The job's result follows the events it sent
+        assert [event for _, _, event, _ in events] == ["status", "job"]
+        assert events[-1][3]["id"] == first.id and events[-1][3]["state"] == COMPLETED
+        assert api.events(events[-1][0]) == [] and api.last_event_id() == events[-1][0]
+        assert api.stats()["completed"] == 1 and api.stats()["queued"] == 1
+
+
+def test_lost_workers():
+    print("Testing jobs of a dead worker...")
+    with tempfile.TemporaryDirectory() as directory:
+        queue = SqliteJobQueue(os.path.join(directory, "jobs.db"), max_attempts=2)
+        job = queue.submit("approve", "s1")
+        assert queue.claim("w1", lease=0.05).id == job.id
+        assert queue.claim("w2", lease=0.05) is None
+        time.sleep(0.1)
+        # The lease ran out without being renewed, so another worker takes the job over
+        retried = queue.claim("w2", lease=0.05)
+        assert retried.id == job.id and retried.attempts == 2
+        time.sleep(0.1)
+        # Lost again: the job fails instead of being retried a third time
+        assert queue.claim("w3") is None
+        assert queue.get(job.id).state == FAILED and "lost" in queue.get(job.id).error
+        assert queue.events(0)[-1][2] == "job"
+
+        renewed = queue.submit("approve", "s2")
+        claimed = queue.claim("w4", lease=0.05)
+        assert queue.renew(claimed, lease=60)
+        time.sleep(0.1)
+        assert queue.claim("w5") is None and queue.get(renewed.id).state == RUNNING
+
+
+def test_expired_lease_is_lost():
+    print("Testing a worker whose job was taken over...")
+    with tempfile.TemporaryDirectory() as directory:
+        queue = SqliteJobQueue(os.path.join(directory, "jobs.db"), max_attempts=3)
+        job = queue.submit("approve", "s1")
+        stale = queue.claim("w1", lease=0.05)
+        time.sleep(0.1)
+        current = queue.claim("w2", lease=60)
+        assert current.id == job.id and current.claim != stale.claim
+
+        # The first worker can neither extend the new owner's lease nor overwrite its result
+        assert not queue.renew(stale, lease=60)
+        assert not queue.finish(stale, {"state": "stale"})
+        assert queue.get(job.id).state == RUNNING and queue.events(0) == []
+
+        assert queue.finish(current, {"state": "completed"})
+        assert queue.get(job.id).result == {"state": "completed"}
+        assert [event for _, _, event, _ in queue.events(0)] == ["job"]
+        # A finished job cannot be finished again
+        assert not queue.finish(current, {"state": "again"})
+
+
+if __name__ == '__main__':
+    test_jobs_run_in_the_background()
+    test_full_queue_rejects()
+    test_history_is_bounded()
+    test_polled_jobs_are_consistent()
+    test_durable_queue_across_processes()
+    test_lost_workers()
+    test_expired_lease_is_lost()
+    print("All job queue tests passed")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for per-node instrumentation (runs offline, no API keys needed)
+"""
+
+import contextvars
+import threading
+
+from metrics import Metrics, NodeUsage, add_usage, current_usage
+
+
+def run_node(metrics, node, session="", analyst="", seconds=0.2, **usage):
+    record = NodeUsage(node, session, analyst)
+    token = current_usage.set(record)
+    try:
+        for key, amount in usage.items():
+            add_usage(key.replace("__", ":"), amount)
+    finally:
+        current_usage.reset(token)
+    metrics.observe_node(record, seconds)
+
+
+def test_usage_follows_copied_context():
+    print("Testing usage recorded from worker threads...")
+    record = NodeUsage("retrieve")
+    token = current_usage.set(record)
+    try:
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(add_usage, "retrieval_bytes:web", 100))
+        thread.start()
+        thread.join()
+    finally:
+        current_usage.reset(token)
+
+    # Outside a node, usage is ignored
+    add_usage("retrieval_bytes:web", 1)
+    assert record.counts == {"retrieval_bytes:web": 100}
+
+
+def test_prometheus_render():
+    print("Testing Prometheus output...")
+    metrics = Metrics()
+    run_node(metrics, "write_section", llm_calls=1, input_tokens=120, output_tokens=40, cache_misses__llm=1)
+    run_node(metrics, "write_section", seconds=3.0, cache_hits__llm=1)
+    run_node(metrics, "retrieve", retrieval_bytes__wikipedia=2048)
+
+    text = metrics.render()
+    assert "# TYPE research_node_duration_seconds histogram" in text
+    assert 'research_node_duration_seconds_count{node="write_section"} 2' in text
+    assert 'research_node_duration_seconds_bucket{node="write_section",le="0.5"} 1' in text
+    assert 'research_node_duration_seconds_bucket{node="write_section",le="+Inf"} 2' in text
+    assert 'research_llm_tokens_total{direction="input",node="write_section"} 120' in text
+    assert 'research_cache_requests_total{cache="llm",node="write_section",result="hit"} 1' in text
+    assert 'research_retrieval_bytes_total{node="retrieve",source="wikipedia"} 2048' in text
+
+    # Large counters and fractional values keep every digit
+    metrics.inc("research_llm_tokens_total", 12345685, node="big", direction="input")
+    metrics.inc("research_llm_tokens_total", 0.1 + 0.2, node="fraction", direction="input")
+    text = metrics.render()
+    assert 'research_llm_tokens_total{direction="input",node="big"} 12345685\n' in text
+    assert 'research_llm_tokens_total{direction="input",node="fraction"} 0.30000000000000004\n' in text
+
+
+def test_session_usage():
+    print("Testing per-session totals...")
+    metrics = Metrics(max_sessions=2)
+    run_node(metrics, "answer_question", "s1", "Ada", output_tokens=10)
+    run_node(metrics, "answer_question", "s1", "Ada", output_tokens=5)
+    run_node(metrics, "answer_question", "s1", "Bob", output_tokens=7)
+
+    usage = {row["analyst"]: row for row in metrics.session_usage("s1")}
+    assert usage["Ada"]["runs"] == 2 and usage["Ada"]["output_tokens"] == 15
+    assert usage["Bob"]["output_tokens"] == 7
+
+    # Only the most recent sessions are kept
+    run_node(metrics, "ask_question", "s2")
+    run_node(metrics, "ask_question", "s3")
+    assert metrics.session_usage("s1") == []
+    # Session labels never reach the Prometheus output
+    assert "s2" not in metrics.render()
+
+
+if __name__ == '__main__':
+    test_usage_follows_copied_context()
+    test_prometheus_render()
+    test_session_usage()
+    print("All metrics tests passed")
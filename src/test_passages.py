@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for passage-level retrieval (runs offline)
+"""
+
+from context_store import canonical_url, document_key, merge_context, passage_key, seen_passages, unseen_documents
+from passages import estimate_tokens, parse_documents, pick_passages, select_passages
+
+WEB_BLOB = "\n\n---\n\n".join([
+    '<Document href="https://example.com/protein"/>\n' + "AlphaFold predicts protein structures with high accuracy. " * 30 + "\n</Document>",
+    '<Document href="https://example.com/weather"/>\n' + "Rain is expected over the weekend in coastal regions. " * 30 + "\n</Document>",
+])
+WIKI_BLOB = '<Document source="https://en.wikipedia.org/wiki/Drug_discovery" page=""/>\n' + \
+    "Drug discovery pipelines now use machine learning to screen candidate molecules. " * 40 + "\n</Document>"
+
+
+def test_parse_documents():
+    print("Testing documents are recovered from context blobs...")
+    documents = parse_documents([WEB_BLOB, WIKI_BLOB])
+    assert [header for header, _ in documents] == [
+        '<Document href="https://example.com/protein"/>',
+        '<Document href="https://example.com/weather"/>',
+        '<Document source="https://en.wikipedia.org/wiki/Drug_discovery" page=""/>',
+    ]
+
+
+def test_select_passages_keeps_relevant_sources_within_budget():
+    print("Testing passage selection...")
+    context = [WEB_BLOB, WIKI_BLOB]
+    selected = select_passages(context, "How does machine learning help drug discovery and protein structure?",
+                               top_k=4, token_budget=400, words=60, overlap=10)
+    print(f"Full context: ~{estimate_tokens(str(context))} tokens, selected: ~{estimate_tokens(selected)} tokens")
+
+    assert estimate_tokens(selected) <= 450
+    assert "Drug_discovery" in selected
+    assert "weather" not in selected
+    # Every passage stays under its source header
+    assert selected.count("<Document") == selected.count("</Document>")
+
+    selected = select_passages(context, "What does AlphaFold predict about protein structures?",
+                               top_k=4, token_budget=400, words=60, overlap=10)
+    assert "example.com/protein" in selected and "Drug_discovery" not in selected
+
+
+def test_select_passages_always_returns_something():
+    print("Testing an unrelated question still gets context...")
+    selected = select_passages([WIKI_BLOB], "zebra migration", top_k=2, token_budget=10)
+    assert selected.startswith('<Document source="https://en.wikipedia.org/wiki/Drug_discovery"')
+
+
+def test_canonical_url():
+    print("Testing URL canonicalization...")
+    assert canonical_url("http://www.Example.com/a/?utm_source=x&id=2#top") == "https://example.com/a?id=2"
+    assert canonical_url("https://en.m.wikipedia.org/wiki/Drug_discovery") == \
+        canonical_url("https://en.wikipedia.org/wiki/Drug_discovery")
+    # Only exact tracking names are dropped, and utm_ as a prefix
+    assert canonical_url("https://example.com/a?ref=feed&reference=7&refresh=1") == \
+        "https://example.com/a?reference=7&refresh=1"
+
+
+def test_merge_context_deduplicates_across_turns():
+    print("Testing repeated documents are not appended again...")
+    turn_one = merge_context([], [WEB_BLOB, WIKI_BLOB])
+    assert len(turn_one) == 3
+
+    same_page_other_url = WEB_BLOB.replace("https://example.com/protein", "https://www.example.com/protein/?utm_medium=feed")
+    copied_content = '<Document href="https://mirror.example.org/copy"/>\n' + parse_documents(WIKI_BLOB)[0][1] + "\n</Document>"
+    turn_two = merge_context(turn_one, [same_page_other_url, copied_content])
+    assert turn_two == turn_one
+
+    fresh = '<Document href="https://example.com/new"/>\nSomething new.\n</Document>'
+    turn_three = merge_context(turn_two, [fresh])
+    assert turn_three[-1] == fresh
+
+    # Keys are carried from one merge to the next; a plain list (as loaded from a checkpoint) gives the same result
+    assert len(turn_three.entry_keys) > len(turn_two.entry_keys)
+    assert merge_context(list(turn_two), [fresh]) == turn_three
+
+
+def test_unseen_documents():
+    print("Testing documents shown to the expert are skipped next turn...")
+    context = merge_context([], [WEB_BLOB, WIKI_BLOB])
+    seen = [document_key(*parse_documents(context[0])[0])]
+    assert [header for header, _ in unseen_documents(context, seen)] == [
+        '<Document href="https://example.com/weather"/>',
+        '<Document source="https://en.wikipedia.org/wiki/Drug_discovery" page=""/>',
+    ]
+
+
+def test_seen_passages_stay_rankable():
+    print("Testing passages shown to the expert are skipped, not their whole document...")
+    documents = parse_documents([WIKI_BLOB])
+    first = pick_passages(documents, "machine learning drug discovery", top_k=1, words=40, overlap=0)
+    seen = [passage_key(document_key(*documents[0]), first[0][2])]
+
+    skip = seen_passages(documents, seen)
+    assert skip == {(0, first[0][2])}
+    second = pick_passages(documents, "machine learning drug discovery", top_k=1, words=40, overlap=0, skip=skip)
+    # The next turn gets another passage of the same document
+    assert second[0][1] == 0 and second[0][2] != first[0][2]
+
+
+if __name__ == '__main__':
+    test_parse_documents()
+    test_select_passages_keeps_relevant_sources_within_budget()
+    test_select_passages_always_returns_something()
+    test_canonical_url()
+    test_merge_context_deduplicates_across_turns()
+    test_unseen_documents()
+    test_seen_passages_stay_rankable()
+    print("All passage tests passed")
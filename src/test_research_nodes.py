@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Test script for research graph nodes and their helpers (runs offline, no API keys needed)
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+import fakes
+import research_assistant as ra
+from benchmark import initial_state, use_fake_providers
+from caching import LLMCache
+from resilience import QuorumJoin
+
+
+def test_interview_join_after_resume():
+    print("Testing the interview join of a resumed run...")
+    state = {"join_id": "resumed", "analyst_count": 4}
+
+    # Two of four interviews finished before the run stopped; the join waits for the other two only
+    snapshot = SimpleNamespace(tasks=[SimpleNamespace(name="conduct_interview", result=result)
+                                      for result in ({"sections": ["a"]}, None, {"sections": ["b"]}, None)])
+    config = ra.resume_config({"configurable": {"thread_id": "resumed"}}, snapshot)
+    assert config["configurable"]["interview_branches"] == 2
+
+    joins = RunnableLambda(lambda _: [ra.interview_join(state), ra.interview_join(state)]).invoke(None, config)
+    assert joins[0] is joins[1] and joins[0].total == 2 and joins[0].needed == 2
+    for join in joins:
+        join.finish()
+        ra.leave_join(state, join)
+    assert "resumed" not in ra.interview_joins
+
+
+def test_interview_join_is_always_forgotten():
+    print("Testing joins are dropped once no branch is left in them...")
+    state = {"join_id": "cut-short", "analyst_count": 3}
+    # Outside a resumed run the join is sized from the analysts
+    join = ra.interview_join(state)
+    assert join.total == 3
+    # Only one branch ever ran (the run stopped before the others started)
+    ra.leave_join(state, join)
+    assert "cut-short" not in ra.interview_joins
+
+
+def test_make_node_twins():
+    print("Testing sync and async node twins...")
+    calls = []
+
+    def node(state):
+        calls.append(("sync", threading.get_ident()))
+        return {"value": state["value"] + 1}
+
+    async def anode(state):
+        calls.append(("async", threading.get_ident()))
+        return {"value": state["value"] + 2}
+
+    twins = ra.make_node(node, anode)
+    assert twins.invoke({"value": 0}) == {"value": 1}
+    assert asyncio.run(twins.ainvoke({"value": 0})) == {"value": 2}
+    assert [kind for kind, _ in calls] == ["sync", "async"]
+
+    # Nodes without I/O run inline on the event loop instead of on an executor thread
+    calls.clear()
+
+    async def run_on_loop():
+        return await ra.make_node(node).ainvoke({"value": 0}), threading.get_ident()
+
+    result, loop_thread = asyncio.run(run_on_loop())
+    assert result == {"value": 1} and calls == [("sync", loop_thread)]
+
+
+def test_async_graph_never_blocks():
+    print("Testing an async run makes no blocking provider calls...")
+    blocking = [(fakes.FakeChatModel, "invoke"), (fakes.FakeChatModel, "stream"),
+                (fakes.FakeStructuredModel, "invoke"), (fakes.FakeSearchTool, "invoke"),
+                (fakes.FakeWikipediaLoader, "load")]
+    saved = [(cls, name, getattr(cls, name)) for cls, name in blocking]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("blocking provider call in an async run")
+
+    with use_fake_providers(time_scale=0) as fake_ra:
+        for cls, name in blocking:
+            setattr(cls, name, fail)
+        try:
+            result = asyncio.run(fake_ra.graph_no_interrupt.ainvoke(initial_state(2, 1),
+                                                                   fake_ra.thread_config("async-nodes")))
+        finally:
+            for cls, name, method in saved:
+                setattr(cls, name, method)
+    assert result["final_report"] and len(result["sections"]) == 2
+
+
+def test_search_query_is_shared():
+    print("Testing one search query per turn...")
+    state = {"messages": [HumanMessage(content="How do tidal turbines cope with storms?")], "search_query": ""}
+    with use_fake_providers(time_scale=0) as fake_ra:
+        with fake_ra.status_updater.node("search_query") as usage:
+            update = fake_ra.generate_search_query(state)
+        assert usage.counts["llm_calls"] == 1
+        assert update["search_queries"] == {}
+        turn = {**state, **update}
+        assert fake_ra.query_for(turn, "web") == fake_ra.query_for(turn, "wikipedia") == update["search_query"]
+
+        # Source-specific phrasing still takes a single structured call
+        fake_ra.source_specific_queries = True
+        try:
+            with fake_ra.status_updater.node("search_query") as usage:
+                update = asyncio.run(fake_ra.agenerate_search_query(state))
+        finally:
+            fake_ra.source_specific_queries = False
+        assert usage.counts["llm_calls"] == 1
+        assert sorted(update["search_queries"]) == ["web", "wikipedia"]
+        turn = {**state, **update}
+        assert fake_ra.query_for(turn, "web") == update["search_query"]
+        assert fake_ra.query_for(turn, "wikipedia") == update["search_queries"]["wikipedia"]
+
+
+def test_condense_levels():
+    print("Testing sections merged level by level...")
+    state = {"topic": "Tidal power", "sections": [f"## Memo {i}\n\nFinding {i} [1]" for i in range(5)]}
+    levels = []
+
+    def collect(message, status):
+        if status["step"] == "CONDENSE_SECTIONS" and "level" in status:
+            levels.append(status["level"])
+
+    batch_size = ra.report_batch_size
+    with use_fake_providers(time_scale=0) as fake_ra:
+        fake_ra.report_batch_size = 2
+        fake_ra.set_status_callback(collect)
+        try:
+            assert fake_ra.condense_sections({**state, "sections": state["sections"][:2]}) == {"memos": []}
+
+            # 5 memos -> 3 (two merges and one passed through) -> 2 (one merge)
+            with fake_ra.status_updater.node("condense_sections") as usage:
+                merged = fake_ra.condense_sections(state)
+            amerged = asyncio.run(fake_ra.acondense_sections(state))
+        finally:
+            fake_ra.report_batch_size = batch_size
+            fake_ra.set_status_callback(None)
+            fake_ra.status_console.flush()
+    assert len(merged["memos"]) == 2 and usage.counts["llm_calls"] == 3
+    assert levels == [1, 2, 1, 2]
+    # The fakes are deterministic, so both paths merge the same batches into the same memos
+    assert amerged["memos"] == merged["memos"]
+    assert "condense_sections" in merged["stage_timings"]
+
+
+def test_report_writers_run_in_parallel():
+    print("Testing the report writers run side by side and stream their parts...")
+    with use_fake_providers(time_scale=0.05) as fake_ra:
+        for builder in (fake_ra.research_builder(), fake_ra.get_graph_no_interrupt().builder):
+            writers = {"write_report", "write_introduction", "write_conclusion"}
+            assert {end for start, end in builder.edges if start == "condense_sections"} == writers
+            assert (("write_conclusion", "write_introduction", "write_report"), "finalize_report") in \
+                {(tuple(sorted(starts)), end) for starts, end in builder.waiting_edges}
+
+        deltas = {part: [] for part in fake_ra.REPORT_PARTS}
+        result = {}
+        for mode, chunk in fake_ra.graph_no_interrupt.stream(initial_state(2, 1), fake_ra.thread_config("parallel-writers"),
+                                                               stream_mode=["custom", "values"]):
+            if mode == "values":
+                result = chunk
+            elif chunk.get("type") == "report_delta":
+                deltas[chunk["part"]].append(chunk["delta"])
+
+    # Every writer starts before any of them finishes
+    timings = [result["stage_timings"][writer] for writer in ("write_report", "write_introduction", "write_conclusion")]
+    assert max(t["started_at"] for t in timings) < min(t["started_at"] + t["seconds"] for t in timings)
+
+    # Each part arrives in several deltas that add up to what the writer returned
+    for part in ra.REPORT_PARTS:
+        assert len(deltas[part]) > 1 and "".join(deltas[part]) == result[part]
+
+
+class StreamState(TypedDict):
+    text: str
+
+
+def test_cached_report_part_is_one_delta():
+    print("Testing a cached report part is sent whole...")
+    messages = [SystemMessage(content="Write the report introduction"), HumanMessage(content="Tidal power")]
+
+    def write(state):
+        return {"text": ra.stream_llm(messages, "introduction").content}
+
+    builder = StateGraph(StreamState)
+    builder.add_node("write", write)
+    builder.add_edge(START, "write")
+    builder.add_edge("write", END)
+    graph = builder.compile()
+
+    def run():
+        deltas, text = [], ""
+        for mode, chunk in graph.stream({"text": ""}, stream_mode=["custom", "values"]):
+            if mode == "custom":
+                assert chunk["type"] == "report_delta" and chunk["part"] == "introduction"
+                deltas.append(chunk["delta"])
+            else:
+                text = chunk["text"]
+        return deltas, text
+
+    factory = ra.get_llm_cache
+    with use_fake_providers(time_scale=0) as fake_ra:
+        cache = LLMCache(max_entries=8)
+        fake_ra.get_llm_cache = lambda: cache
+        try:
+            streamed, text = run()
+            cached, cached_text = run()
+            # Outside a graph run there is nowhere to stream to, but the reply still comes back
+            assert fake_ra.stream_llm(messages, "introduction").content == text
+        finally:
+            fake_ra.get_llm_cache = factory
+    assert len(streamed) > 1 and "".join(streamed) == text
+    assert cached == [text] and cached_text == text
+
+
+def test_retrieve_when_every_source_fails():
+    print("Testing a turn where every search source fails...")
+    state = {"search_query": "tidal turbines", "search_queries": {}, "late_sources": [],
+             "context": ["earlier turn"]}
+
+    def broken(query):
+        raise TimeoutError(f"search for {query} timed out")
+
+    async def abroken(query):
+        raise ConnectionError("search provider unreachable")
+
+    fetchers = (ra.fetch_web_docs, ra.fetch_wikipedia_docs, ra.afetch_web_docs, ra.afetch_wikipedia_docs)
+    ra.fetch_web_docs = ra.fetch_wikipedia_docs = broken
+    ra.afetch_web_docs = ra.afetch_wikipedia_docs = abroken
+    try:
+        # The expert answers from what the interview gathered so far instead of failing the branch
+        for update in (ra.retrieve(state), asyncio.run(ra.aretrieve(state))):
+            assert update == {"context": [], "late_sources": []}
+    finally:
+        ra.fetch_web_docs, ra.fetch_wikipedia_docs, ra.afetch_web_docs, ra.afetch_wikipedia_docs = fetchers
+
+
+def test_queued_interviews_are_not_timed_out():
+    print("Testing more interview branches than workers...")
+    state = {"join_id": "queued", "analyst_count": 3, "messages": [], "max_num_turns": 1}
+
+    def interview(interview_state):
+        time.sleep(0.15)
+        return {"sections": [f"Memo by {interview_state['analyst'].name}"]}
+
+    factories = (ra.interview_executor, ra.get_interview_graph, ra.join_from_env)
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="interview")
+    ra.interview_executor = lambda: pool
+    ra.get_interview_graph = lambda: RunnableLambda(interview)
+    # Run one after another, the three interviews take longer than each one is allowed to
+    ra.join_from_env = lambda total: QuorumJoin(total, quorum=1.0, grace=10, timeout=0.3)
+    try:
+        with ThreadPoolExecutor(max_workers=3) as branches:
+            results = list(branches.map(ra.conduct_interview, [
+                {**state, "analyst": SimpleNamespace(name=f"Analyst {i}")} for i in range(3)]))
+    finally:
+        ra.interview_executor, ra.get_interview_graph, ra.join_from_env = factories
+        pool.shutdown()
+    assert [result.get("sections") for result in results] == [[f"Memo by Analyst {i}"] for i in range(3)]
+    assert "queued" not in ra.interview_joins
+
+
+if __name__ == '__main__':
+    test_interview_join_after_resume()
+    test_interview_join_is_always_forgotten()
+    test_queued_interviews_are_not_timed_out()
+    test_make_node_twins()
+    test_async_graph_never_blocks()
+    test_search_query_is_shared()
+    test_condense_levels()
+    test_report_writers_run_in_parallel()
+    test_cached_report_part_is_one_delta()
+    test_retrieve_when_every_source_fails()
+    print("All research node tests passed")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for research worker processes (runs offline with the fake providers)
+"""
+
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import fakes
+from benchmark import use_fake_providers
+from jobs import COMPLETED, FINISHED, SqliteJobQueue
+
+
+def run_until_finished(worker, job, timeout=60):
+    deadline = time.monotonic() + timeout
+    while worker.queue.get(job.id).state not in FINISHED:
+        assert time.monotonic() < deadline, f"{job.kind} job did not finish"
+        worker.run_once()
+        time.sleep(0.02)
+    return worker.queue.get(job.id)
+
+
+def test_worker_runs_queued_jobs():
+    print("Testing start and approve jobs run by a worker...")
+    with use_fake_providers(time_scale=0) as ra:
+        from research_worker import ResearchWorker
+
+        with tempfile.TemporaryDirectory() as directory:
+            api = SqliteJobQueue(os.path.join(directory, "jobs.db"))
+            worker = ResearchWorker(SqliteJobQueue(api.path), "test-worker", jobs=2)
+            ra.set_status_callback(worker.send_status)
+            try:
+                start = run_until_finished(worker, api.submit("start", "worker-session", {"topic": "Tidal power", "max_analysts": 2}))
+                assert start.state == COMPLETED, start.error
+                assert start.result["event"] == "analysts_created" and len(start.result["analysts"]) == 2
+
+                approve = run_until_finished(worker, api.submit("approve", "worker-session"))
+                assert approve.state == COMPLETED, approve.error
+                assert approve.result["state"] == "completed" and approve.result["final_report"]
+            finally:
+                ra.set_status_callback(None)
+                ra.status_console.flush()
+
+            events = api.events(0, limit=10000)
+            kinds = [event for _, _, event, _ in events]
+            assert all(session == "worker-session" for _, session, _, _ in events)
+            assert "status" in kinds and "report_delta" in kinds
+            # Each job's result comes after every event it sent
+            assert kinds.count("job") == 2 and kinds[-1] == "job"
+            assert all(data["session_id"] == "worker-session" and "ts" in data
+                       for _, _, event, data in events if event == "status")
+
+
+def test_failed_job():
+    print("Testing a job that fails...")
+    with use_fake_providers(time_scale=0):
+        from research_worker import ResearchWorker
+
+        with tempfile.TemporaryDirectory() as directory:
+            worker = ResearchWorker(SqliteJobQueue(os.path.join(directory, "jobs.db")), "test-worker")
+            # Modifying a session that never started has no paused run to resume
+            job = run_until_finished(worker, worker.queue.submit("modify", "missing-session", {"feedback": "more costs"}))
+            assert job.state == "failed" and job.error
+            assert worker.queue.events(0)[-1][3]["state"] == "failed"
+
+
+def test_research_job_resumes():
+    print("Testing a research job retried after its worker stopped part way...")
+    job = SimpleNamespace(id=1, kind="research", session_id="resumed-research",
+                          payload={"topic": "Tidal power", "max_analysts": 2})
+    stream, structured = fakes.FakeChatModel.stream, fakes.FakeStructuredModel.invoke
+    calls = []
+
+    def crash_while_writing(self, messages, config=None, **kwargs):
+        raise ConnectionError("worker lost its connection while writing the report")
+
+    def counted(self, messages, config=None, **kwargs):
+        calls.append(self.schema.__name__)
+        return structured(self, messages, config, **kwargs)
+
+    with use_fake_providers(time_scale=0):
+        from research_worker import run_job
+
+        fakes.FakeChatModel.stream = crash_while_writing
+        try:
+            run_job(job, lambda *event: None)
+            assert False, "expected the report writers to fail"
+        except ConnectionError:
+            pass
+        finally:
+            fakes.FakeChatModel.stream = stream
+
+        # The retry picks up at the report writers: no analysts or interviews are redone
+        fakes.FakeStructuredModel.invoke = counted
+        try:
+            result = run_job(job, lambda *event: None)
+        finally:
+            fakes.FakeStructuredModel.invoke = structured
+    assert result["state"] == "completed" and result["final_report"]
+    assert calls == []
+
+
+if __name__ == '__main__':
+    test_worker_runs_queued_jobs()
+    test_failed_job()
+    test_research_job_resumes()
+    print("All research worker tests passed")
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Test script for the provider limiters (runs offline, no API keys needed)
+"""
+
+import asyncio
+import threading
+import time
+
+from resilience import (CallPolicy, CircuitBreaker, CircuitOpen, DeadlineExceeded, ProviderLimiter, QuorumJoin,
+                        SlotQueue, TokenBucket)
+
+
+def test_token_bucket():
+    print("Testing token bucket...")
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == 0.0
+    # The third request waits for one token at 10 tokens per second
+    assert 0.09 <= bucket.reserve(1) <= 0.11
+
+    # Refunds make room again, but never past capacity
+    bucket.adjust(-100)
+    assert bucket.reserve(2) == 0.0
+
+
+def test_rate_limit_paces_calls():
+    print("Testing requests-per-second limit...")
+    limiter = ProviderLimiter("test", rps=20, burst_seconds=0.05)
+    started = time.monotonic()
+    for _ in range(6):
+        with limiter.limit():
+            pass
+    elapsed = time.monotonic() - started
+    # One call goes out at once, the remaining five are spaced 50 ms apart
+    assert 0.2 <= elapsed <= 0.5, elapsed
+    stats = limiter.stats()
+    assert stats["calls"] == 6 and stats["queued"] == 5
+    print(f"Stats: {stats}")
+
+
+def test_tokens_per_minute():
+    print("Testing tokens-per-minute limit...")
+    limiter = ProviderLimiter("test", tpm=6000)  # 100 tokens per second
+    with limiter.limit(tokens=100) as permit:
+        # The reply used fewer tokens than estimated, so the difference is refunded
+        permit.record_usage(50)
+    started = time.monotonic()
+    with limiter.limit(tokens=50):
+        pass
+    assert time.monotonic() - started < 0.1
+
+
+def test_in_flight_cap_threads():
+    print("Testing in-flight cap across threads...")
+    limiter = ProviderLimiter("test", max_in_flight=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        with limiter.limit():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    stats = limiter.stats()
+    assert stats["in_flight"] == 0 and stats["calls"] == 8 and stats["queued"] > 0
+
+
+def test_in_flight_cap_async_and_cancel():
+    print("Testing in-flight cap on the event loop...")
+    limiter = ProviderLimiter("test", max_in_flight=1)
+
+    async def call(seconds):
+        async with limiter.alimit():
+            await asyncio.sleep(seconds)
+
+    async def run():
+        holder = asyncio.create_task(call(0.05))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(call(0))
+        await asyncio.sleep(0.01)
+        assert limiter.stats()["waiting"] == 1
+        # A cancelled waiter gives up its place without leaking the slot
+        waiter.cancel()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        await asyncio.wait_for(call(0), timeout=1)
+
+    asyncio.run(run())
+    assert limiter.slots.in_use == 0
+
+
+def test_slots_shared_by_threads_and_coroutines():
+    print("Testing slots shared by threads and coroutines...")
+    slots = SlotQueue(1)
+    slots.acquire()
+    order = []
+
+    async def wait_for_slot():
+        await slots.aacquire()
+        order.append("coroutine")
+        slots.release()
+
+    def release_later():
+        time.sleep(0.05)
+        order.append("thread")
+        slots.release()
+
+    threading.Thread(target=release_later).start()
+    asyncio.run(wait_for_slot())
+    assert order == ["thread", "coroutine"]
+    assert slots.in_use == 0
+
+
+def test_call_timeout():
+    print("Testing per-node timeouts...")
+    policy = CallPolicy(default_timeout=5, node_timeouts={"ask_question": 0.05})
+    assert policy.call("ask_question", lambda: "fast") == "fast"
+
+    started = time.monotonic()
+    try:
+        policy.call("ask_question", lambda: time.sleep(1))
+        assert False, "expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 0.5
+    # DeadlineExceeded is a TimeoutError, so existing timeout handling still applies
+    assert issubclass(DeadlineExceeded, TimeoutError)
+    assert policy.stats()["ask_question"]["timeouts"] == 1
+
+
+def test_timeout_starts_with_the_permit():
+    print("Testing timeouts of calls queued for a permit...")
+    policy = CallPolicy(default_timeout=5, node_timeouts={"ask_question": 0.1})
+    limiter = ProviderLimiter("test", max_in_flight=1)
+    upstream = []
+
+    def attempt(name, seconds):
+        with limiter.limit():
+            upstream.append(name)
+            time.sleep(seconds)
+        return name
+
+    busy = threading.Thread(target=lambda: policy.call("other", lambda: attempt("busy", 0.3)))
+    busy.start()
+    time.sleep(0.05)
+    # Queued behind the busy call for longer than its own timeout, which only starts with the permit
+    assert policy.call("ask_question", lambda: attempt("queued", 0.01)) == "queued"
+    busy.join()
+
+    # An attempt still queued when its call times out never goes upstream
+    busy = threading.Thread(target=lambda: policy.call("other", lambda: attempt("busy", 0.3)))
+    busy.start()
+    time.sleep(0.05)
+    try:
+        policy.call("ask_question", lambda: attempt("abandoned", 0.01), deadline=time.time() + 0.1)
+        assert False, "expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+    busy.join()
+    time.sleep(0.05)
+    assert "abandoned" not in upstream
+    assert limiter.slots.in_use == 0 and limiter.stats()["errors"] == 0
+
+
+def test_run_deadline():
+    print("Testing run deadline...")
+    policy = CallPolicy(default_timeout=60)
+    # The call gets whatever is left of the run's budget, not the full node timeout
+    assert policy.timeout_for("write_report", time.time() + 1) <= 1
+    try:
+        policy.call("write_report", lambda: "late", deadline=time.time() - 1)
+        assert False, "expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+
+
+def test_hedged_call():
+    print("Testing hedged calls...")
+    policy = CallPolicy(hedging=True, hedge_min_samples=5, hedge_min_delay=0.02)
+    for _ in range(5):
+        policy.call("answer_question", lambda: "warm-up")
+    assert policy.hedge_delay("answer_question") == 0.02
+
+    attempts = []
+
+    def flaky():
+        # The first attempt hangs, the hedge returns at once
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "hedge"
+
+    assert policy.call("answer_question", flaky) == "hedge"
+    assert policy.call("answer_question", lambda: "no hedge", hedge=False) == "no hedge"
+    stats = policy.stats()["answer_question"]
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+    print(f"Stats: {stats}")
+
+
+def test_async_hedge_cancels_loser():
+    print("Testing async hedged calls...")
+    policy = CallPolicy(hedging=True, hedge_min_samples=1, hedge_min_delay=0.02)
+    policy.call("search_query", lambda: "warm-up")
+    calls, cancelled = [], []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        return len(calls)
+
+    async def run():
+        result = await policy.acall("search_query", attempt)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 2
+    assert cancelled == [True]
+
+
+def test_quorum_join_threads():
+    print("Testing quorum join across threads...")
+    join = QuorumJoin(total=4, quorum=0.75, grace=0.05, timeout=5)
+    assert join.needed == 3
+    straggler = threading.Event()
+
+    # Three branches finish at once; the fourth is only waited on for the grace period
+    for _ in range(3):
+        join.finish()
+    started = time.monotonic()
+    assert join.wait_for(straggler.is_set) is False
+    assert time.monotonic() - started < 0.5
+
+    # A branch that is already done never waits
+    assert join.wait_for(lambda: True) is True
+    assert [join.settle() for _ in range(4)] == [False, False, False, True]
+
+
+def test_quorum_join_clock_starts_with_the_branch():
+    print("Testing quorum join with queued branches...")
+    join = QuorumJoin(total=2, quorum=1.0, grace=10, timeout=0.1)
+    started = []
+    done = threading.Event()
+
+    def branch():
+        time.sleep(0.2)  # queued behind another branch for longer than the timeout
+        started.append(time.monotonic())
+        join.notify()
+        time.sleep(0.05)
+        done.set()
+        join.notify()
+
+    threading.Thread(target=branch).start()
+    # The timeout runs from when the branch started, not from when the join was created
+    assert join.wait_for(done.is_set, lambda: started[0] if started else None) is True
+
+    # A branch that overruns its own timeout is still given up on
+    started, done = [], threading.Event()
+    started.append(time.monotonic())
+    assert join.wait_for(done.is_set, lambda: started[0]) is False
+
+
+def test_quorum_join_deadline_async():
+    print("Testing quorum join deadline on the event loop...")
+    join = QuorumJoin(total=2, quorum=1.0, grace=10, timeout=0.05)
+
+    async def run():
+        fast = asyncio.create_task(asyncio.sleep(0))
+        slow = asyncio.create_task(asyncio.sleep(1))
+        assert await join.await_for(fast) is True
+        join.finish()
+        # Quorum is never reached, so the deadline decides
+        assert await join.await_for(slow) is False
+        slow.cancel()
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started < 0.5
+
+
+def test_circuit_breaker_trips_and_recovers():
+    print("Testing circuit breaker...")
+    breaker = CircuitBreaker("web", window=10, min_calls=4, error_rate=0.5, cooldown=0.05)
+
+    def failing():
+        breaker.check()
+        with breaker.track():
+            raise ConnectionError("down")
+
+    for _ in range(4):
+        try:
+            failing()
+        except ConnectionError:
+            pass
+    assert breaker.state == "open"
+
+    # While open, calls fail fast without reaching the source
+    started = time.monotonic()
+    for _ in range(100):
+        try:
+            breaker.check()
+            assert False, "expected CircuitOpen"
+        except CircuitOpen:
+            pass
+    assert time.monotonic() - started < 0.05
+
+    # After the cooldown one probe goes through; its success closes the breaker
+    time.sleep(0.06)
+    breaker.check()
+    try:
+        breaker.check()
+        assert False, "only one probe at a time"
+    except CircuitOpen:
+        pass
+    with breaker.track():
+        pass
+    assert breaker.state == "closed"
+    stats = breaker.stats()
+    assert stats["trips"] == 1 and stats["probes"] == 1 and stats["short_circuits"] == 101
+    print(f"Stats: {stats}")
+
+
+def test_circuit_breaker_latency():
+    print("Testing circuit breaker latency threshold...")
+    breaker = CircuitBreaker("wikipedia", min_calls=3, slow_seconds=1.0, slow_rate=0.5, cooldown=0.05)
+    breaker.record(0.1)
+    breaker.record(2.0)
+    assert breaker.state == "closed"
+    breaker.record(3.0)
+    assert breaker.state == "open"
+
+    # A slow probe opens it again
+    time.sleep(0.06)
+    breaker.check()
+    breaker.record(5.0)
+    assert breaker.state == "open"
+
+
+if __name__ == '__main__':
+    test_token_bucket()
+    test_rate_limit_paces_calls()
+    test_tokens_per_minute()
+    test_in_flight_cap_threads()
+    test_in_flight_cap_async_and_cancel()
+    test_slots_shared_by_threads_and_coroutines()
+    test_call_timeout()
+    test_timeout_starts_with_the_permit()
+    test_run_deadline()
+    test_hedged_call()
+    test_async_hedge_cancels_loser()
+    test_quorum_join_threads()
+    test_quorum_join_clock_starts_with_the_branch()
+    test_quorum_join_deadline_async()
+    test_circuit_breaker_trips_and_recovers()
+    test_circuit_breaker_latency()
+    print("All resilience tests passed")
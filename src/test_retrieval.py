@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the retrieval race (runs offline, no API keys needed)
+"""
+
+import asyncio
+import time
+
+from retrieval import LatencyHistogram, SourceRace
+
+
+def test_latency_histogram():
+    print("Testing latency histogram...")
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(seconds)
+    stats = histogram.stats()
+    assert stats["buckets"] == {"0.1": 1, "1.0": 3, "+Inf": 4}
+    assert stats["count"] == 4 and stats["sum_seconds"] == 4.25
+    assert stats["p50"] == 0.7
+
+
+def test_race_stops_after_grace():
+    print("Testing sync race...")
+    race = SourceRace(grace=0.05)
+
+    def slow():
+        time.sleep(0.5)
+        return "wiki"
+
+    started = time.monotonic()
+    results, late = race.run({"web": lambda: "web", "wikipedia": slow})
+    assert time.monotonic() - started < 0.3
+    assert results == {"web": "web"} and late == ["wikipedia"]
+
+    stats = race.stats.stats()
+    assert stats["web"]["first"] == 1 and stats["wikipedia"]["late"] == 1
+    # The late fetch still finishes in the background and is timed
+    time.sleep(0.6)
+    assert race.stats.stats()["wikipedia"]["latency"]["count"] == 1
+    print(f"Stats: {race.stats.stats()}")
+
+
+def test_race_waits_within_grace():
+    print("Testing sources that return within the grace window...")
+    race = SourceRace(grace=0.5)
+
+    def second():
+        time.sleep(0.05)
+        return "wiki"
+
+    results, late = race.run({"web": lambda: "web", "wikipedia": second})
+    assert results == {"web": "web", "wikipedia": "wiki"} and late == []
+    assert race.stats.stats()["wikipedia"]["in_time"] == 1
+
+
+def test_race_skips_failed_source():
+    print("Testing a failed source...")
+    race = SourceRace(grace=0.05)
+
+    def broken():
+        raise ConnectionError("down")
+
+    def slower():
+        time.sleep(0.05)
+        return "wiki"
+
+    # The failure does not open the grace window, so the other source is still waited for
+    results, late = race.run({"web": broken, "wikipedia": slower})
+    assert results == {"wikipedia": "wiki"} and late == []
+    assert race.stats.stats()["web"]["errors"] == 1
+
+    try:
+        race.run({"web": broken, "wikipedia": broken})
+        assert False, "expected ConnectionError"
+    except ConnectionError:
+        pass
+
+
+def test_async_race():
+    print("Testing async race...")
+    race = SourceRace(grace=0.05)
+    finished = []
+
+    async def fast():
+        return "web"
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        finished.append("wikipedia")
+        return "wiki"
+
+    async def run():
+        results, late = await race.arun({"web": fast, "wikipedia": slow})
+        # The late task is not cancelled
+        await asyncio.sleep(0.3)
+        return results, late
+
+    results, late = asyncio.run(run())
+    assert results == {"web": "web"} and late == ["wikipedia"]
+    assert finished == ["wikipedia"]
+
+
+if __name__ == '__main__':
+    test_latency_histogram()
+    test_race_stops_after_grace()
+    test_race_waits_within_grace()
+    test_race_skips_failed_source()
+    test_async_race()
+    print("All retrieval tests passed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for per-session routing of status updates (runs offline with the fake providers)
+"""
+
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark import run_session, use_fake_providers
+
+
+def collect_updates(ra, sessions, graph_name="graph_no_interrupt", max_analysts=2, max_num_turns=1):
+    """Run the sessions side by side and return every status update sent, with the thread it came from"""
+    updates = []
+    lock = threading.Lock()
+
+    def collect(message, status):
+        with lock:
+            updates.append((threading.current_thread().name, dict(status)))
+
+    ra.set_status_callback(collect)
+    try:
+        with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+            list(pool.map(lambda session: run_session(ra, graph_name, max_analysts, max_num_turns, session), sessions))
+    finally:
+        ra.set_status_callback(None)
+        ra.status_console.flush()
+    return updates
+
+
+def test_parallel_sessions_are_routed():
+    print("Testing status updates of parallel sessions...")
+    sessions = ["routing-a", "routing-b", "routing-c"]
+    with use_fake_providers(time_scale=0) as ra:
+        updates = collect_updates(ra, sessions)
+
+    # Every update, including those from interview and executor threads, names its own session
+    assert updates and all(status.get("session_id") in sessions for _, status in updates)
+    assert any(thread.startswith("interview") for thread, _ in updates)
+    # Interview updates name their analyst, so the status bus coalesces each analyst's separately
+    retrieve = [status for _, status in updates if status["step"] == "RETRIEVE"]
+    assert retrieve and all(status.get("analyst", "").startswith("Analyst") for status in retrieve)
+    for session in sessions:
+        steps = [status["step"] for _, status in updates if status["session_id"] == session]
+        assert steps.count("GENERATE_ANSWER") >= 2, steps
+        assert "FINALIZE_REPORT" in steps
+
+
+def test_session_outside_a_graph():
+    print("Testing the session context outside a graph run...")
+    import research_assistant as ra
+
+    assert ra.session_id() == ""
+    token = ra.current_session.set("request-session")
+    try:
+        # Copied contexts carry the session into worker threads
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            assert pool.submit(contextvars.copy_context().run, ra.session_id).result() == "request-session"
+    finally:
+        ra.current_session.reset(token)
+
+
+if __name__ == '__main__':
+    test_parallel_sessions_are_routed()
+    test_session_outside_a_graph()
+    print("All session routing tests passed")
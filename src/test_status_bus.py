@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the non-blocking status bus (runs offline, no API keys needed)
+"""
+
+import time
+
+from status_bus import StatusBus
+
+
+def update(step, seq, session="s1"):
+    return {"step": step, "seq": seq, "session_id": session}
+
+
+def test_publish_never_waits_on_the_sink():
+    print("Testing publish with a slow sink...")
+    delivered = []
+
+    def slow_sink(key, updates):
+        time.sleep(0.2)
+        delivered.append((key, updates))
+
+    bus = StatusBus(slow_sink, interval=0.05)
+    started = time.monotonic()
+    for seq in range(1, 51):
+        bus.publish("room-1", update("GENERATE_ANSWER", seq))
+    assert time.monotonic() - started < 0.1
+    assert bus.flush(timeout=2)
+    # The burst arrives in a batch or two, in order
+    assert len(delivered) <= 2
+    assert [item["seq"] for _, updates in delivered for item in updates] == list(range(1, 51))
+    assert bus.stats()["delivered"] == 50
+
+
+def test_bounded_queue_drops():
+    print("Testing a full queue...")
+    # The emitter does not wake up during the test, so nothing leaves the queue
+    bus = StatusBus(lambda key, updates: None, max_queue=3, interval=10)
+    results = [bus.publish("room", update("RETRIEVE", seq)) for seq in range(5)]
+    assert results == [True, True, True, False, False]
+    assert bus.stats()["dropped"] == 2 and bus.stats()["queued"] == 3
+
+
+def test_coalescing_and_grouping():
+    print("Testing coalescing...")
+    batches = []
+    bus = StatusBus(lambda key, updates: batches.append((key, updates)), interval=60)
+    bus.publish("s1", update("ROUTE_MESSAGES", 1))
+    bus.publish("s2", update("ROUTE_MESSAGES", 1, "s2"))
+    bus.publish("s1", update("ROUTE_MESSAGES", 2))
+    bus.publish("s1", update("ROUTE_MESSAGES", 3))
+    bus.publish("s1", update("GENERATE_ANSWER", 4))
+    bus.publish("s1", update("ROUTE_MESSAGES", 5))
+    assert bus.drain() == 6
+
+    groups = dict(batches)
+    assert [item["seq"] for item in groups["s1"]] == [3, 4, 5]
+    assert groups["s1"][0]["coalesced_seqs"] == [1, 2]
+    assert "coalesced_seqs" not in groups["s1"][2]
+    assert [item["seq"] for item in groups["s2"]] == [1]
+    assert bus.stats()["coalesced"] == 2
+
+
+def test_coalescing_keeps_each_analyst():
+    print("Testing coalescing with parallel analysts...")
+    batches = []
+    bus = StatusBus(lambda key, updates: batches.append((key, updates)), interval=60)
+    for seq, analyst in enumerate(["Ada", "Ada", "Grace", "Grace", "Ada"], start=1):
+        bus.publish("room", {**update("RETRIEVE", seq, "room"), "analyst": analyst, "sources": [analyst]})
+    bus.drain()
+
+    # Each analyst's run is reduced to its own latest update; no analyst's progress is lost
+    [(_, updates)] = batches
+    assert [(item["seq"], item["analyst"]) for item in updates] == [(2, "Ada"), (4, "Grace"), (5, "Ada")]
+    assert updates[0]["coalesced_seqs"] == [1] and updates[1]["coalesced_seqs"] == [3]
+    assert updates[1]["sources"] == ["Grace"]
+
+
+def test_sink_errors_are_contained():
+    print("Testing a failing sink...")
+
+    def broken(key, updates):
+        raise ConnectionError("socket closed")
+
+    bus = StatusBus(broken, interval=60)
+    bus.publish("room", update("WRITE_REPORT", 1))
+    bus.drain()
+    assert bus.stats()["errors"] == 1
+
+
+if __name__ == '__main__':
+    test_publish_never_waits_on_the_sink()
+    test_bounded_queue_drops()
+    test_coalescing_and_grouping()
+    test_coalescing_keeps_each_analyst()
+    test_sink_errors_are_contained()
+    print("All status bus tests passed")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for per-session trace export (runs offline, no API keys needed)
+"""
+
+import asyncio
+import contextvars
+import os
+import tempfile
+import threading
+import time
+
+from tracing import STATUS_ERROR, Tracer, add_event, load_spans, summarize, tracer_from_env
+
+
+def spans_by_name(tracer, session):
+    assert tracer.flush()
+    return {span["name"]: span for span in load_spans(tracer.path(session))}
+
+
+def test_span_tree():
+    print("Testing span tree...")
+    tracer = Tracer(tempfile.mkdtemp())
+
+    @tracer.traced("llm")
+    def call_llm():
+        add_event("GENERATE_ANSWER", {"step_number": 6})
+        return "answer"
+
+    with tracer.graph("session-1", "approve"):
+        with tracer.span("node", node="answer_question"):
+            # Spans follow the context into worker threads
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(call_llm,))
+            thread.start()
+            thread.join()
+    tracer.end_session("session-1")
+
+    spans = spans_by_name(tracer, "session-1")
+    assert set(spans) == {"session", "graph.approve", "node", "llm"}
+    assert len({span["traceId"] for span in spans.values()}) == 1
+    assert "parentSpanId" not in spans["session"]
+    assert spans["graph.approve"]["parentSpanId"] == spans["session"]["spanId"]
+    assert spans["node"]["parentSpanId"] == spans["graph.approve"]["spanId"]
+    assert spans["llm"]["parentSpanId"] == spans["node"]["spanId"]
+    assert spans["llm"]["events"][0]["name"] == "GENERATE_ANSWER"
+    assert int(spans["session"]["startTimeUnixNano"]) <= int(spans["graph.approve"]["startTimeUnixNano"])
+
+
+def test_invokes_share_a_trace():
+    print("Testing separate invokes of one session...")
+    tracer = Tracer(tempfile.mkdtemp())
+    with tracer.graph("session-2", "start"):
+        pass
+
+    async def approve():
+        with tracer.graph("session-2", "approve"):
+            with tracer.span("node"):
+                await asyncio.sleep(0)
+
+    asyncio.run(approve())
+    assert tracer.flush()
+    spans = load_spans(tracer.path("session-2"))
+    assert len({span["traceId"] for span in spans}) == 1
+    assert {span["name"] for span in spans} == {"graph.start", "graph.approve", "node"}
+
+
+def test_errors_and_disabled_tracer():
+    print("Testing errors and disabled tracing...")
+    tracer = Tracer(tempfile.mkdtemp())
+    try:
+        with tracer.graph("session-3", "approve"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert tracer.flush()
+    span = load_spans(tracer.path("session-3"))[0]
+    assert span["status"] == {"code": STATUS_ERROR, "message": "ValueError: boom"}
+    assert summarize([span])[0][0] == "graph.approve" and summarize([span])[0][4] == 1
+
+    # Without a directory, or outside any session, nothing is recorded
+    disabled = Tracer(None)
+    with disabled.graph("session-4", "start") as span:
+        assert span is None
+    with tracer.span("node") as span:
+        assert span is None
+
+
+def test_tracing_is_opt_in():
+    print("Testing tracing is off by default...")
+    previous = os.environ.pop("TRACE_DIR", None)
+    try:
+        assert not tracer_from_env().enabled
+    finally:
+        if previous is not None:
+            os.environ["TRACE_DIR"] = previous
+
+
+def test_rotation():
+    print("Testing old and excess trace files are deleted...")
+    directory = tempfile.mkdtemp()
+    for name, age, size in (("old", 3600, 10), ("older-big", 60, 600), ("new", 0, 300), ("newest", 0, 300)):
+        path = os.path.join(directory, f"{name}.jsonl")
+        with open(path, "w") as f:
+            f.write("x" * size)
+        os.utime(path, (time.time() - age, time.time() - age + (0.5 if name == "newest" else 0)))
+
+    # Too old, then the oldest until the rest fit in max_bytes
+    tracer = Tracer(directory, max_age=600, max_bytes=700)
+    assert sorted(os.listdir(directory)) == ["new.jsonl", "newest.jsonl"]
+
+    tracer.max_bytes = 400
+    assert tracer.rotate() == 1 and os.listdir(directory) == ["newest.jsonl"]
+
+
+if __name__ == '__main__':
+    test_span_tree()
+    test_invokes_share_a_trace()
+    test_errors_and_disabled_tracer()
+    test_tracing_is_opt_in()
+    test_rotation()
+    print("All tracing tests passed")
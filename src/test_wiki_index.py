@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the offline Wikipedia index (runs offline on a tiny dump)
+"""
+
+import io
+import json
+import os
+import tempfile
+
+from wiki_index import WikiIndex, build_index, iter_json_array, iter_json_dump, strip_wikitext
+
+ARTICLES = [
+    {"title": "Large language model", "text": "A large language model is a neural network trained on vast text corpora. Transformers power most language models."},
+    {"title": "Drug discovery", "text": "Drug discovery is the process by which new candidate medications are found. Machine learning now screens molecules."},
+    {"title": "Photosynthesis", "text": "Photosynthesis converts light energy into chemical energy in plants and algae."},
+    {"title": "Transformer (deep learning)", "text": "The transformer is a deep learning architecture based on attention, used by large language models."},
+]
+
+XML_DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <page><title>Quantum computing</title><ns>0</ns><revision><text>'''Quantum computing''' uses [[qubit|qubits]] and {{cite web|url=x}}superposition.&lt;ref&gt;A source&lt;/ref&gt;</text></revision></page>
+  <page><title>QC</title><ns>0</ns><redirect title="Quantum computing" /><revision><text>#REDIRECT [[Quantum computing]]</text></revision></page>
+  <page><title>Talk:Quantum computing</title><ns>1</ns><revision><text>qubits discussion</text></revision></page>
+</mediawiki>"""
+
+
+def test_build_and_search_jsonl():
+    print("Testing JSON-lines build and BM25 search...")
+    workdir = tempfile.mkdtemp()
+    dump = os.path.join(workdir, "articles.jsonl")
+    with open(dump, "w") as f:
+        for article in ARTICLES:
+            f.write(json.dumps(article) + "\n")
+
+    # A tiny batch size forces several runs to be merged
+    meta = build_index(dump, os.path.join(workdir, "index"), batch_docs=1)
+    assert meta["num_docs"] == len(ARTICLES)
+
+    index = WikiIndex(os.path.join(workdir, "index"))
+    docs = index.search("large language models transformers", k=2)
+    titles = [doc.metadata["title"] for doc in docs]
+    print(f"Results: {titles}")
+    assert titles[0] == "Large language model"
+    assert "Transformer (deep learning)" in titles
+    assert docs[0].metadata["source"] == "https://en.wikipedia.org/wiki/Large_language_model"
+    assert index.search("zebra migration") == []
+    index.close()
+
+
+def test_json_array_is_streamed():
+    print("Testing JSON array dumps are read one article at a time...")
+    raw = json.dumps(ARTICLES, indent=1).encode("utf-8")
+    # Chunks much smaller than one article split records across reads
+    assert list(iter_json_array(io.BytesIO(raw), chunk_size=16)) == ARTICLES
+    assert list(iter_json_array(io.BytesIO(b" [ ] "))) == []
+
+    dump = os.path.join(tempfile.mkdtemp(), "articles.json")
+    with open(dump, "wb") as f:
+        f.write(raw)
+    assert [title for title, _, _ in iter_json_dump(dump)] == [article["title"] for article in ARTICLES]
+
+
+def test_build_xml_dump():
+    print("Testing MediaWiki XML build skips redirects and other namespaces...")
+    workdir = tempfile.mkdtemp()
+    dump = os.path.join(workdir, "dump.xml")
+    with open(dump, "w") as f:
+        f.write(XML_DUMP)
+
+    meta = build_index(dump, os.path.join(workdir, "index"))
+    assert meta["num_docs"] == 1
+
+    index = WikiIndex(os.path.join(workdir, "index"))
+    doc = index.search("qubits superposition")[0]
+    assert doc.metadata["title"] == "Quantum computing"
+    assert "cite web" not in doc.page_content and "[[" not in doc.page_content
+    index.close()
+
+
+def test_strip_wikitext():
+    print("Testing wikitext stripping...")
+    text = "== History ==\n'''Bold''' [[Link|label]] {{Infobox|a={{nested}}}} [[Category:Things]] [https://x.org site]"
+    assert strip_wikitext(text) == "History\nBold label site"
+
+
+if __name__ == '__main__':
+    test_build_and_search_jsonl()
+    test_json_array_is_streamed()
+    test_build_xml_dump()
+    test_strip_wikitext()
+    print("All Wikipedia index tests passed")
@@ -0,0 +1,53 @@
+"""
+Lightweight text helpers shared by the retrieval caches and local rankers.
+"""
+
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:['\-][0-9a-z]+)*")
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves
+""".split())
+
+
+def tokenize(text: str) -> list:
+    """Case-folded word tokens"""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def content_tokens(text: str) -> list:
+    """Tokens with stop words removed"""
+    return [token for token in tokenize(text) if token not in STOP_WORDS]
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a search query: case-folded, stop words stripped, tokens sorted.
+
+    "What is the impact of AI on Healthcare?" and "healthcare AI impact" share
+    the same key. A query made only of stop words keeps its tokens. """
+    tokens = content_tokens(query) or tokenize(query)
+    return " ".join(sorted(set(tokens)))
+
+
+# Okapi BM25 parameters shared by the offline Wikipedia index and passage ranking
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def bm25_idf(num_docs: int, doc_freq: int) -> float:
+    """BM25 inverse document frequency (always positive)"""
+    return math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_term_score(tf: int, idf: float, doc_len: int, avg_doc_len: float) -> float:
+    """Contribution of one query term to a document's BM25 score"""
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / (avg_doc_len or 1))
+    return idf * tf * (BM25_K1 + 1) / (tf + norm)
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Per-session traces of research runs, written as JSONL spans.
+
+Every session gets a span tree:
+
+    session                       one per session, written when it ends
+      graph.<phase>               each graph invoke (start, modify, approve)
+        node                      each graph node run (see StatusUpdater.node)
+          llm / search.<source>   each LLM call and retrieval
+
+Spans use the OpenTelemetry (OTLP JSON) field names, one span per line, in
+TRACE_DIR/<session>.jsonl, so they can be loaded into any OTLP-aware viewer
+or summarised locally without a collector. The trace id is derived from the
+session id, so graph invokes made by separate HTTP requests land in the same
+trace. Status updates become events on the span that sent them.
+
+Tracing is off unless TRACE_DIR is set (e.g. TRACE_DIR=.cache/traces).
+Finished spans are queued and appended by one background writer, so nodes
+never wait on the file system. Trace files older than TRACE_MAX_AGE_SECONDS
+are deleted, and the oldest go first once the directory holds more than
+TRACE_MAX_BYTES.
+
+Usage:
+    python tracing.py summary .cache/traces/<session>.jsonl
+"""
+
+import argparse
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from status_bus import StatusBus
+
+DEFAULT_TRACE_DIR = os.path.join(os.path.dirname(__file__), ".cache", "traces")
+
+# Trace files are kept for a week, and the directory for at most 256 MB
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Seconds between checks of the trace directory against those limits
+ROTATE_EVERY_SECONDS = 60
+
+# Sessions whose root span is still open; the oldest are forgotten past this many
+MAX_OPEN_SESSIONS = 1000
+
+# OTLP span kinds and status codes
+KIND_INTERNAL, KIND_CLIENT = 1, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": value if isinstance(value, str) else json.dumps(value, default=str)}}
+
+
+def _attributes(values: dict) -> list:
+    return [_attribute(key, value) for key, value in values.items() if value is not None and value != ""]
+
+
+class Span:
+    """One timed operation; finished spans are written by their Tracer"""
+
+    def __init__(self, tracer, name: str, trace_id: str, parent_id: str, session: str,
+                 kind: int = KIND_INTERNAL, attributes: dict = None, span_id: str = None, start_ns: int = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id or os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.session = session
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: dict = None):
+        self.events.append({"timeUnixNano": str(time.time_ns()), "name": name,
+                            "attributes": _attributes(attributes or {})})
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _attributes(self.attributes),
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def spawn_writer(target):
+    thread = threading.Thread(target=target, name="trace-writer", daemon=True)
+    thread.start()
+    return thread
+
+
+class Tracer:
+    """Writes span trees per session; a tracer without a directory records nothing"""
+
+    def __init__(self, directory: Optional[str] = None, max_age: float = DEFAULT_MAX_AGE_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_queue: int = 10000):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._session_starts = {}
+        # Spans that do not fit in the queue are dropped rather than holding up the node
+        self._writer = StatusBus(self._append, max_queue=max_queue, interval=0.2, max_batch=1000, coalesce=(),
+                                 spawn=spawn_writer)
+        self._rotated_at = time.monotonic()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.rotate()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    @staticmethod
+    def trace_id(session: str) -> str:
+        return hashlib.sha256(f"trace:{session}".encode()).hexdigest()[:32]
+
+    @staticmethod
+    def session_span_id(session: str) -> str:
+        return hashlib.sha256(f"span:{session}".encode()).hexdigest()[:16]
+
+    def path(self, session: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", session) + ".jsonl")
+
+    def _write(self, span: Span):
+        self._writer.publish(span.session, span.to_otlp())
+
+    def _append(self, session: str, spans: list):
+        """Writer thread: append a batch of one session's spans to its file"""
+        lines = "".join(json.dumps(span, separators=(",", ":")) + "\n" for span in spans)
+        with open(self.path(session), "a", encoding="utf-8") as f:
+            f.write(lines)
+        if time.monotonic() - self._rotated_at >= ROTATE_EVERY_SECONDS:
+            self.rotate()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every finished span has been written"""
+        return self._writer.flush(timeout)
+
+    def rotate(self) -> int:
+        """Delete trace files older than max_age, then the oldest until the rest fit in max_bytes"""
+        self._rotated_at = time.monotonic()
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".jsonl"):
+                info = entry.stat()
+                files.append((info.st_mtime, info.st_size, entry.path))
+        files.sort()
+
+        removed, total = 0, sum(size for _, size, _ in files)
+        cutoff = time.time() - self.max_age if self.max_age else None
+        for modified, size, path in files:
+            if (cutoff is None or modified >= cutoff) and (not self.max_bytes or total <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            total -= size
+        return removed
+
+    def stats(self) -> dict:
+        """Counters of the background writer (spans written, dropped, queued)"""
+        return self._writer.stats()
+
+    def _start_session(self, session: str):
+        with self._lock:
+            self._session_starts.setdefault(session, time.time_ns())
+            while len(self._session_starts) > MAX_OPEN_SESSIONS:
+                self._session_starts.pop(next(iter(self._session_starts)))
+
+    @contextmanager
+    def _run(self, span: Span):
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._write(span)
+
+    @contextmanager
+    def graph(self, session: str, phase: str, **attributes):
+        """Span for one graph invoke of a session, parented to the session span"""
+        if not self.enabled or not session:
+            yield None
+            return
+        self._start_session(session)
+        span = Span(self, f"graph.{phase}", self.trace_id(session), self.session_span_id(session), session,
+                    attributes={"session.id": session, "graph.phase": phase, **attributes})
+        with self._run(span):
+            yield span
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL, session: str = "", **attributes):
+        """Child of the current span; outside a traced graph, a new tree under `session` (if any)"""
+        parent = current_span.get()
+        if not self.enabled or (parent is None and not session):
+            yield None
+            return
+        if parent is not None:
+            span = Span(self, name, parent.trace_id, parent.span_id, parent.session, kind, attributes)
+        else:
+            self._start_session(session)
+            span = Span(self, name, self.trace_id(session), self.session_span_id(session), session, kind,
+                        {"session.id": session, **attributes})
+        with self._run(span):
+            yield span
+
+    def traced(self, name: str, kind: int = KIND_INTERNAL):
+        """Decorator running a function (sync or async) in a child span of the current one"""
+        def decorate(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def arun(*args, **kwargs):
+                    with self.span(name, kind):
+                        return await func(*args, **kwargs)
+                return arun
+
+            @functools.wraps(func)
+            def run(*args, **kwargs):
+                with self.span(name, kind):
+                    return func(*args, **kwargs)
+            return run
+        return decorate
+
+    def end_session(self, session: str, **attributes):
+        """Write the session's root span, covering every graph invoke since its first"""
+        if not self.enabled or not session:
+            return
+        with self._lock:
+            started = self._session_starts.pop(session, None)
+        if started is None:
+            return
+        span = Span(self, "session", self.trace_id(session), None, session,
+                    attributes={"session.id": session, **attributes},
+                    span_id=self.session_span_id(session), start_ns=started)
+        span.end_ns = time.time_ns()
+        self._write(span)
+
+
+def add_event(name: str, attributes: dict = None):
+    """Attach an event to the current span (no-op outside a trace)"""
+    span = current_span.get()
+    if span is not None:
+        span.add_event(name, attributes)
+
+
+def set_attributes(**attributes):
+    span = current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def tracer_from_env() -> Tracer:
+    """Tracer writing to TRACE_DIR, off when it is unset or empty"""
+    return Tracer(
+        os.getenv("TRACE_DIR") or None,
+        max_age=float(os.getenv("TRACE_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)),
+        max_bytes=int(os.getenv("TRACE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    )
+
+
+def load_spans(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(spans: list) -> list:
+    """(name, count, total seconds, max seconds, errors) per span name, slowest total first"""
+    totals = {}
+    for span in spans:
+        seconds = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+        attributes = {item["key"]: next(iter(item["value"].values())) for item in span.get("attributes", [])}
+        name = span["name"] if span["name"] != "node" else f"node:{attributes.get('node', '?')}"
+        entry = totals.setdefault(name, [0, 0.0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] += span.get("status", {}).get("code") == STATUS_ERROR
+    return sorted(((name, *values) for name, values in totals.items()), key=lambda row: -row[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect research run traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="time per span name in a trace file")
+    summary.add_argument("path")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    print(f"📊 {len(spans)} spans in {args.path}")
+    print(f"{'span':<32} {'count':>6} {'total s':>10} {'max s':>9} {'errors':>7}")
+    for name, count, total, longest, errors in summarize(spans):
+        print(f"{name:<32} {count:>6} {total:>10.3f} {longest:>9.3f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Offline Wikipedia index for the retrieve node's Wikipedia source.
+
+The build step turns a Wikipedia dump into files under an index directory:
+
+    articles.bin    article records (title, url, plain text), memory-mapped at query time
+    offsets.bin     uint64 start offset of every record (N + 1 entries)
+    doclens.bin     uint32 token count of every article
+    postings.bin    per-term doc ids (uint32) followed by term frequencies (uint16)
+    lexicon.sqlite  term -> (postings offset, document frequency)
+    meta.json       document count, average length and build settings
+
+Postings are built in batches (SPIMI) and merged on disk, so memory stays
+bounded by --batch-docs rather than by the size of the dump.
+
+Usage:
+    python wiki_index.py build enwiki-latest-pages-articles.xml.bz2 ./wiki_index
+    python wiki_index.py build articles.jsonl ./wiki_index --max-articles 200000
+    python wiki_index.py search ./wiki_index "large language models"
+
+Set WIKIPEDIA_INDEX_DIR=./wiki_index to make the retrieve node use it.
+"""
+
+import argparse
+import bz2
+import gzip
+import heapq
+import io
+import json
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter
+
+from textutils import bm25_idf, bm25_term_score, content_tokens
+
+INDEX_VERSION = 1
+RECORD_SEPARATOR = "\x1f"
+DEFAULT_BASE_URL = "https://en.wikipedia.org/wiki/"
+
+# Terms that appear in more than this fraction of articles carry almost no
+# BM25 weight but dominate query time, so they are skipped when other terms exist
+MAX_DF_FRACTION = 0.2
+MIN_DOCS_FOR_DF_CUTOFF = 1000
+
+
+### Reading dumps
+
+def open_dump(path: str):
+    """Open a dump file, transparently decompressing .bz2 and .gz"""
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def strip_wikitext(text: str) -> str:
+    """Reduce MediaWiki markup to readable plain text"""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.S)
+    text = re.sub(r"<ref[^>]*/>", "", text)
+    text = re.sub(r"<ref[^>]*>.*?</ref>", "", text, flags=re.S)
+
+    # Templates and tables nest, so strip the innermost ones until nothing changes
+    previous = None
+    while previous != text:
+        previous = text
+        text = re.sub(r"\{\{[^{}]*\}\}", "", text)
+        text = re.sub(r"\{\|[^{}]*?\|\}", "", text, flags=re.S)
+
+    text = re.sub(r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", "", text, flags=re.I)
+    text = re.sub(r"\[\[[^\]|]*\|([^\]]*)\]\]", r"\1", text)
+    text = re.sub(r"\[\[([^\]]*)\]\]", r"\1", text)
+    text = re.sub(r"\[https?://[^\s\]]+ ([^\]]*)\]", r"\1", text)
+    text = re.sub(r"\[https?://[^\]]*\]", "", text)
+    text = re.sub(r"'{2,}", "", text)
+    text = re.sub(r"^=+\s*(.*?)\s*=+\s*$", r"\1", text, flags=re.M)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def iter_xml_dump(path: str, base_url: str = DEFAULT_BASE_URL):
+    """Yield (title, url, text) for main-namespace, non-redirect pages of a MediaWiki XML dump"""
+    with open_dump(path) as f:
+        title, namespace, redirect, text = None, "0", False, ""
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = elem
+            if event == "start":
+                continue
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = elem.text or ""
+            elif tag == "ns":
+                namespace = elem.text or "0"
+            elif tag == "redirect":
+                redirect = True
+            elif tag == "text":
+                text = elem.text or ""
+            elif tag == "page":
+                if namespace == "0" and not redirect and title:
+                    yield title, base_url + title.replace(" ", "_"), strip_wikitext(text)
+                title, namespace, redirect, text = None, "0", False, ""
+                # The root still holds every finished page until its children are dropped as well
+                elem.clear()
+                root.clear()
+
+
+def iter_json_array(f, chunk_size: int = 1 << 20):
+    """Yield the objects of a top-level JSON array one at a time, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(f, encoding="utf-8")
+    buffer = reader.read(chunk_size)
+    position = buffer.index("[") + 1
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            buffer, position = reader.read(chunk_size), 0
+            if not buffer:
+                return
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The object runs past the end of the buffer
+            more = reader.read(chunk_size)
+            if not more:
+                raise
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield record
+        position = end
+        if position >= chunk_size:
+            buffer, position = buffer[position:], 0
+
+
+def iter_json_dump(path: str, base_url: str = DEFAULT_BASE_URL):
+    """Yield (title, url, text) from a JSON array or JSON-lines dump (e.g. wikiextractor output).
+
+    Both are read incrementally, one article at a time. """
+    with open_dump(path) as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == b"[":
+            records = iter_json_array(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+
+        for record in records:
+            title = record.get("title", "")
+            text = record.get("text") or record.get("content") or record.get("body") or ""
+            if not title or not text:
+                continue
+            url = record.get("url") or base_url + title.replace(" ", "_")
+            yield title, url, text
+
+
+def iter_dump(path: str, base_url: str = DEFAULT_BASE_URL):
+    name = path.lower()
+    for suffix in (".bz2", ".gz"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if name.endswith(".xml"):
+        return iter_xml_dump(path, base_url)
+    return iter_json_dump(path, base_url)
+
+
+### Building
+
+def _write_run(path: str, postings: dict):
+    """Write one batch of postings sorted by term"""
+    with open(path, "wb") as f:
+        for term in sorted(postings):
+            doc_ids, tfs = postings[term]
+            encoded = term.encode("utf-8")
+            f.write(struct.pack("<HI", len(encoded), len(doc_ids)))
+            f.write(encoded)
+            doc_ids.tofile(f)
+            tfs.tofile(f)
+
+
+def _read_run(path: str):
+    """Yield (term, doc_ids, tfs) from a run file in term order"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(6)
+            if not header:
+                return
+            term_len, count = struct.unpack("<HI", header)
+            term = f.read(term_len).decode("utf-8")
+            doc_ids, tfs = array("I"), array("H")
+            doc_ids.fromfile(f, count)
+            tfs.fromfile(f, count)
+            yield term, doc_ids, tfs
+
+
+class IndexBuilder:
+    """Streams articles into the on-disk article store and BM25 inverted index"""
+
+    def __init__(self, index_dir: str, batch_docs: int = 20000, max_tokens_per_doc: int = 5000):
+        self.index_dir = index_dir
+        self.batch_docs = batch_docs
+        self.max_tokens_per_doc = max_tokens_per_doc
+        os.makedirs(index_dir, exist_ok=True)
+
+        self.num_docs = 0
+        self.total_tokens = 0
+        self.offsets = array("Q", [0])
+        self.doc_lens = array("I")
+        self._articles = open(os.path.join(index_dir, "articles.bin"), "wb")
+        self._postings = {}
+        self._batch_count = 0
+        self._run_dir = tempfile.mkdtemp(prefix="runs-", dir=index_dir)
+        self._runs = []
+
+    def add(self, title: str, url: str, text: str):
+        record = RECORD_SEPARATOR.join(
+            part.replace(RECORD_SEPARATOR, " ") for part in (title, url, text)
+        ).encode("utf-8")
+        self._articles.write(record)
+        self.offsets.append(self.offsets[-1] + len(record))
+
+        # Titles are strong evidence of topicality, so they count twice
+        tokens = content_tokens(f"{title} {title} {text}")[:self.max_tokens_per_doc]
+        self.doc_lens.append(len(tokens))
+        self.total_tokens += len(tokens)
+
+        doc_id = self.num_docs
+        for term, tf in Counter(tokens).items():
+            entry = self._postings.get(term)
+            if entry is None:
+                entry = self._postings[term] = (array("I"), array("H"))
+            entry[0].append(doc_id)
+            entry[1].append(min(tf, 65535))
+
+        self.num_docs += 1
+        self._batch_count += 1
+        if self._batch_count >= self.batch_docs:
+            self._flush()
+
+    def _flush(self):
+        if not self._postings:
+            return
+        path = os.path.join(self._run_dir, f"run-{len(self._runs):05d}.bin")
+        _write_run(path, self._postings)
+        self._runs.append(path)
+        self._postings = {}
+        self._batch_count = 0
+
+    def finish(self, source: str = ""):
+        """Merge the batch runs into the final postings file and lexicon"""
+        self._flush()
+        self._articles.close()
+
+        with open(os.path.join(self.index_dir, "offsets.bin"), "wb") as f:
+            self.offsets.tofile(f)
+        with open(os.path.join(self.index_dir, "doclens.bin"), "wb") as f:
+            self.doc_lens.tofile(f)
+
+        lexicon_path = os.path.join(self.index_dir, "lexicon.sqlite")
+        if os.path.exists(lexicon_path):
+            os.remove(lexicon_path)
+        conn = sqlite3.connect(lexicon_path)
+        conn.execute("CREATE TABLE lexicon (term TEXT PRIMARY KEY, offset INTEGER, df INTEGER) WITHOUT ROWID")
+
+        rows = []
+        with open(os.path.join(self.index_dir, "postings.bin"), "wb") as postings:
+            # heapq.merge is stable, so postings of a term stay in doc id order across runs
+            merged = heapq.merge(*(_read_run(path) for path in self._runs), key=lambda item: item[0])
+            term, doc_ids, tfs = None, array("I"), array("H")
+            for next_term, next_ids, next_tfs in merged:
+                if next_term != term:
+                    if term is not None:
+                        rows.append((term, postings.tell(), len(doc_ids)))
+                        doc_ids.tofile(postings)
+                        tfs.tofile(postings)
+                    term, doc_ids, tfs = next_term, array("I"), array("H")
+                doc_ids.extend(next_ids)
+                tfs.extend(next_tfs)
+                if len(rows) >= 50000:
+                    conn.executemany("INSERT INTO lexicon VALUES (?, ?, ?)", rows)
+                    rows = []
+            if term is not None:
+                rows.append((term, postings.tell(), len(doc_ids)))
+                doc_ids.tofile(postings)
+                tfs.tofile(postings)
+        conn.executemany("INSERT INTO lexicon VALUES (?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+
+        for path in self._runs:
+            os.remove(path)
+        os.rmdir(self._run_dir)
+
+        meta = {
+            "version": INDEX_VERSION,
+            "num_docs": self.num_docs,
+            "avg_doc_len": self.total_tokens / self.num_docs if self.num_docs else 0.0,
+            "source": os.path.basename(source),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(os.path.join(self.index_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+def build_index(dump_path: str, index_dir: str, max_articles: int = None,
+                batch_docs: int = 20000, base_url: str = DEFAULT_BASE_URL) -> dict:
+    builder = IndexBuilder(index_dir, batch_docs=batch_docs)
+    for title, url, text in iter_dump(dump_path, base_url):
+        if not text:
+            continue
+        builder.add(title, url, text)
+        if builder.num_docs % 10000 == 0:
+            print(f"📚 Indexed {builder.num_docs} articles...")
+        if max_articles and builder.num_docs >= max_articles:
+            break
+    return builder.finish(source=dump_path)
+
+
+### Searching
+
+class WikiIndex:
+    """Read-only BM25 search over an index directory built by IndexBuilder"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported Wikipedia index version in {index_dir}: {self.meta.get('version')}")
+        self.num_docs = self.meta["num_docs"]
+        self.avg_doc_len = self.meta["avg_doc_len"]
+
+        self.offsets = array("Q")
+        with open(os.path.join(index_dir, "offsets.bin"), "rb") as f:
+            self.offsets.frombytes(f.read())
+        self.doc_lens = array("I")
+        with open(os.path.join(index_dir, "doclens.bin"), "rb") as f:
+            self.doc_lens.frombytes(f.read())
+
+        self._articles = self._map(os.path.join(index_dir, "articles.bin"))
+        self._postings = self._map(os.path.join(index_dir, "postings.bin"))
+        self._lexicon = sqlite3.connect(
+            f"file:{os.path.join(index_dir, 'lexicon.sqlite')}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _map(path: str):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def article(self, doc_id: int):
+        """(title, url, text) of an article"""
+        record = self._articles[self.offsets[doc_id]:self.offsets[doc_id + 1]].decode("utf-8")
+        title, url, text = record.split(RECORD_SEPARATOR, 2)
+        return title, url, text
+
+    def _lookup(self, term: str):
+        with self._lock:
+            return self._lexicon.execute("SELECT offset, df FROM lexicon WHERE term = ?", (term,)).fetchone()
+
+    def _postings_for(self, offset: int, df: int):
+        doc_ids, tfs = array("I"), array("H")
+        doc_ids.frombytes(self._postings[offset:offset + 4 * df])
+        tfs.frombytes(self._postings[offset + 4 * df:offset + 6 * df])
+        return doc_ids, tfs
+
+    def search_ids(self, query: str, k: int = 2):
+        """Top-k (doc_id, score) pairs for a query"""
+        terms = []
+        for term in set(content_tokens(query)):
+            entry = self._lookup(term)
+            if entry is not None:
+                terms.append((term, entry[0], entry[1]))
+        if not terms:
+            return []
+
+        # Rarest terms first; very common terms only when nothing else matched
+        terms.sort(key=lambda item: item[2])
+        selective = terms
+        if self.num_docs >= MIN_DOCS_FOR_DF_CUTOFF:
+            selective = [t for t in terms if t[2] <= MAX_DF_FRACTION * self.num_docs] or terms[:1]
+
+        scores = {}
+        for _, offset, df in selective:
+            idf = bm25_idf(self.num_docs, df)
+            doc_ids, tfs = self._postings_for(offset, df)
+            for doc_id, tf in zip(doc_ids, tfs):
+                scores[doc_id] = scores.get(doc_id, 0.0) + bm25_term_score(
+                    tf, idf, self.doc_lens[doc_id], self.avg_doc_len
+                )
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def search(self, query: str, k: int = 2, max_chars: int = 4000):
+        """Top-k articles as Documents shaped like WikipediaLoader's output"""
+        from langchain_core.documents import Document
+
+        docs = []
+        for doc_id, score in self.search_ids(query, k):
+            title, url, text = self.article(doc_id)
+            docs.append(Document(
+                page_content=text[:max_chars],
+                metadata={"title": title, "summary": text[:500], "source": url, "score": round(score, 4)},
+            ))
+        return docs
+
+    def close(self):
+        for mapped in (self._articles, self._postings):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._lexicon.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline Wikipedia index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index a Wikipedia XML or JSON dump")
+    build.add_argument("dump", help="MediaWiki XML dump or JSON/JSON-lines file (.bz2/.gz supported)")
+    build.add_argument("index_dir", help="Output directory")
+    build.add_argument("--max-articles", type=int, default=None)
+    build.add_argument("--batch-docs", type=int, default=20000, help="Articles per in-memory postings batch")
+    build.add_argument("--base-url", default=DEFAULT_BASE_URL)
+
+    search = commands.add_parser("search", help="Query an index")
+    search.add_argument("index_dir")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=2)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.time()
+        meta = build_index(args.dump, args.index_dir, args.max_articles, args.batch_docs, args.base_url)
+        print(f"✅ Indexed {meta['num_docs']} articles into {args.index_dir} in {time.time() - start:.1f}s")
+    else:
+        index = WikiIndex(args.index_dir)
+        start = time.perf_counter()
+        docs = index.search(args.query, k=args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for doc in docs:
+            print(f"{doc.metadata['score']:8.3f}  {doc.metadata['title']}  {doc.metadata['source']}")
+        print(f"⏱️  {len(docs)} results in {elapsed_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    sys.exit(main())